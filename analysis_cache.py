@@ -0,0 +1,147 @@
+import hashlib
+import json
+import os
+import sqlite3
+import time
+
+from profiling import profiled
+from results_store import json_default
+from sweep import merged_sweep
+
+# persistent cache of analysis results, in front of the per combination pipeline in sweep.py. the key is a
+# hash of everything that goes into the model (geometry, loads, factors, ...) and the three section names,
+# so re-running main.py, or a sweep that overlaps an earlier one, only analyses the new combinations.
+# unlike the results store it is never cleared, the least recently used entries are evicted once the
+# cache is bigger than max_bytes
+
+# settings that change the analysis results (see settings in main.py). anything not listed here (paths,
+# solver tuning, ...) doesn't affect the key. the base model and the section library are files, so their
+# contents are hashed into the settings (file_hash), editing either of them starts new cache entries
+CACHE_SETTINGS = [
+    "base_model_hash",
+    "section_library_hash",
+    "backend",
+    "height",
+    "module_length",
+    "module_divisions",
+    "num_spans",
+    "barrier_height",
+    "barrier_section",
+    "barrier_UDL",
+    "barrier_properties",
+    "dead_factor",
+    "live_factor",
+    "wearing_surface_factor",
+    "concrete_deck_factor",
+    "snow_factor",
+    "uls_combinations",
+    "sls_combinations",
+    "pattern_live_load",
+    "live_UDL",
+    "wearing_surface_UDL",
+    "concrete_deck_UDL",
+    "snow_UDL",
+    "roof_UDL",
+    "pedestrian_density",
+    "is_gerber",
+    "is_alu",
+]
+
+# default size cap of the cache file contents
+CACHE_MAX_BYTES = 100 * 1024**2
+
+
+def file_hash(path):
+    # hash of the contents of a file, None if it doesn't exist
+    if not os.path.exists(path):
+        return None
+    digest = hashlib.sha1()
+    with open(path, "rb") as file:
+        for block in iter(lambda: file.read(1024**2), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def cache_key(settings, combination):
+    hashed = {name: settings.get(name) for name in CACHE_SETTINGS}
+    hashed["combination"] = list(combination)
+    text = json.dumps(hashed, sort_keys=True, default=json_default)
+    return hashlib.sha1(text.encode()).hexdigest()
+
+
+def open_analysis_cache(cache_path, max_bytes=CACHE_MAX_BYTES):
+    os.makedirs(os.path.dirname(os.path.abspath(cache_path)), exist_ok=True)
+    cache = sqlite3.connect(cache_path)
+    cache.execute("PRAGMA journal_mode=WAL")
+    cache.execute(
+        "CREATE TABLE IF NOT EXISTS cache ("
+        "key TEXT PRIMARY KEY, row TEXT, size INTEGER, last_used REAL)"
+    )
+    cache.execute("CREATE INDEX IF NOT EXISTS cache_last_used ON cache (last_used)")
+    cache.commit()
+    return {"connection": cache, "max_bytes": max_bytes, "hits": 0, "misses": 0}
+
+
+@profiled
+def cache_lookup(cache, key):
+    # returns the cached row or None, and marks the entry as used
+    connection = cache["connection"]
+    found = connection.execute("SELECT row FROM cache WHERE key = ?", (key,)).fetchone()
+    if found is None:
+        cache["misses"] += 1
+        return None
+    cache["hits"] += 1
+    connection.execute(
+        "UPDATE cache SET last_used = ? WHERE key = ?", (time.time(), key)
+    )
+    connection.commit()
+    return json.loads(found[0])
+
+
+@profiled
+def cache_insert(cache, key, row):
+    connection = cache["connection"]
+    text = json.dumps(row, default=json_default)
+    connection.execute(
+        "INSERT OR REPLACE INTO cache VALUES (?, ?, ?, ?)",
+        (key, text, len(text), time.time()),
+    )
+    connection.commit()
+    cache_evict(cache)
+
+
+def cache_evict(cache):
+
+    # drop the least recently used entries until the cache is back under its size cap
+    connection = cache["connection"]
+    (total,) = connection.execute("SELECT COALESCE(SUM(size), 0) FROM cache").fetchone()
+    if total <= cache["max_bytes"]:
+        return
+    excess = total - cache["max_bytes"]
+    evicted = 0
+    keys = []
+    for key, size in connection.execute(
+        "SELECT key, size FROM cache ORDER BY last_used"
+    ):
+        keys.append((key,))
+        evicted += size
+        if evicted >= excess:
+            break
+    connection.executemany("DELETE FROM cache WHERE key = ?", keys)
+    connection.commit()
+
+
+def cached_sweep(combinations, settings, cache, run_sweep):
+
+    # wraps a sweep runner (ex. sap_sweep) with the cache. run_sweep takes an iterable of combinations and
+    # yields (combination, row) in the same order. combinations found in the cache are not sent to the
+    # runner, and everything is yielded in the order of combinations, each hit as soon as no miss is ahead
+    # of it (merged_sweep). failed analyses (row None) aren't cached
+    def lookups():
+        for combination in combinations:
+            yield combination, cache_lookup(cache, cache_key(settings, combination))
+
+    for combination, row, analysed in merged_sweep(lookups(), run_sweep):
+        if analysed and row is not None:
+            cache_insert(cache, cache_key(settings, combination), row)
+        yield combination, row
@@ -0,0 +1,845 @@
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+import pandas as pd
+
+from define_geometry import *
+from define_sections import *
+from native_solver import *
+from native_design import *
+from fake_sap import *
+from fake_sweep import *
+from sweep import *
+from analysis_cache import *
+from profiling import *
+from surrogate import *
+from pruning import *
+from pareto import *
+from load_combinations import *
+from interpret_results import determine_optimal_section
+
+# benchmarks for the analysis pipeline, run with python benchmark.py [name]
+# timings are printed to the console, run without a name to run all of them
+#
+# the pipeline benchmark times every stage at several bridge sizes against the fake SAP object, so it runs
+# on a linux CI box. its measurements can be saved and compared to catch regressions:
+#   python benchmark.py pipeline --save baseline.json
+#   python benchmark.py pipeline --compare baseline.json     (exit code 1 on a regression)
+
+
+def benchmark_native_solver():
+
+    # time per combination vs num_spans for the dense and banded solves
+    num_combinations = 16
+    tables = sweep_section_tables(num_combinations)
+
+    print("Native solver, time per combination (ms)")
+    print(f"{'num_spans':>10}{'divisions':>10}{'dofs':>8}{'dense':>10}{'banded':>10}")
+    for module_divisions in (4, 6):
+        for num_spans in (1, 5, 9, 13, 17, 21):
+            model, _ = build_native_model(num_spans, module_divisions)
+            prepared = native_prepare(model)
+
+            timings = []
+            for solver in ("dense", "banded"):
+                start = time.perf_counter()
+                native_run_batch(prepared, tables, solver=solver)
+                timings.append((time.perf_counter() - start) / num_combinations * 1000)
+
+            print(
+                f"{num_spans:>10}{module_divisions:>10}{len(prepared['free']):>8}"
+                f"{timings[0]:>10.2f}{timings[1]:>10.2f}"
+            )
+
+
+def benchmark_parallel_sweep():
+
+    # runs the SAP pipeline against the fake SAP object (fake_sap.py), so it also runs on linux, with
+    # analyses that raise and worker processes that die along the way. tests/test_sweep.py checks the rows
+    # against the serial sweep
+    num_combinations = 48
+    combinations = sweep_combinations(num_combinations)
+
+    with tempfile.TemporaryDirectory() as model_dir:
+        settings = build_sweep_settings(3, 3, model_dir)
+
+        start = time.perf_counter()
+        list(sap_sweep(combinations, settings, 1, fake_sap_open))
+        serial_time = time.perf_counter() - start
+
+        print("Parallel sweep (fake SAP), time per combination (ms)")
+        print(f"{'workers':>10}{'failures':>10}{'crashes':>10}{'time':>10}")
+        print(f"{1:>10}{0:>10}{0:>10}{serial_time / num_combinations * 1000:>10.2f}")
+        for num_workers, failure_rate, crash_rate in (
+            (2, 0.0, 0.0),
+            (4, 0.0, 0.0),
+            (4, 0.1, 0.0),
+            (4, 0.1, 0.05),
+        ):
+            start = time.perf_counter()
+            list(
+                sap_sweep(
+                    combinations,
+                    settings,
+                    num_workers,
+                    fake_sap_open,
+                    {"failure_rate": failure_rate, "crash_rate": crash_rate},
+                    max_attempts=10,
+                )
+            )
+            parallel_time = time.perf_counter() - start
+            print(
+                f"{num_workers:>10}{failure_rate:>10}{crash_rate:>10}"
+                f"{parallel_time / num_combinations * 1000:>10.2f}"
+            )
+
+
+def benchmark_output_writing():
+
+    # cost of writing one result row vs the number of rows already written. rows are appended to a csv
+    # one at a time like in main.py, and compared with rewriting the whole excel sheet every 10 rows (the
+    # old write_to_excel)
+    row = {
+        "Top chord": "PIPE 12 X 1/2",
+        "Bottom chord": "PIPE 10 X 1/2",
+        "Web members": "PIPE 6 X 1/2",
+        "Max vertical deflection for SLS (m)": 0.0213,
+        "Percentage of deflection limit for SLS (%)": 25.56,
+        "Module mass (kg)": 1850.2,
+        "Natural frequency (Hz)": 6.12,
+        "Natural frequency in critical range": True,
+        "Natural frequency occupied (Hz)": 3.48,
+        "Resonating harmonic": 4.24,
+        "Resonating harmonic occupied": 2.41,
+        "Passed member design check for ULS": False,
+        "Failed section": "None",
+    }
+    checkpoints = (100, 1000, 5000, 20000)
+    excel_limit = 1000
+
+    print(
+        "Output writing, time per row (ms) over the last 100 rows before each row count"
+    )
+    print(f"{'rows':>10}{'csv':>10}{'excel':>10}")
+    with tempfile.TemporaryDirectory() as directory:
+        csv_path = os.path.join(directory, "output.csv")
+        excel_path = os.path.join(directory, "output.xlsx")
+        results = []
+        csv_time = 0.0
+        excel_time = 0.0
+        for num_rows in range(1, checkpoints[-1] + 1):
+            results.append(row)
+
+            start = time.perf_counter()
+            append_to_csv([row], csv_path)
+            csv_time += time.perf_counter() - start
+
+            if num_rows <= excel_limit and num_rows % 10 == 0:
+                start = time.perf_counter()
+                pd.DataFrame(results).to_excel(excel_path, index=False)
+                excel_time += time.perf_counter() - start
+
+            if num_rows % 100 == 0:
+                if num_rows in checkpoints:
+                    excel = (
+                        f"{excel_time / 100 * 1000:>10.3f}"
+                        if num_rows <= excel_limit
+                        else f"{'-':>10}"
+                    )
+                    print(f"{num_rows:>10}{csv_time / 100 * 1000:>10.3f}{excel}")
+                csv_time = 0.0
+                excel_time = 0.0
+
+        start = time.perf_counter()
+        export_to_excel({"Results": csv_path}, excel_path)
+        print(
+            f"final excel export of {num_rows} rows: {time.perf_counter() - start:.2f} s"
+        )
+
+
+def benchmark_analysis_cache():
+
+    # two overlapping sweeps through the fake SAP object, the second one only analyses the combinations
+    # the first didn't, with and without a size cap small enough to evict entries. the rows are checked
+    # against an uncached sweep in tests/test_analysis_cache.py
+    combinations = sweep_combinations(64)
+    first = combinations[:40]
+    second = combinations[20:]
+
+    with tempfile.TemporaryDirectory() as directory:
+        settings = build_sweep_settings(3, 3, directory)
+        run_sweep = lambda combinations: sap_sweep(
+            combinations, settings, 1, fake_sap_open
+        )
+
+        print("Analysis cache, overlapping sweeps of 40 and 44 combinations")
+        print(f"{'max_bytes':>10}{'hits':>8}{'misses':>8}{'time (s)':>10}")
+        for max_bytes in (CACHE_MAX_BYTES, 20000):
+            cache_path = os.path.join(directory, f"cache_{max_bytes}.db")
+            cache = open_analysis_cache(cache_path, max_bytes)
+            list(cached_sweep(first, settings, cache, run_sweep))
+
+            cache["hits"] = 0
+            cache["misses"] = 0
+            start = time.perf_counter()
+            list(cached_sweep(second, settings, cache, run_sweep))
+            elapsed = time.perf_counter() - start
+            print(
+                f"{max_bytes:>10}{cache['hits']:>8}{cache['misses']:>8}{elapsed:>10.3f}"
+            )
+            cache["connection"].close()
+
+
+def benchmark_template_model():
+
+    # COM calls per combination when rebuilding the model from BASE.sdb every time vs the template model,
+    # counted by the fake SAP object. the template model builds the model with the first combination, so
+    # its calls are shown for the first combination and per combination after that. tests/test_sweep.py
+    # checks that both modes give the same rows
+    num_combinations = 16
+    combinations = sweep_combinations(num_combinations)
+
+    print("Template model (fake SAP), COM calls per combination")
+    print(f"{'num_spans':>10}{'rebuild':>10}{'first':>10}{'template':>10}")
+    with tempfile.TemporaryDirectory() as directory:
+        for num_spans in (1, 3, 5, 9):
+            settings = build_sweep_settings(num_spans, 3, directory)
+            calls = []
+            for template_model in (False, True):
+                sap_object = fake_sap_open()
+                sap_model = sap_object.SapModel
+                sweep = sap_sweep(
+                    combinations,
+                    settings,
+                    1,
+                    lambda: sap_object,
+                    template_model=template_model,
+                )
+                next(sweep)
+                first_calls = sum(sap_model.calls.values())
+                for _ in sweep:
+                    pass
+                assert not sap_model.errors, sap_model.errors
+                later_calls = sum(sap_model.calls.values()) - first_calls
+                calls.append((first_calls, later_calls / (num_combinations - 1)))
+
+            print(
+                f"{num_spans:>10}{calls[0][1]:>10.1f}{calls[1][0]:>10}{calls[1][1]:>10.1f}"
+            )
+
+
+def benchmark_com_calls():
+
+    # COM calls made by sap_build_model for growing models, counted by the fake SAP object. the group based
+    # calls (loads, restraints, releases, group assignment) must not grow with the number of spans, and the
+    # point lookups go through the model index instead of GetPoints
+    methods = [
+        "FrameObj.GetPoints",
+        "FrameObj.SetLoadDistributed",
+        "PointObj.SetRestraint",
+        "FrameObj.SetReleases",
+        "DatabaseTables.ApplyEditedTables",
+    ]
+    combination = next(iter(sweep_combinations(1)))
+
+    print("COM calls to build the model (fake SAP)")
+    print(
+        f"{'num_spans':>10}{'total':>8}"
+        + "".join(f"{m.split('.')[1]:>20}" for m in methods)
+    )
+    with tempfile.TemporaryDirectory() as directory:
+        for num_spans in (1, 3, 5, 9, 15):
+            settings = build_sweep_settings(num_spans, 3, directory)
+            sap_object = fake_sap_open()
+            sap_model = sap_object.SapModel
+            sap_build_model(sap_object, settings, combination)
+            assert not sap_model.errors, sap_model.errors
+            calls = sap_model.calls
+            print(
+                f"{num_spans:>10}{sum(calls.values()):>8}"
+                + "".join(f"{calls[m]:>20}" for m in methods)
+            )
+
+
+def benchmark_profiling():
+
+    # per stage profile of a sweep on the fake SAP object (like python main.py --profile), serial and with
+    # worker processes. tests/test_profiling.py checks the trace file and the rows
+    num_combinations = 24
+    combinations = sweep_combinations(num_combinations)
+
+    with tempfile.TemporaryDirectory() as directory:
+        settings = build_sweep_settings(5, 3, directory)
+        trace_path = os.path.join(directory, "profile_trace.jsonl")
+        for num_workers in (1, 2):
+            start_profiling(trace_path)
+            for _ in sap_sweep(
+                combinations,
+                settings,
+                num_workers,
+                fake_sap_open,
+                template_model=True,
+            ):
+                pass
+            traces = finish_profiling()
+            print(f"num_workers {num_workers}")
+            print_profile_summary(traces)
+            print()
+
+
+def best_time(function, repeats):
+    # smallest wall time of repeats calls, in seconds
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def benchmark_pipeline():
+
+    # time (best of a few runs) and COM calls of each stage of the pipeline, at several bridge sizes:
+    # geometry, combination generation, building the SAP model, reading the results, and the final excel
+    # export. the SAP stages run against the fake SAP object, so the times are the python side of the
+    # pipeline, the COM calls are what a real SAP instance would add on top. the last cases run a short
+    # sweep with a simulated 1 ms COM round trip. returns {case: {"time": s, "com_calls": n}}
+    measurements = {}
+    combination = sweep_combinations(1)[0]
+
+    with tempfile.TemporaryDirectory() as directory:
+        for num_spans in (1, 5, 9, 15):
+            measurements[f"generate_warren/spans={num_spans}"] = {
+                "time": best_time(
+                    lambda: generate_warren(2.5, 15.0, 3, 5.0, 2 * num_spans), 20
+                ),
+                "com_calls": 0,
+            }
+
+        for num_sections in (20, 40, 80):
+            catalog = sweep_catalog(num_sections)
+            sections = np.arange(num_sections)[::-1]
+            measurements[f"combinations/sections={num_sections}"] = {
+                "time": best_time(
+                    lambda: list(
+                        iterate_combinations(
+                            catalog,
+                            combination_chunks(
+                                catalog, sections, sections, sections, [depth_gap(2)]
+                            ),
+                        )
+                    ),
+                    5,
+                ),
+                "com_calls": 0,
+            }
+
+        for num_spans in (1, 5, 9, 15):
+            settings = build_sweep_settings(num_spans, 3, directory)
+            sap_object = fake_sap_open()
+            sap_model = sap_object.SapModel
+            measurements[f"build_model/spans={num_spans}"] = {
+                "time": best_time(
+                    lambda: sap_build_model(sap_object, settings, combination), 3
+                ),
+                "com_calls": sum(sap_model.calls.values()) // 3,
+            }
+            sap_run_analysis(sap_model, os.path.join(directory, "MODEL.sdb"))
+            sap_model.calls.clear()
+            measurements[f"extract_results/spans={num_spans}"] = {
+                "time": best_time(lambda: sap_extract_results(sap_model), 3),
+                "com_calls": sum(sap_model.calls.values()) // 3,
+            }
+
+        for num_rows in (100, 1000):
+            csv_path = os.path.join(directory, f"output_{num_rows}.csv")
+            excel_path = os.path.join(directory, "output.xlsx")
+            row = result_row(
+                combination,
+                0.0213,
+                25.56,
+                1850.2,
+                (6.12, True, 3.48, 4.24, 2.41),
+                False,
+                "None",
+            )
+            append_to_csv([row] * num_rows, csv_path)
+            measurements[f"export_to_excel/rows={num_rows}"] = {
+                "time": best_time(
+                    lambda: export_to_excel({"Results": csv_path}, excel_path), 3
+                ),
+                "com_calls": 0,
+            }
+
+        num_combinations = 4
+        settings = build_sweep_settings(5, 3, directory)
+        for template_model in (False, True):
+            sap_object = fake_sap_open(call_latency=0.001)
+            start = time.perf_counter()
+            for _ in sap_sweep(
+                sweep_combinations(num_combinations),
+                settings,
+                1,
+                lambda: sap_object,
+                template_model=template_model,
+            ):
+                pass
+            mode = "template" if template_model else "rebuild"
+            measurements[f"sweep_1ms_latency/spans=5,{mode}"] = {
+                "time": (time.perf_counter() - start) / num_combinations,
+                "com_calls": sum(sap_object.SapModel.calls.values())
+                // num_combinations,
+            }
+
+    print("Pipeline stages (fake SAP), best time and COM calls per call")
+    print(f"{'case':<40}{'time (ms)':>12}{'COM calls':>12}")
+    for case, measurement in measurements.items():
+        print(
+            f"{case:<40}{measurement['time'] * 1000:>12.3f}{measurement['com_calls']:>12}"
+        )
+    return measurements
+
+
+def benchmark_surrogate_screen():
+
+    # how many analyses the surrogate screen (surrogate.py) saves, and whether it keeps the Pareto front.
+    # the screened sweep looks the rows of native_ground_truth up instead of analysing them. recall is the
+    # share of the true front (truth_front) analysed. tests/test_surrogate.py checks the order and the rows
+    catalog, truth = native_ground_truth(36)
+    combinations = [list(combination) for combination in truth]
+
+    front = truth_front(truth)
+    run_sweep = truth_sweep(truth)
+
+    print(
+        f"Surrogate screen, {len(combinations)} combinations, {len(front)} on the Pareto front"
+    )
+    print(
+        f"{'z':>6}{'seed':>6}{'analysed':>10}{'skipped':>10}{'reduction':>11}"
+        f"{'recall':>9}{'time (s)':>10}"
+    )
+    for z in (1.0, 2.0, 3.0):
+        for seed in (0, 1):
+            screen = open_screen(z=z, seed=seed)
+            start = time.perf_counter()
+            rows = list(screened_sweep(combinations, catalog, screen, run_sweep))
+            elapsed = time.perf_counter() - start
+            analysed = {
+                tuple(combination) for combination, row in rows if not is_screened(row)
+            }
+            print(
+                f"{z:>6}{seed:>6}{len(analysed):>10}"
+                f"{len(combinations) - len(analysed):>10}"
+                f"{len(combinations) / len(analysed):>11.1f}"
+                f"{len(front & analysed) / len(front):>9.2f}{elapsed:>10.2f}"
+            )
+
+
+def benchmark_dominance_pruning():
+
+    # how many analyses the dominance pruning (pruning.py) saves on the sorted sweep of native_ground_truth,
+    # with the pruned combinations that actually pass ULS (none with A and I). tests/test_pruning.py checks
+    # that the optimum doesn't change
+    catalog, truth = native_ground_truth(36)
+    combinations = [list(combination) for combination in truth]
+    run_sweep = truth_sweep(truth)
+
+    print(f"Dominance pruning, {len(combinations)} combinations")
+    print(
+        f"{'properties':>12}{'analysed':>10}{'pruned':>8}{'passing pruned':>16}"
+        f"{'time (s)':>10}"
+    )
+    for properties in [("A", "I"), ("A",), ("I",)]:
+        pruning = open_pruning(properties)
+        start = time.perf_counter()
+        analysed = {
+            tuple(combination)
+            for combination, row in pruned_sweep(
+                combinations, catalog, pruning, run_sweep
+            )
+        }
+        elapsed = time.perf_counter() - start
+        passing_pruned = sum(
+            1
+            for combination, row in truth.items()
+            if row[PASSED_COLUMN] and combination not in analysed
+        )
+        print(
+            f"{','.join(properties):>12}{len(analysed):>10}"
+            f"{pruning['audit']['pruned']:>8}{passing_pruned:>16}{elapsed:>10.2f}"
+        )
+
+
+def benchmark_sweep_stack():
+
+    # the surrogate screen and the dominance pruning composed like main.py (pruning around the screen, so it
+    # sees the sorted order) against the other way around and each on its own, on native_ground_truth.
+    # recall is the share of the true Pareto front (truth_front) analysed. tests/test_pruning.py checks the
+    # order and the rows of the main.py stack
+    catalog, truth = native_ground_truth(36)
+    combinations = [list(combination) for combination in truth]
+    run_sweep = truth_sweep(truth)
+
+    front = truth_front(truth)
+
+    def screened(run_sweep, screen):
+        return lambda combinations: screened_sweep(
+            combinations, catalog, screen, run_sweep
+        )
+
+    def pruned(run_sweep, pruning):
+        return lambda combinations: pruned_sweep(
+            combinations, catalog, pruning, run_sweep
+        )
+
+    print(
+        f"Sweep stack, {len(combinations)} combinations, {len(front)} on the Pareto front"
+    )
+    print(
+        f"{'stack':>16}{'analysed':>10}{'screened':>10}{'pruned':>8}{'recall':>8}"
+        f"{'time (s)':>10}"
+    )
+    for name in ("screen", "pruning", "screen(pruning)", "pruning(screen)"):
+        screen = open_screen()
+        pruning = open_pruning()
+        if name == "screen":
+            stack = screened(run_sweep, screen)
+        elif name == "pruning":
+            stack = pruned(run_sweep, pruning)
+        elif name == "screen(pruning)":
+            stack = screened(pruned(run_sweep, pruning), screen)
+        else:
+            stack = pruned(screened(run_sweep, screen), pruning)
+
+        start = time.perf_counter()
+        rows = list(stack(combinations))
+        elapsed = time.perf_counter() - start
+        analysed = {
+            tuple(combination) for combination, row in rows if not is_screened(row)
+        }
+        print(
+            f"{name:>16}{len(analysed):>10}{len(rows) - len(analysed):>10}"
+            f"{pruning['audit']['pruned']:>8}{len(front & analysed) / len(front):>8.2f}"
+            f"{elapsed:>10.2f}"
+        )
+
+
+def benchmark_pareto():
+
+    # time of the Pareto front, the ranking (first 10 ranks) and the crowding distance vs number of rows,
+    # on synthetic results shaped like a sweep (heavier combinations deflect less and resonate higher).
+    # tests/test_pareto.py checks the front and the ranks against comparing every pair of rows
+    rng = np.random.default_rng(0)
+
+    def synthetic_objectives(num_rows):
+        area = rng.lognormal(0.0, 0.5, (num_rows, 3))
+        mass = area.sum(axis=1)
+        deflection = (1.0 / area).sum(axis=1) * rng.uniform(0.8, 1.2, num_rows)
+        harmonic = np.sqrt(area[:, 0] + area[:, 1]) / np.sqrt(mass)
+        return np.column_stack([np.round(mass, 3), deflection, -harmonic])
+
+    print("Pareto front and ranking, 3 objectives, time (s)")
+    print(
+        f"{'rows':>10}{'front':>8}{'front (s)':>11}{'10 ranks (s)':>14}{'crowding (s)':>14}"
+    )
+    for num_rows in (10**4, 10**5, 10**6):
+        objectives = synthetic_objectives(num_rows)
+        start = time.perf_counter()
+        front = nondominated(objectives)
+        front_time = time.perf_counter() - start
+        start = time.perf_counter()
+        ranks = pareto_ranks(objectives, max_rank=10)
+        rank_time = time.perf_counter() - start
+        start = time.perf_counter()
+        crowding_distance(objectives, ranks)
+        crowding_time = time.perf_counter() - start
+        print(
+            f"{num_rows:>10}{np.sum(front):>8}{front_time:>11.3f}{rank_time:>14.3f}"
+            f"{crowding_time:>14.3f}"
+        )
+
+
+def benchmark_early_stopping():
+
+    # the online Pareto front (pareto.py) over the sorted sweep of native_ground_truth: how many analyses
+    # stop_early saves for a few stop_unchanged limits, whether the best combination when it stops is the
+    # one determine_optimal_section picks from the full sweep, and how much of the full front it found.
+    # tests/test_pareto.py checks the online front of the full sweep and that stopping closes SAP
+    catalog, truth = native_ground_truth(36)
+    combinations = [list(combination) for combination in truth]
+    run_sweep = truth_sweep(truth)
+
+    passed = [row for row in truth.values() if row[PASSED_COLUMN]]
+    objectives = np.array(
+        [[row[column] for column in OBJECTIVE_COLUMNS] for row in passed]
+    ) * [1.0, -1.0, 1.0]
+    front = {
+        (row["Top chord"], row["Bottom chord"], row["Web members"])
+        for row, is_front in zip(passed, nondominated(objectives))
+        if is_front
+    }
+    columns = [
+        np.array([row[column] for row in passed]) for column in OBJECTIVE_COLUMNS
+    ]
+    optimum = passed[determine_optimal_section(*columns)]
+
+    def combination_of(row):
+        return (row["Top chord"], row["Bottom chord"], row["Web members"])
+
+    print(
+        f"Early stopping, {len(combinations)} combinations, {len(front)} on the Pareto front"
+    )
+    print(f"{'unchanged':>10}{'analysed':>10}{'same optimum':>14}{'front found':>13}")
+    for max_unchanged in (50, 100, 200, 400, 800):
+        online_front = open_online_front(max_unchanged)
+        for _ in stop_early(run_sweep(combinations), online_front):
+            pass
+        found = {combination_of(row) for row in online_front["rows"]} & front
+        same = combination_of(online_optimum(online_front)) == combination_of(optimum)
+        print(
+            f"{max_unchanged:>10}{online_front['analyses']:>10}{str(same):>14}"
+            f"{len(found) / len(front):>13.2f}"
+        )
+
+
+def benchmark_load_combinations():
+
+    # time of the member design check and the deflection of a batch vs the number of load combinations,
+    # superposed from the pattern results of one native_run_batch (load_combinations.py), against the
+    # time of the solve, and the COM calls of extra combinations on the fake SAP object.
+    # tests/test_load_combinations.py checks the superposition and the envelope
+    num_combinations = 64
+    tables = sweep_section_tables(num_combinations)
+    model, bottom_chord_frames = build_native_model(5, 3)
+    prepared = native_prepare(model)
+    uls_combinations, sls_combinations = design_combinations(1.1, 1.7, 1.5, 1.2, 1.5)
+
+    start = time.perf_counter()
+    batch = native_run_batch(prepared, tables)
+    solve_time = time.perf_counter() - start
+
+    rng = np.random.default_rng(0)
+    print(
+        f"Load combinations, {num_combinations} section combinations, solve "
+        f"{solve_time * 1000:.1f} ms"
+    )
+    print(
+        f"{'combinations':>13}{'design (ms)':>13}{'deflection (ms)':>17}{'of solve':>10}"
+    )
+    for count in (1, 4, 16, 64):
+        # the ULS and SLS combinations and count - 1 more with random factors
+        combinations = dict(uls_combinations)
+        for i in range(count - 1):
+            combinations[f"ULS {i}"] = {
+                pattern: factor * rng.uniform(0.5, 1.2)
+                for pattern, factor in uls_combinations["ULS"].items()
+            }
+        start = time.perf_counter()
+        native_member_utilization(prepared, batch, tables, combinations=combinations)
+        design_time = time.perf_counter() - start
+        start = time.perf_counter()
+        native_batch_deflection(
+            prepared, batch, bottom_chord_frames, 30.0, combinations
+        )
+        deflection_time = time.perf_counter() - start
+
+        print(
+            f"{count:>13}{design_time * 1000:>13.2f}{deflection_time * 1000:>17.2f}"
+            f"{(design_time + deflection_time) / solve_time:>10.2f}"
+        )
+
+    methods = [
+        "Analyze.RunAnalysis",
+        "Results.JointDispl",
+        "Results.FrameForce",
+        "RespCombo.Add",
+    ]
+    print("Fake SAP, COM calls for 8 combinations")
+    print(f"{'combinations':>13}" + "".join(f"{m.split('.')[1]:>14}" for m in methods))
+    with tempfile.TemporaryDirectory() as directory:
+        for count in (1, 16):
+            settings = build_sweep_settings(1, 3, directory)
+            for i in range(count - 1):
+                settings["uls_combinations"][f"ULS {i}"] = dict(
+                    uls_combinations["ULS"], SNOW=0.5 * i
+                )
+                settings["sls_combinations"][f"SLS {i}"] = dict(
+                    sls_combinations["SLS"], SNOW=0.1 * i
+                )
+            open_function, sap_objects = recording_sap_open()
+
+            list(sap_sweep(sweep_combinations(8), settings, 1, open_function))
+            calls = sap_objects[0].SapModel.calls
+            assert not sap_objects[0].SapModel.errors, sap_objects[0].SapModel.errors
+            print(f"{count:>13}" + "".join(f"{calls[m]:>14}" for m in methods))
+
+
+def benchmark_pattern_live_load():
+
+    # pattern live loading (load_combinations.py) on the native model: what the envelope of the
+    # arrangements changes, and its cost against the solve and against one solve per arrangement, and the
+    # COM calls of the arrangements on the fake SAP object. tests/test_pattern_live_load.py checks the span
+    # patterns and the superposed arrangements
+    num_combinations = 64
+    num_spans = 5
+    tables = sweep_section_tables(num_combinations)
+    model, bottom_chord_frames = build_native_model(num_spans, 3)
+    uniform = native_prepare(model)
+    native_span_live_loads(model, bottom_chord_frames, num_spans, 3, 5.79)
+    prepared = native_prepare(model)
+
+    start = time.perf_counter()
+    native_run_batch(uniform, tables)
+    uniform_time = time.perf_counter() - start
+    start = time.perf_counter()
+    batch = native_run_batch(prepared, tables)
+    solve_time = time.perf_counter() - start
+
+    uls_combinations, sls_combinations = design_combinations(1.1, 1.7, 1.5, 1.2, 1.5)
+
+    print(
+        f"Pattern live load, {num_spans} spans, {num_combinations} section combinations, solve "
+        f"{uniform_time * 1000:.1f} ms uniform, {solve_time * 1000:.1f} ms with the span patterns"
+    )
+    print(
+        f"{'arrangements':>13}{'combinations':>14}{'check (ms)':>12}{'of solve':>10}"
+        f"{'speedup':>11}{'deflection':>12}{'failing':>9}"
+    )
+    # deflection over the fully loaded deflection, and section combinations that only fail with the
+    # arrangements
+    base_deflection = native_batch_deflection(
+        prepared, batch, bottom_chord_frames, 30.0, sls_combinations
+    )[0]
+    base_passed = native_member_design(
+        prepared, batch, tables, combinations=uls_combinations
+    )[0]
+    for arrangements in ("alternate", "all"):
+        uls = dict(uls_combinations)
+        uls.update(pattern_live_combinations(uls, num_spans, arrangements))
+        sls = dict(sls_combinations)
+        sls.update(pattern_live_combinations(sls, num_spans, arrangements))
+
+        start = time.perf_counter()
+        deflection = native_batch_deflection(
+            prepared, batch, bottom_chord_frames, 30.0, sls
+        )[0]
+        passed = native_member_design(prepared, batch, tables, combinations=uls)[0]
+        check_time = time.perf_counter() - start
+
+        # speedup against one solve per arrangement
+        num_arrangements = len(span_arrangements(num_spans, arrangements)) + 1
+        print(
+            f"{num_arrangements:>13}{len(uls) + len(sls):>14}{check_time * 1000:>12.2f}"
+            f"{check_time / solve_time:>10.2f}"
+            f"{num_arrangements * uniform_time / (solve_time + check_time):>11.1f}"
+            f"{np.max(deflection / base_deflection):>12.3f}"
+            f"{np.sum(np.array(base_passed) & ~np.array(passed)):>9}"
+        )
+
+    methods = ["Analyze.RunAnalysis", "Results.JointDispl", "RespCombo.Add"]
+    print("Fake SAP, 3 spans, 8 combinations")
+    print(f"{'arrangements':>13}" + "".join(f"{m.split('.')[1]:>14}" for m in methods))
+    with tempfile.TemporaryDirectory() as directory:
+        for arrangements in (None, "alternate", "all"):
+            settings = build_sweep_settings(3, 3, directory)
+            settings["pattern_live_load"] = arrangements
+            if arrangements is not None:
+                for combinations in ("uls_combinations", "sls_combinations"):
+                    settings[combinations].update(
+                        pattern_live_combinations(
+                            settings[combinations], 3, arrangements
+                        )
+                    )
+            open_function, sap_objects = recording_sap_open()
+
+            list(sap_sweep(sweep_combinations(8), settings, 1, open_function))
+            sap_model = sap_objects[0].SapModel
+            assert not sap_model.errors, sap_model.errors
+            print(
+                f"{str(arrangements):>13}"
+                + "".join(f"{sap_model.calls[m]:>14}" for m in methods)
+            )
+
+
+def compare_measurements(measurements, baseline, tolerance):
+
+    # cases slower than the baseline by more than tolerance (a fraction, with 1 ms of slack for timer
+    # noise), or making more COM calls. returns the list of regressions as text
+    regressions = []
+    for case, measurement in measurements.items():
+        if case not in baseline:
+            continue
+        old = baseline[case]
+        if measurement["time"] > old["time"] * (1.0 + tolerance) + 0.001:
+            regressions.append(
+                f"{case}: {old['time'] * 1000:.3f} ms -> {measurement['time'] * 1000:.3f} ms"
+            )
+        if measurement["com_calls"] > old["com_calls"]:
+            regressions.append(
+                f"{case}: {old['com_calls']} -> {measurement['com_calls']} COM calls"
+            )
+    return regressions
+
+
+BENCHMARKS = {
+    "native_solver": benchmark_native_solver,
+    "parallel_sweep": benchmark_parallel_sweep,
+    "output_writing": benchmark_output_writing,
+    "analysis_cache": benchmark_analysis_cache,
+    "template_model": benchmark_template_model,
+    "com_calls": benchmark_com_calls,
+    "profiling": benchmark_profiling,
+    "pipeline": benchmark_pipeline,
+    "surrogate_screen": benchmark_surrogate_screen,
+    "dominance_pruning": benchmark_dominance_pruning,
+    "sweep_stack": benchmark_sweep_stack,
+    "pareto": benchmark_pareto,
+    "early_stopping": benchmark_early_stopping,
+    "load_combinations": benchmark_load_combinations,
+    "pattern_live_load": benchmark_pattern_live_load,
+}
+
+
+if __name__ == "__main__":
+
+    # benchmarks that return measurements ({case: {"time": s, "com_calls": n}}) can be saved and compared
+    parser = argparse.ArgumentParser()
+    parser.add_argument("names", nargs="*", help=", ".join(BENCHMARKS))
+    parser.add_argument("--save", help="write the measurements to this json file")
+    parser.add_argument("--compare", help="baseline json file written by --save")
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=1.0,
+        help="allowed slowdown over the baseline, as a fraction (timings on shared CI machines vary a lot, "
+        "the COM call counts are compared exactly)",
+    )
+    args = parser.parse_args()
+    for name in args.names:
+        if name not in BENCHMARKS:
+            parser.error(f"unknown benchmark {name}")
+
+    measurements = {}
+    for name in args.names or list(BENCHMARKS):
+        measured = BENCHMARKS[name]()
+        if measured:
+            measurements.update(measured)
+        print()
+
+    if args.save:
+        with open(args.save, "w") as file:
+            json.dump(measurements, file, indent=2)
+        print(f"Saved {len(measurements)} measurements to {args.save}.")
+    if args.compare:
+        with open(args.compare) as file:
+            baseline = json.load(file)
+        regressions = compare_measurements(measurements, baseline, args.tolerance)
+        for regression in regressions:
+            print(f"Regression: {regression}")
+        if regressions:
+            sys.exit(1)
+        print(f"No regressions against {args.compare}.")
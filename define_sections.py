@@ -1,327 +1,317 @@
-import xml.etree.ElementTree as ET
+import csv
+import os
+
 import pandas as pd
-from fractions import Fraction
+import numpy as np
 
+from section_catalog import *
+from profiling import profiled
 
-def load_xml_steel():
-    # load xml file from SAP2000 installation folder
-    tree = ET.parse(
-        r"C:\Program Files\Computers and Structures\SAP2000 26\Property Libraries\Sections\CISC10.xml"
-    )
-    root = tree.getroot()
+# section libraries from the SAP2000 installation folder
+STEEL_LIBRARY = r"C:\Program Files\Computers and Structures\SAP2000 26\Property Libraries\Sections\CISC10.xml"
+ALU_LIBRARY = r"C:\Program Files\Computers and Structures\SAP2000 26\Property Libraries\Sections\AA2020.xml"
 
-    ns = {"csi": "http://www.csiberkeley.com"}
 
-    # find all steel pipe (round)
-    round_pipe = root.findall(".//csi:STEEL_PIPE", ns)
+def write_sections_excel(catalog, names, output_path):
 
-    # filter the labels
-    hss_round = []
-    for pipe in round_pipe:
-        label = pipe.find("csi:LABEL", ns)
-        if label is not None and label.text.startswith("HS"):
-            hss_round.append(label.text)
+    # write the round and box sections to an excel file for easier reference
+    hss_round = list(catalog["label"][catalog["is_round"]])
+    hss_box = list(catalog["label"][~catalog["is_round"]])
+    max_len = max(len(hss_round), len(hss_box))
+    hss_round += [None] * (max_len - len(hss_round))
+    hss_box += [None] * (max_len - len(hss_box))
 
-    # find all HSS sections
-    hss = root.findall(".//csi:STEEL_BOX", ns)
+    df = pd.DataFrame({names[0]: hss_round, names[1]: hss_box})
+    df.to_excel(output_path, index=False)
 
-    hss_box = []
-    for pipe in hss:
-        label = pipe.find("csi:LABEL", ns)
-        if label is not None and label.text.startswith("HS"):
-            hss_box.append(label.text)
 
-    # write sections to excel file for easier reference
-    max_len = max(len(hss_round), len(hss_box))
-    hss_round_excel = hss_round.copy()
-    hss_box_excel = hss_box.copy()
-    hss_round_excel += [None] * (max_len - len(hss_round))
-    hss_box_excel += [None] * (max_len - len(hss_box))
+def load_xml_steel():
+    # load the HSS pipe (round) and box sections from the xml file, cached after the first run
+    catalog = load_section_catalog(
+        STEEL_LIBRARY, False, {"STEEL_PIPE": "HS", "STEEL_BOX": "HS"}
+    )
+    write_sections_excel(catalog, ["HSS Round", "HSS Box"], "./steel_sections.xlsx")
+    return catalog
 
-    # Create DataFrame
-    df = pd.DataFrame({"HSS Round": hss_round_excel, "HSS Box": hss_box_excel})
 
-    output_path = "./steel_sections.xlsx"
-    df.to_excel(output_path, index=False)
+def load_xml_alu():
+    # load the aluminum pipe (round) and box sections from the xml file, cached after the first run
+    catalog = load_section_catalog(
+        ALU_LIBRARY, True, {"STEEL_PIPE": "PIPE", "STEEL_BOX": "RT"}
+    )
+    write_sections_excel(
+        catalog, ["Aluminum Pipe", "Aluminum Box"], "./aluminum_sections.xlsx"
+    )
+    return catalog
 
-    return hss_round, hss_box
 
+def filter_sections(
+    catalog, sections, min_depth, min_thick, max_depth, max_thick, asym=False
+):
 
-def load_xml_alu():
-    # load xml file from SAP2000 installation folder
-    tree = ET.parse(
-        r"C:\Program Files\Computers and Structures\SAP2000 26\Property Libraries\Sections\AA2020.xml"
+    # sections is an array of catalog indices, the limits are in library units (mm or inches)
+    # returns the indices that pass, in the same order
+    depth = catalog["depth"][sections]
+    thick = catalog["thickness"][sections]
+    width = catalog["width"][sections]
+
+    keep = (
+        (depth >= min_depth)
+        & (thick >= min_thick)
+        & (depth <= max_depth)
+        & (thick <= max_thick)
     )
-    root = tree.getroot()
+    # asym limits the section to be square
+    if asym:
+        keep &= width == depth
 
-    ns = {"csi": "http://www.csiberkeley.com"}
+    return sections[keep]
 
-    # find all steel pipe (round)
-    round_pipe = root.findall(".//csi:STEEL_PIPE", ns)
 
-    # filter the labels
-    alu_round = []
-    for pipe in round_pipe:
-        label = pipe.find("csi:LABEL", ns)
-        if label is not None and label.text.startswith("PIPE"):
-            alu_round.append(label.text)
+# constraint predicates for combination_chunks. each takes the catalog and the top, bottom and web
+# catalog indices (numpy arrays that broadcast against each other) and returns a boolean mask of the
+# combinations that pass. limits are in library units (mm or inches) unless stated otherwise
+def depth_gap(min_d_diff):
+    # top chord deeper than the bottom chord, and bottom chord deeper than the web, by at least min_d_diff
+    def predicate(catalog, top, bottom, web):
+        depth = catalog["depth"]
+        return ((depth[top] - depth[bottom]) >= min_d_diff) & (
+            (depth[bottom] - depth[web]) >= min_d_diff
+        )
 
-    # find all HSS sections
-    hss = root.findall(".//csi:STEEL_BOX", ns)
+    return predicate
 
-    alu_box = []
-    for pipe in hss:
-        label = pipe.find("csi:LABEL", ns)
-        if label is not None and label.text.startswith("RT"):
-            alu_box.append(label.text)
 
-    # write sections to excel file for easier reference
-    max_len = max(len(alu_round), len(alu_box))
-    alu_round_excel = alu_round.copy()
-    alu_box_excel = alu_box.copy()
-    alu_round_excel += [None] * (max_len - len(alu_round))
-    alu_box_excel += [None] * (max_len - len(alu_box))
+def width_match(max_ratio=1.0):
+    # for the connections, the web can't be wider than max_ratio times either chord
+    def predicate(catalog, top, bottom, web):
+        width = catalog["width"]
+        return (width[web] <= max_ratio * width[top]) & (
+            width[web] <= max_ratio * width[bottom]
+        )
 
-    # Create DataFrame
-    df = pd.DataFrame({"Aluminum Pipe": alu_round_excel, "Aluminum Box": alu_box_excel})
+    return predicate
 
-    output_path = "./aluminum_sections.xlsx"
-    df.to_excel(output_path, index=False)
 
-    return alu_round, alu_box
+def thickness_ratio(max_ratio=1.0):
+    # web thickness over chord thickness, the web shouldn't be thicker than the chord it is welded to
+    def predicate(catalog, top, bottom, web):
+        thick = catalog["thickness"]
+        return (thick[web] <= max_ratio * thick[top]) & (
+            thick[web] <= max_ratio * thick[bottom]
+        )
 
+    return predicate
+
+
+def max_mass(limit):
+    # sum of the mass per length (kg/m) of the top chord, bottom chord and web sections
+    def predicate(catalog, top, bottom, web):
+        mass = catalog["mass"]
+        return (mass[top] + mass[bottom] + mass[web]) <= limit
+
+    return predicate
 
-def filter_HSS_sections_steel(
-    sections, min_depth, min_thick, max_depth, max_thick, asym=False
-):
 
-    filtered_sections = []
-    for section in sections:
-        # name is in format HS###X## (round) and HS###X###X## (box)
-        # split section name into before and after 'X'
-        # depth is always the first dim and thickness always the last dim
-        parts = section.split("X")
-        # get diameter as everything after 'HS' and before 'X', and convert to int
-        depth = int(parts[0][2:])
-        # get numbers after 'X' and convert to float
-        thick = float(parts[-1])
-        # get width if applicable
-        width = depth
-        if len(parts) == 3:
-            width = int(parts[1])
-
-        if (
-            depth >= min_depth
-            and thick >= min_thick
-            and depth <= max_depth
-            and thick <= max_thick
-        ):
-            if asym == True and width != depth:
-                pass
-            else:
-                filtered_sections.append(section)
-
-    return filtered_sections
-
-
-def filter_sections_alu(
-    sections, min_depth, min_thick, max_depth, max_thick, asym=False
+def combination_chunks(
+    catalog, top_sections, bottom_sections, web_sections, predicates, chunk_size=1024
 ):
 
-    # strip out the whitespace and replace "PIPE" with "PI" to more easily filter
-    temp = [s.replace(" ", "") for s in sections]
-    temp = [s.replace("PIPE", "PI") for s in temp]
-
-    filtered_sections = []
-    for index, section in enumerate(temp):
-        # name is in format PI###X## (round) and RT###X###X## (box)
-        # split section name into before and after 'X'
-        # depth is always the first dim and thickness always the last dim
-        parts = section.split("X")
-        # get diameter as everything after 'PI/RT' and before 'X', and convert to float
-        depth = float(Fraction(parts[0][2:]))
-        # get numbers after 'X' and convert to float
-        thick = float(Fraction(parts[-1]))
-        # get width if applicable
-        width = depth
-        if len(parts) == 3:
-            width = float(Fraction(parts[1]))
-
-        if (
-            depth >= min_depth
-            and thick >= min_thick
-            and depth <= max_depth
-            and thick <= max_thick
-        ):
-            if asym == True and width != depth:
-                pass
-            else:
-                filtered_sections.append(sections[index])
-
-    return filtered_sections
-
-
-def valid_combinations_steel(top_sections, bottom_sections, web_sections):
-    combinations = []
-    # to limit number of combinations, specify a minimum difference between the top and bottom chord
-    # as well as web and bottom chord of 50mm
-    min_d_diff = 50
+    # yields (chunk size, 3) arrays of catalog indices [top, bottom, web] that pass every predicate, in the
+    # same order as looping over top, then bottom, then web. only one top section (bottom x web grid) is
+    # checked at a time, so memory doesn't grow with the catalog and nothing is built until it is asked for
+    # use catalog["label"][chunk] to get the names
+    buffer = []
+    buffered = 0
+    bottom = bottom_sections[:, None]
+    web = web_sections[None, :]
     for top in top_sections:
-        temp = top.split("X")
-        top_d = int(temp[0][2:])
-        for bottom in bottom_sections:
-            temp = bottom.split("X")
-            bottom_d = int(temp[0][2:])
-            if (top_d - bottom_d) >= min_d_diff:
-                for web in web_sections:
-                    temp = web.split("X")
-                    web_d = int(temp[0][2:])
-                    if (bottom_d - web_d) >= min_d_diff:
-                        combinations.append([top, bottom, web])
-    return combinations
-
-
-def valid_combinations_alu(top_sections, bottom_sections, web_sections):
-    combinations = []
+        mask = np.ones((len(bottom_sections), len(web_sections)), dtype=bool)
+        for predicate in predicates:
+            mask &= predicate(catalog, top, bottom, web)
+
+        bottom_index, web_index = np.nonzero(mask)
+        if len(bottom_index) == 0:
+            continue
+        buffer.append(
+            np.stack(
+                [
+                    np.full(len(bottom_index), top),
+                    bottom_sections[bottom_index],
+                    web_sections[web_index],
+                ],
+                axis=1,
+            )
+        )
+        buffered += len(bottom_index)
+
+        while buffered >= chunk_size:
+            combinations = np.concatenate(buffer)
+            yield combinations[:chunk_size]
+            buffer = [combinations[chunk_size:]]
+            buffered -= chunk_size
+
+    if buffered > 0:
+        yield np.concatenate(buffer)
+
+
+def iterate_combinations(catalog, chunks):
+    # flattens combination_chunks into one item per combination: the labels of its chunk, its index in
+    # the chunk and its [top, bottom, web] labels. the labels are looked up once per chunk
+    for chunk in chunks:
+        chunk_labels = catalog["label"][chunk].tolist()
+        for chunk_index, combination in enumerate(chunk_labels):
+            yield chunk_labels, chunk_index, combination
+
+
+def valid_combinations(
+    catalog, top_sections, bottom_sections, web_sections, min_d_diff
+):
     # to limit number of combinations, specify a minimum difference between the top and bottom chord
-    # as well as web and bottom chord of 2inch (around 50mm)
-
-    # strip out the whitespace
-    temp_top = [s.replace(" ", "") for s in top_sections]
-    temp_top = [s.replace("PIPE", "PI") for s in temp_top]
-    temp_bottom = [s.replace(" ", "") for s in bottom_sections]
-    temp_bottom = [s.replace("PIPE", "PI") for s in temp_bottom]
-    temp_web = [s.replace(" ", "") for s in web_sections]
-    temp_web = [s.replace("PIPE", "PI") for s in temp_web]
-
-    min_d_diff = 2
-    for index_top, top in enumerate(temp_top):
-        temp = top.split("X")
-        top_d = float(Fraction(temp[0][2:]))
-        for index_bottom, bottom in enumerate(temp_bottom):
-            temp = bottom.split("X")
-            bottom_d = float(Fraction(temp[0][2:]))
-            if (top_d - bottom_d) >= min_d_diff:
-                for index_web, web in enumerate(temp_web):
-                    temp = web.split("X")
-                    web_d = float(Fraction(temp[0][2:]))
-                    if (bottom_d - web_d) >= min_d_diff:
-                        combinations.append(
-                            [
-                                top_sections[index_top],
-                                bottom_sections[index_bottom],
-                                web_sections[index_web],
-                            ]
-                        )
-    return combinations
+    # as well as web and bottom chord
+    # returns every combination at once as an (num combinations, 3) array of catalog indices [top, bottom, web]
+    chunks = list(
+        combination_chunks(
+            catalog,
+            top_sections,
+            bottom_sections,
+            web_sections,
+            [depth_gap(min_d_diff)],
+        )
+    )
+    if len(chunks) == 0:
+        return np.zeros((0, 3), dtype=int)
+    return np.concatenate(chunks)
+
+
+def sort_by_size(catalog, sections):
+    # sort sections based on size (depth, width, thickness), largest first
+    order = np.lexsort(
+        (
+            catalog["thickness"][sections],
+            catalog["width"][sections],
+            catalog["depth"][sections],
+        )
+    )
+    return sections[order][::-1]
 
 
 # we are limiting bottom and top chord to be box only for connection purposes
 # top chord > bottom chord > web
 # for box limit to square section no rectangle (for now to limit combinations)
-def create_section_combinations_steel():
+def create_section_combinations_steel(chunk_size=1024):
 
-    round, box = load_xml_steel()
+    # returns the catalog and one lazy combination_chunks generator per combination type
+    catalog = load_xml_steel()
+    round = np.flatnonzero(catalog["is_round"])
+    box = np.flatnonzero(~catalog["is_round"])
 
     """ ------------------------ FILTER ROUND SECTIONS ------------------------ """
     # web is smaller than bottom chord. don't specify a min or max diameter, that will be taken care of in
-    # the valid_combinations_steel function. limit thickness 7.9-9.5
-    web_round = filter_HSS_sections_steel(round, 0, 7.9, 500, 9.5)
+    # the depth_gap predicate. limit thickness 7.9-9.5
+    web_round = filter_sections(catalog, round, 0, 7.9, 500, 9.5)
 
     """ ------------------------ FILTER BOX SECTIONS ------------------------ """
 
-    # sort box sections based on size (depth, width, thickness)
     # in xml they are ordered by square first then rectangle
-    box = sorted(
-        box,
-        key=lambda x: (
-            int(x[2 : x.index("X")]),
-            int(x[x.index("X") + 1 : x.index("X", x.index("X") + 1)]),
-            float(x[x.index("X", x.index("X") + 1) + 1 :]),
-        ),
-    )
-    # reverse list
-    box.reverse()
+    box = sort_by_size(catalog, box)
 
     # limit top chord to be depth 200+ and thickness 7.9-9.5
-    top_chord_box = filter_HSS_sections_steel(box, 200, 7.9, 356, 9.5)
+    top_chord_box = filter_sections(catalog, box, 200, 7.9, 356, 9.5)
     # limit bottom chord depth no bottom limit, 305 top, 7.9-9.5
-    bottom_chord_box = filter_HSS_sections_steel(box, 0, 7.9, 305, 9.5)
+    bottom_chord_box = filter_sections(catalog, box, 0, 7.9, 305, 9.5)
     # limit web depth no bottom limit, top limit 203
     # limit the web to be only square sections
-    web_box = filter_HSS_sections_steel(box, 0, 7.9, 203, 9.5, asym=True)
+    web_box = filter_sections(catalog, box, 0, 7.9, 203, 9.5, asym=True)
 
     """ ------------------------ CREATE COMBINATIONS ------------------------ """
 
-    # [top, bottom, web]
-    box_box_box = valid_combinations_steel(top_chord_box, bottom_chord_box, web_box)
-    box_box_round = valid_combinations_steel(top_chord_box, bottom_chord_box, web_round)
-    return [box_box_box, box_box_round]
-
-
-def parse_fraction(s: str) -> float:
-    s = s.strip()
-    if " " in s:  # mixed number like "1 1/2"
-        whole, frac = s.split()
-        return float(whole) + float(Fraction(frac))
-    return float(Fraction(s))  # simple float or fraction
+    # [top, bottom, web], minimum depth difference of 50mm. more constraints can be added to the list,
+    # ex. width_match(), thickness_ratio(1.0) or max_mass(150)
+    predicates = [depth_gap(50)]
+    box_box_box = combination_chunks(
+        catalog, top_chord_box, bottom_chord_box, web_box, predicates, chunk_size
+    )
+    box_box_round = combination_chunks(
+        catalog, top_chord_box, bottom_chord_box, web_round, predicates, chunk_size
+    )
+    return catalog, [box_box_box, box_box_round]
 
 
-def create_section_combinations_alu():
+def create_section_combinations_alu(chunk_size=1024):
 
-    round, box = load_xml_alu()
+    # returns the catalog and one lazy combination_chunks generator per combination type
+    # only round sections are used for aluminum. for box chords, filter the box sections like in
+    # create_section_combinations_steel (limits 0-13 inch deep, 0.25-1 inch thick, square webs)
+    catalog = load_xml_alu()
+    round = np.flatnonzero(catalog["is_round"])
 
     """ ------------------------ FILTER ROUND SECTIONS ------------------------ """
     # sort the round sections based on the diameter
-    round = sorted(round, key=lambda x: parse_fraction(x.split()[1]))
-    round.reverse()
+    round = round[np.argsort(catalog["depth"][round], kind="stable")][::-1]
 
     # limit thickness to be 0.5-1.0 inch
-    top_chord_round = filter_sections_alu(round, 8, 0.5, 13, 1.0)
-    bottom_chord_round = filter_sections_alu(round, 6, 0.5, 10, 1.0)
-    web_round = filter_sections_alu(round, 5, 0.5, 8, 1.0)
+    top_chord_round = filter_sections(catalog, round, 8, 0.5, 13, 1.0)
+    bottom_chord_round = filter_sections(catalog, round, 6, 0.5, 10, 1.0)
+    web_round = filter_sections(catalog, round, 5, 0.5, 8, 1.0)
 
-    """ ------------------------ FILTER BOX SECTIONS ------------------------ """
+    """ ------------------------ CREATE COMBINATIONS ------------------------ """
 
-    # sort box sections based on size (depth, width, thickness)
-    # idk chatgpt wrote this
-    box = sorted(
-        box,
-        key=lambda x: tuple(
-            parse_fraction(part) for part in x.replace("RT", "").strip().split("X")
-        ),
+    # [top, bottom, web], minimum depth difference of 2inch (around 50mm). more constraints can be added
+    # to the list, ex. thickness_ratio(1.0) or max_mass(60)
+    predicates = [depth_gap(2)]
+    round_round_round = combination_chunks(
+        catalog,
+        top_chord_round,
+        bottom_chord_round,
+        web_round,
+        predicates,
+        chunk_size,
     )
-    # reverse list
-    box.reverse()
+    return catalog, [round_round_round]
 
-    top_chord_box = filter_sections_alu(box, 0, 0.25, 13, 1)
-    bottom_chord_box = filter_sections_alu(box, 0, 0.25, 13, 1)
-    web_box = filter_sections_alu(box, 0, 0.25, 13, 1, asym=True)
 
-    """ ------------------------ CREATE COMBINATIONS ------------------------ """
+def section_properties(section, is_alu, catalog=None):
 
-    # [top, bottom, web]
-    box_box_box = valid_combinations_alu(top_chord_box, bottom_chord_box, web_box)
-    box_box_round = valid_combinations_alu(top_chord_box, bottom_chord_box, web_round)
-    round_round_round = valid_combinations_alu(
-        top_chord_round, bottom_chord_round, web_round
-    )
-    print(len(round_round_round))
-    return [round_round_round]
+    # section properties in m, from the catalog if given, otherwise from the dimensions in the label
+    if catalog is not None:
+        return catalog_properties(catalog, section)
 
+    depth, width, thick, is_round = section_dimensions(section, is_alu)
+    scale = 0.0254 if is_alu else 0.001
+    return section_geometry(depth * scale, width * scale, thick * scale, is_round)
 
-def write_to_excel(results, path, sheet, first_write=False):
 
-    df = pd.DataFrame(results)
+@profiled
+def append_to_csv(rows, path):
 
-    if first_write:
-        with pd.ExcelWriter(path, mode="w") as writer:
-            df.to_excel(writer, sheet_name=sheet, index=False)
+    # append rows (list of result dicts) to a csv file, the header is written when the file is new. the
+    # cost only depends on the number of rows appended, not on the size of the file, so it is used during
+    # the sweep and the excel file is written once at the end with export_to_excel
+    if len(rows) == 0:
+        return
+    new_file = not os.path.exists(path) or os.path.getsize(path) == 0
+    with open(path, "a", newline="") as file:
+        writer = csv.DictWriter(file, fieldnames=list(rows[0]))
+        if new_file:
+            writer.writeheader()
+        writer.writerows(rows)
+
+
+def rewrite_csv(rows, path):
+    # start the csv of a sheet over with rows, ex. the rows already in the results store on --resume, so
+    # the combinations of an interrupted sweep aren't written twice
+    if os.path.exists(path):
+        os.remove(path)
+    append_to_csv(rows, path)
+
+
+@profiled
+def export_to_excel(csv_paths, path):
 
-    else:
-        with pd.ExcelWriter(
-            path,
-            mode="a",
-            if_sheet_exists="replace",
-        ) as writer:
+    # csv_paths is {sheet name: csv path}, every sheet is written in one go
+    with pd.ExcelWriter(path, mode="w") as writer:
+        for sheet, csv_path in csv_paths.items():
+            # keep_default_na so the "None" failed sections stay as text
+            df = pd.read_csv(csv_path, keep_default_na=False)
             df.to_excel(writer, sheet_name=sheet, index=False)
@@ -0,0 +1,626 @@
+import math
+import os
+import random
+import time
+import zlib
+from collections import Counter
+
+# stand-in for the SAP2000 COM object returned by sap_open, so the sap_* functions and the sweep runners
+# can be exercised on machines without SAP2000 or comtypes (ex. linux). it implements the part of the
+# API used by sap_interface.py, keeps track of the points and frames that are added, and returns results
+# with the same shapes as SAP. the result values are a deterministic function of the section names and
+# the model size, NOT an analysis, use native_solver.py for numbers
+#
+# every API call is counted in sap_model.calls (a Counter of "Interface.Method" names), to check how many
+# COM round trips each part of the pipeline makes. like SAP, the model is locked after an analysis and
+# changing it (SetSection) fails until SetModelIsLocked(False) is called, which also deletes the results
+#
+# failures can be injected to test crash handling:
+#   failure_rate        probability that RunAnalysis raises FakeSapError (like a COMError from SAP)
+#   crash_rate          probability that RunAnalysis kills the whole process (like SAP taking down the worker)
+#
+# and latencies to simulate SAP's timing (seconds, slept before the call returns):
+#   call_latency        added to every API call, the COM round trip
+#   latencies           {"Interface.Method": seconds} for specific calls, instead of call_latency
+#                       (ex. {"Analyze.RunAnalysis": 2.0})
+
+
+class FakeSapError(Exception):
+    pass
+
+
+def section_hash(section):
+    # stable number in [0, 1) for a section name (hash() is salted per process)
+    return zlib.crc32(str(section).encode()) / 2**32
+
+
+def case_factor(case):
+    # scales the results of the load cases other than SLS and DEAD (the ones the old per case queries used)
+    if case in ["SLS", "DEAD"]:
+        return 1.0
+    return 1.0 + section_hash(case)
+
+
+class FakeInterface:
+    # counts every call to the API methods (capitalized, like the COM interface) in model.calls
+    interface = ""
+
+    def __init__(self, model):
+        self.model = model
+
+    def __getattribute__(self, name):
+        attribute = object.__getattribute__(self, name)
+        if name[:1].isupper() and callable(attribute):
+            model = object.__getattribute__(self, "model")
+            interface = object.__getattribute__(self, "interface")
+            model.call(f"{interface}.{name}")
+        return attribute
+
+
+class FakeFile(FakeInterface):
+    interface = "File"
+
+    def OpenFile(self, file_path):
+        self.model.reset()
+        return 0
+
+    def Save(self, file_path):
+        self.model.saved_path = file_path
+        return 0
+
+
+class FakeFrameObj(FakeInterface):
+    interface = "FrameObj"
+
+    def AddByCoord(self, x_1, y_1, z_1, x_2, y_2, z_2, name="", section="Default"):
+        point_1 = self.model.add_point(x_1, y_1, z_1)
+        point_2 = self.model.add_point(x_2, y_2, z_2)
+        return self.model.add_frame(point_1, point_2, section), 0
+
+    def GetPoints(self, name, point_1="", point_2=""):
+        point_1, point_2 = self.model.frames[name]["points"]
+        return point_1, point_2, 0
+
+    def SetReleases(
+        self, name, release_i, release_j, start_value, end_value, item_type=0
+    ):
+        for frame in self.model.items(name, item_type, "Frame"):
+            self.model.frames[frame]["releases"] = (list(release_i), list(release_j))
+        return 0
+
+    def SetLoadDistributed(
+        self,
+        name,
+        pattern,
+        load_type,
+        direction,
+        dist_1,
+        dist_2,
+        val_1,
+        val_2,
+        CSys="Global",
+        RelDist=True,
+        Replace=True,
+        ItemType=0,
+    ):
+        for frame in self.model.items(name, ItemType, "Frame"):
+            self.model.frames[frame]["loads"].append((pattern, direction, val_1, val_2))
+        return 0
+
+    def Delete(self, name):
+        del self.model.frames[name]
+        return 0
+
+    def GetSection(self, name, section="", auto=""):
+        return self.model.frames[name]["section"], "", 0
+
+    def SetSection(self, name, section, item_type=0, *args):
+        # item type 0 is one frame, 1 is every frame in the group
+        if self.model.locked:
+            self.model.errors.append(f"SetSection({name}) on a locked model")
+            return 1
+        for frame in self.model.items(name, item_type, "Frame"):
+            self.model.frames[frame]["section"] = section
+        self.model.analysed = False
+        return 0
+
+    def SetGroupAssign(self, name, group, remove=False, item_type=0):
+        return self.model.group_assign(name, group, "Frame", remove, item_type)
+
+
+class FakePointObj(FakeInterface):
+    interface = "PointObj"
+
+    def SetRestraint(self, name, restraint, item_type=0):
+        for point in self.model.items(name, item_type, "Joint"):
+            self.model.restraints[point] = list(restraint)
+        return 0
+
+    def SetGroupAssign(self, name, group, remove=False, item_type=0):
+        return self.model.group_assign(name, group, "Joint", remove, item_type)
+
+    def GetCoordCartesian(self, name, x=0.0, y=0.0, z=0.0):
+        return (*self.model.points[name], 0)
+
+    def AddCartesian(self, x, y, z, name=""):
+        return self.model.add_point(x, y, z), 0
+
+
+class FakeEditFrame(FakeInterface):
+    interface = "EditFrame"
+
+    def DivideAtIntersections(self, name, num=0, new_names=None):
+        # split the (horizontal) frame where the other frames cross it
+        frame = self.model.frames.pop(name)
+        (x_1, _, z), (x_2, _, _) = [
+            self.model.points[point] for point in frame["points"]
+        ]
+        crossings = set()
+        for other in self.model.frames.values():
+            (a_x, _, a_z), (b_x, _, b_z) = [
+                self.model.points[point] for point in other["points"]
+            ]
+            if min(a_z, b_z) < z < max(a_z, b_z):
+                x = a_x + (b_x - a_x) * (z - a_z) / (b_z - a_z)
+                if x_1 < x < x_2:
+                    crossings.add(round(x, 9))
+        cuts = [self.model.add_point(x, 0.0, z) for x in sorted(crossings)]
+        ends = [frame["points"][0]] + cuts + [frame["points"][1]]
+        names = []
+        for start, end in zip(ends[:-1], ends[1:]):
+            new_name = self.model.add_frame(start, end, frame["section"])
+            self.model.frames[new_name]["loads"] = list(frame["loads"])
+            names.append(new_name)
+        return len(names), names, 0
+
+
+class FakeGroupDef(FakeInterface):
+    interface = "GroupDef"
+
+    def SetGroup(self, name, *args):
+        self.model.groups.setdefault(name, {"Frame": set(), "Joint": set()})
+        return 0
+
+
+class FakeDatabaseTables(FakeInterface):
+    interface = "DatabaseTables"
+
+    # only the frame connectivity table (display) and the group assignment table (editing) are supported.
+    # SetTableForEditingArray stores the table and ApplyEditedTables applies it, like SAP
+    def GetTableForDisplayArray(
+        self,
+        table_key,
+        field_keys,
+        group,
+        table_version,
+        fields,
+        num_records,
+        table_data,
+    ):
+        if table_key != "Connectivity - Frame":
+            self.model.errors.append(f"table {table_key} is not supported")
+            return field_keys, table_version, fields, num_records, table_data, 1
+        fields = ["Frame", "JointI", "JointJ", "Length"]
+        table_data = []
+        for name, frame in self.model.frames.items():
+            length = f"{self.model.frame_length(name):.3f}"
+            table_data += [name, *frame["points"], length]
+        return field_keys, 1, fields, len(self.model.frames), table_data, 0
+
+    def SetTableForEditingArray(
+        self, table_key, table_version, fields, num_records, table_data
+    ):
+        if table_key != "Groups 2 - Assignments":
+            self.model.errors.append(f"table {table_key} is not supported")
+            return table_version, fields, table_data, 1
+        self.model.edited_tables[table_key] = (list(fields), list(table_data))
+        return table_version, fields, table_data, 0
+
+    def ApplyEditedTables(
+        self, fill_import_log, num_fatal, num_errors, num_warnings, num_info, log
+    ):
+        # an edited table replaces the whole table, so the groups only keep the assignments in it
+        num_fatal = 0
+        for table_key, (fields, data) in self.model.edited_tables.items():
+            for group in self.model.groups.values():
+                for items in group.values():
+                    items.clear()
+            width = len(fields)
+            for i in range(0, len(data), width):
+                record = dict(zip(fields, data[i : i + width]))
+                ret = self.model.group_assign(
+                    record["ObjectLabel"], record["GroupName"], record["ObjectType"]
+                )
+                num_fatal += ret
+        self.model.edited_tables = {}
+        return num_fatal, 0, 0, 0, "", 0
+
+
+class FakeLoadPatterns(FakeInterface):
+    interface = "LoadPatterns"
+
+    def Add(self, name, pattern_type, self_weight=0, add_case=True):
+        self.model.patterns[name] = self_weight
+        return 0
+
+
+class FakeStaticLinear(FakeInterface):
+    interface = "LoadCases.StaticLinear"
+
+    def SetCase(self, name):
+        self.model.cases[name] = []
+        return 0
+
+    def SetLoads(self, name, num, load_types, load_names, factors):
+        self.model.cases[name] = list(zip(load_names, factors))
+        return 0
+
+
+class FakeRespCombo(FakeInterface):
+    interface = "RespCombo"
+
+    def Add(self, name, combo_type):
+        self.model.combos[name] = []
+        return 0
+
+    def SetCaseList(self, name, case_type, case, factor):
+        if case not in self.model.cases and case not in self.model.patterns:
+            self.model.errors.append(f"combination {name} uses undefined case {case}")
+            return 1
+        self.model.combos[name].append((case, factor))
+        return 0
+
+
+class FakeModalEigen(FakeInterface):
+    interface = "LoadCases.ModalEigen"
+
+    def SetNumberModes(self, name, max_modes, min_modes):
+        self.model.num_modes = max_modes
+        return 0
+
+
+class FakeLoadCases:
+    def __init__(self, model):
+        self.StaticLinear = FakeStaticLinear(model)
+        self.ModalEigen = FakeModalEigen(model)
+
+
+class FakeSelectObj(FakeInterface):
+    interface = "SelectObj"
+
+    def All(self, deselect=False):
+        return 0
+
+
+class FakeAnalyze(FakeInterface):
+    interface = "Analyze"
+
+    def RunAnalysis(self):
+        options = self.model.options
+        if self.model.random.random() < options["crash_rate"]:
+            os._exit(1)
+        if self.model.random.random() < options["failure_rate"]:
+            raise FakeSapError("analysis failed")
+        self.model.analysed = True
+        self.model.locked = True
+        return 0
+
+
+class FakeSetup(FakeInterface):
+    interface = "Results.Setup"
+
+    def DeselectAllCasesAndCombosForOutput(self):
+        self.model.selected_cases = []
+        return 0
+
+    def SetCaseSelectedForOutput(self, name, selected=True):
+        self.model.selected_cases.append(name)
+        return 0
+
+
+class FakeResults(FakeInterface):
+    interface = "Results"
+
+    def __init__(self, model):
+        super().__init__(model)
+        self.Setup = FakeSetup(model)
+
+    def output_rows(self, name, item_type, objects):
+        # (object, case, step type, step number) of every result row for the selected cases. item type 0 is
+        # one object, 2 is a group (only ALL). the static cases have one step, the modal case one per mode
+        names = list(objects) if item_type == 2 else [name]
+        rows = []
+        for case in self.model.selected_cases:
+            if case == "MODAL":
+                steps = [("Mode", mode + 1.0) for mode in range(self.model.num_modes)]
+            else:
+                steps = [("", 0.0)]
+            for step_type, step in steps:
+                rows += [(obj, case, step_type, step) for obj in names]
+        return rows
+
+    def JointDispl(self, name, item_type, *args):
+        # deflection shrinks as the sections get "stiffer" (larger hash), always in the 5-50mm range for SLS,
+        # the same at every joint
+        stiffness = self.model.stiffness()
+        rows = self.output_rows(name, item_type, self.model.points)
+        U3 = [
+            -(0.005 + 0.045 * (1.0 - stiffness)) * case_factor(case)
+            for _, case, _, _ in rows
+        ]
+        zeros = [0.0] * len(rows)
+        objects, cases, step_types, steps = [list(column) for column in zip(*rows)]
+        return (
+            len(rows),
+            objects,
+            objects,
+            cases,
+            step_types,
+            steps,
+            zeros,
+            zeros,
+            U3,
+            zeros,
+            zeros,
+            zeros,
+            0,
+        )
+
+    def BaseReact(self, *args):
+        rows = self.output_rows("", 0, [])
+        weight = self.model.weight()
+        FZ = [weight * case_factor(case) for _, case, _, _ in rows]
+        zeros = [0.0] * len(rows)
+        _, cases, step_types, steps = [list(column) for column in zip(*rows)]
+        return (
+            len(rows),
+            cases,
+            step_types,
+            steps,
+            zeros,
+            zeros,
+            FZ,
+            zeros,
+            zeros,
+            zeros,
+            0,
+            0,
+            0,
+            0,
+        )
+
+    def FrameForce(self, name, item_type, *args):
+        # two output stations per frame, the axial force is a function of the section and the frame name
+        if not self.model.analysed:
+            raise FakeSapError("model is not analysed")
+        model = self.model
+        frame_rows = self.output_rows(name, item_type, model.frames)
+        lengths = {}
+        forces = {}
+        factors = {}
+        rows = []
+        stations = []
+        P = []
+        for frame, case, step_type, step in frame_rows:
+            if frame not in lengths:
+                section = model.frames[frame]["section"]
+                lengths[frame] = model.frame_length(frame)
+                forces[frame] = (section_hash(section) - section_hash(frame)) * 100.0
+            if case not in factors:
+                factors[case] = case_factor(case)
+            for station in (0.0, lengths[frame]):
+                rows.append((frame, case, step_type, step))
+                stations.append(station)
+                P.append(forces[frame] * factors[case])
+        zeros = [0.0] * len(rows)
+        frames, cases, step_types, steps = [list(column) for column in zip(*rows)]
+        return (
+            len(rows),
+            frames,
+            stations,
+            frames,
+            stations,
+            cases,
+            step_types,
+            steps,
+            P,
+            zeros,
+            zeros,
+            zeros,
+            zeros,
+            zeros,
+            0,
+        )
+
+    def ModalParticipatingMassRatios(self, *args):
+        num_modes = min(self.model.num_modes, 12)
+        stiffness = self.model.stiffness()
+        period = [1.0 / (2.0 + 10.0 * stiffness + mode) for mode in range(num_modes)]
+        Uz = [0.0] * num_modes
+        Uz[num_modes // 3] = 0.8
+        zeros = [0.0] * num_modes
+        return (
+            num_modes,
+            ["MODAL"] * num_modes,
+            [""] * num_modes,
+            list(range(1, num_modes + 1)),
+            period,
+            zeros,
+            zeros,
+            Uz,
+            zeros,
+            zeros,
+            zeros,
+            zeros,
+            zeros,
+            zeros,
+            zeros,
+            zeros,
+            zeros,
+            0,
+        )
+
+
+class FakeDesign(FakeInterface):
+    def __init__(self, model, interface):
+        super().__init__(model)
+        self.interface = interface
+
+    def SetComboStrength(self, name, selected):
+        if name not in self.model.combos:
+            self.model.errors.append(f"combination {name} is not defined")
+            return 1
+        return 0
+
+    def StartDesign(self):
+        return 0
+
+    def VerifyPassed(self, num_items=0, num_failed=0, num_not_checked=0, names=None):
+        # sections with a low hash fail the check
+        failed = [
+            name
+            for name, frame in self.model.frames.items()
+            if section_hash(frame["section"]) < 0.2
+        ]
+        return len(self.model.frames), len(failed), 0, failed, 0
+
+
+class FakeSapModel:
+    def __init__(self, options):
+        self.options = options
+        self.random = random.Random(options["seed"])
+        self.File = FakeFile(self)
+        self.FrameObj = FakeFrameObj(self)
+        self.PointObj = FakePointObj(self)
+        self.EditFrame = FakeEditFrame(self)
+        self.LoadPatterns = FakeLoadPatterns(self)
+        self.LoadCases = FakeLoadCases(self)
+        self.RespCombo = FakeRespCombo(self)
+        self.SelectObj = FakeSelectObj(self)
+        self.Analyze = FakeAnalyze(self)
+        self.Results = FakeResults(self)
+        self.DesignSteel = FakeDesign(self, "DesignSteel")
+        self.DesignAluminum = FakeDesign(self, "DesignAluminum")
+        self.GroupDef = FakeGroupDef(self)
+        self.DatabaseTables = FakeDatabaseTables(self)
+        self.calls = Counter()
+        # API calls that returned an error code
+        self.errors = []
+        self.reset()
+
+    def reset(self):
+        # same as opening BASE.sdb, an empty model
+        self.points = {}
+        self.point_names = {}
+        self.frames = {}
+        self.restraints = {}
+        self.patterns = {}
+        self.cases = {}
+        self.combos = {}
+        self.num_modes = 12
+        self.selected_cases = []
+        self.saved_path = None
+        self.analysed = False
+        self.locked = False
+        self.groups = {}
+        self.edited_tables = {}
+
+    def call(self, name):
+        # counts an API call and waits for its latency
+        self.calls[name] += 1
+        latency = self.options["latencies"].get(name, self.options["call_latency"])
+        if latency > 0:
+            time.sleep(latency)
+
+    def SetModelIsLocked(self, locked):
+        self.call("SapModel.SetModelIsLocked")
+        self.locked = locked
+        if not locked:
+            self.analysed = False
+        return 0
+
+    def items(self, name, item_type, object_type):
+        # names an API call applies to, item type 0 is one object, 1 is every object in the group
+        if item_type == 0:
+            return [name]
+        objects = self.frames if object_type == "Frame" else self.points
+        return [item for item in self.groups[name][object_type] if item in objects]
+
+    def group_assign(self, name, group, object_type, remove=False, item_type=0):
+        if group not in self.groups:
+            self.errors.append(f"group {group} is not defined")
+            return 1
+        for item in self.items(name, item_type, object_type):
+            if remove:
+                self.groups[group][object_type].discard(item)
+            else:
+                self.groups[group][object_type].add(item)
+        return 0
+
+    def add_point(self, x, y, z):
+        # coincident points are merged like in SAP (looked up by coordinates rounded to the merge tolerance)
+        key = (round(x, 9), round(y, 9), round(z, 9))
+        if key in self.point_names:
+            return self.point_names[key]
+        name = str(len(self.points) + 1)
+        self.points[name] = (float(x), float(y), float(z))
+        self.point_names[key] = name
+        return name
+
+    def add_frame(self, point_1, point_2, section):
+        name = str(len(self.frames) + 1)
+        while name in self.frames:
+            name = str(int(name) + 1)
+        self.frames[name] = {
+            "points": (point_1, point_2),
+            "section": section,
+            "releases": None,
+            "loads": [],
+        }
+        return name
+
+    def frame_length(self, name):
+        (x_1, y_1, z_1), (x_2, y_2, z_2) = [
+            self.points[point] for point in self.frames[name]["points"]
+        ]
+        return math.sqrt((x_2 - x_1) ** 2 + (y_2 - y_1) ** 2 + (z_2 - z_1) ** 2)
+
+    def stiffness(self):
+        # mean section hash over the frames, in [0, 1)
+        if not self.analysed:
+            raise FakeSapError("model is not analysed")
+        sections = [frame["section"] for frame in self.frames.values()]
+        return sum(section_hash(section) for section in sections) / len(sections)
+
+    def weight(self):
+        # dead load reaction in kN, 20-60 kg/m of frame
+        if not self.analysed:
+            raise FakeSapError("model is not analysed")
+        weight = 0.0
+        for name, frame in self.frames.items():
+            mass = 20.0 + 40.0 * section_hash(frame["section"])
+            weight += mass * self.frame_length(name) * 9.81 / 1000.0
+        return weight
+
+
+class FakeSapObject:
+    def __init__(self, **options):
+        self.options = {
+            "failure_rate": 0.0,
+            "crash_rate": 0.0,
+            "seed": None,
+            "call_latency": 0.0,
+            "latencies": {},
+        }
+        self.options.update(options)
+        self.SapModel = FakeSapModel(self.options)
+        self.closed = False
+
+    def ApplicationExit(self, save=False):
+        self.closed = True
+        return 0
+
+
+def fake_sap_open(**options):
+    # same as sap_open
+    return FakeSapObject(**options)
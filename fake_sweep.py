@@ -0,0 +1,296 @@
+import copy
+import functools
+import os
+import tempfile
+
+from define_geometry import *
+from define_sections import *
+from native_solver import *
+from native_design import *
+from fake_sap import *
+from sweep import *
+from load_combinations import *
+from pareto import nondominated
+
+# the fake sweep shared by benchmark.py and the tests: the model, settings and section combinations of a
+# small bridge like main.py, for the native solver and for sap_sweep on the fake SAP object (fake_sap.py),
+# and the rows of native_ground_truth to run the sweep schedulers (cache, screen, pruning, early stopping)
+# without analysing anything
+
+
+def build_native_model(
+    num_spans, module_divisions, height=2.5, module_length=15.0, is_gerber=False
+):
+
+    # same model as main.py (through truss, default loads) with the TOP_CHORD, BOTTOM_CHORD and WEB
+    # placeholder sections
+    segment_length = module_length / module_divisions
+    num_modules = 2 * num_spans
+    total_length = 2 * module_length * num_spans
+
+    bottom_chord_points, top_chord_points, diagonal_web_points, vertical_web_points = (
+        generate_warren(
+            height, module_length, module_divisions, segment_length, num_modules
+        )
+    )
+
+    model = native_initialize_model()
+    (
+        bottom_chord_frames,
+        top_chord_frames,
+        diagonal_web_frames,
+        vertical_web_frames,
+    ) = native_create_frame(
+        model,
+        bottom_chord_points,
+        top_chord_points,
+        diagonal_web_points,
+        vertical_web_points,
+        "BOTTOM_CHORD",
+        "TOP_CHORD",
+        "WEB",
+    )
+    native_set_restraints(model, vertical_web_frames, num_spans)
+    native_set_releases(
+        model,
+        vertical_web_frames,
+        bottom_chord_frames,
+        top_chord_frames,
+        diagonal_web_frames,
+        num_modules,
+        module_divisions,
+    )
+    native_brace_bottom_chord(model, bottom_chord_frames, num_spans, module_divisions)
+    barrier_frames = native_barrier_load(model, total_length, 1.37, "Barrier", 1.2)
+    native_set_loads(
+        model,
+        bottom_chord_frames,
+        top_chord_frames,
+        1.1,
+        1.7,
+        1.5,
+        1.2,
+        1.5,
+        5.79,
+        0.126,
+        2.775,
+        1.95,
+        0.5,
+    )
+    if is_gerber:
+        native_gerber_modification(
+            model,
+            vertical_web_frames,
+            top_chord_frames,
+            barrier_frames,
+            num_spans,
+            module_divisions,
+        )
+    return model, bottom_chord_frames
+
+
+def sweep_section_tables(num_combinations):
+    # aluminum pipes, cycled so every combination has different properties
+    sections = ["PIPE 12 X 1/2", "PIPE 10 X 1/2", "PIPE 8 X 1/2", "PIPE 6 X 1/2"]
+    barrier = {
+        "Barrier": {
+            "A": 0.002,
+            "I": 2.0e-6,
+            "E": MATERIALS["aluminum"]["E"],
+            "weight": 0.0,
+            "mass": 0.0,
+        }
+    }
+    tables = []
+    for i in range(num_combinations):
+        tables.append(
+            native_combination_table(
+                sections[i % 4],
+                sections[(i // 4) % 4],
+                sections[(i // 16) % 4],
+                True,
+                barrier,
+            )
+        )
+    return tables
+
+
+def build_sweep_settings(
+    num_spans, module_divisions, model_dir, height=2.5, module_length=15.0
+):
+
+    # settings dict for the sweep runners, same model and loads as main.py
+    segment_length = module_length / module_divisions
+    num_modules = 2 * num_spans
+    bottom_chord_points, top_chord_points, diagonal_web_points, vertical_web_points = (
+        generate_warren(
+            height, module_length, module_divisions, segment_length, num_modules
+        )
+    )
+    uls_combinations, sls_combinations = design_combinations(1.1, 1.7, 1.5, 1.2, 1.5)
+    return {
+        "base_file_path": os.path.join(model_dir, "BASE.sdb"),
+        "model_dir": model_dir,
+        "height": height,
+        "module_length": module_length,
+        "bottom_chord_points": bottom_chord_points,
+        "top_chord_points": top_chord_points,
+        "diagonal_web_points": diagonal_web_points,
+        "vertical_web_points": vertical_web_points,
+        "num_spans": num_spans,
+        "num_modules": num_modules,
+        "module_divisions": module_divisions,
+        "span_length": 2 * module_length,
+        "total_length": 2 * module_length * num_spans,
+        "barrier_height": 1.37,
+        "barrier_section": "Barrier",
+        "barrier_UDL": 1.2,
+        "dead_factor": 1.1,
+        "live_factor": 1.7,
+        "wearing_surface_factor": 1.5,
+        "concrete_deck_factor": 1.2,
+        "snow_factor": 1.5,
+        "uls_combinations": uls_combinations,
+        "sls_combinations": sls_combinations,
+        "pattern_live_load": None,
+        "live_UDL": 5.79,
+        "wearing_surface_UDL": 0.126,
+        "concrete_deck_UDL": 2.775,
+        "snow_UDL": 1.95,
+        "roof_UDL": 0.5,
+        "pedestrian_density": 1.5,
+        "is_gerber": False,
+        "is_alu": True,
+        "backend": "sap",
+    }
+
+
+def sweep_combinations(num_combinations):
+    sections = ["PIPE 12 X 1/2", "PIPE 10 X 1/2", "PIPE 8 X 1/2", "PIPE 6 X 1/2"]
+    return [
+        [sections[i % 4], sections[(i // 4) % 4], sections[(i // 16) % 4]]
+        for i in range(num_combinations)
+    ]
+
+
+def sweep_catalog(num_sections):
+
+    # section catalog of num_sections round pipes (like load_xml_alu), 4-16 inch diameter, 0.25-1 inch thick
+    depths = np.linspace(4.0, 16.0, num_sections)
+    thicknesses = np.resize([0.25, 0.5, 0.75, 1.0], num_sections)
+    columns = {name: [] for name in ["label", "depth", "width", "thickness"]}
+    columns.update({name: [] for name in XML_TAGS})
+    for depth, thick in zip(depths, thicknesses):
+        geometry = section_geometry(
+            depth * 0.0254, depth * 0.0254, thick * 0.0254, True
+        )
+        columns["label"].append(f"PIPE {depth:.2f} X {thick}")
+        columns["depth"].append(depth)
+        columns["width"].append(depth)
+        columns["thickness"].append(thick)
+        for name in XML_TAGS:
+            columns[name].append(geometry[name])
+    catalog = {name: np.array(values) for name, values in columns.items()}
+    catalog["is_round"] = np.ones(num_sections, dtype=bool)
+    catalog["mass"] = catalog["A"] * DENSITIES["aluminum"]
+    catalog["index"] = {label: i for i, label in enumerate(catalog["label"])}
+    return catalog
+
+
+@functools.lru_cache(maxsize=None)
+def native_ground_truth(num_sections):
+
+    # {(top, bottom, web): row} for every combination of sweep_catalog(num_sections), from the native
+    # solver (3 spans, same loads as main.py), for the sweep schedulers. computed once per process
+    catalog = sweep_catalog(num_sections)
+    sections = np.arange(num_sections)[::-1]
+    model, bottom_chord_frames = build_native_model(3, 3)
+    settings = build_sweep_settings(3, 3, tempfile.gettempdir())
+    settings.update(
+        {
+            "barrier_properties": {
+                "A": 0.002,
+                "I": 2.0e-6,
+                "E": MATERIALS["aluminum"]["E"],
+                "weight": 0.0,
+                "mass": 0.0,
+            },
+            "native_chunk_size": 256,
+            "native_solver": "banded",
+            "native_num_modes": 8,
+            "backend": "native",
+        }
+    )
+    chunks = combination_chunks(
+        catalog, sections, sections, sections, [depth_gap(2)], 256
+    )
+    truth = {
+        tuple(combination): row
+        for combination, row in native_sweep(
+            native_prepare(model), bottom_chord_frames, chunks, catalog, settings
+        )
+    }
+    return catalog, truth
+
+
+def factored_model(model, name, combination):
+    # copy of a native model with the loads of a load combination applied directly, as one pattern (and
+    # case) called name, to check the superposition against
+    factored = copy.deepcopy(model)
+    factored["load_patterns"] = {
+        name: sum(
+            factor * model["load_patterns"].get(pattern, 0)
+            for pattern, factor in combination.items()
+        )
+    }
+    for frame in factored["frames"].values():
+        frame["loads"] = [
+            (name, w * combination.get(pattern, 0.0)) for pattern, w in frame["loads"]
+        ]
+    factored["load_cases"] = {name: {name: 1.0}}
+    return factored
+
+
+def recording_sap_open():
+    # open function for sap_sweep that keeps the fake SAP objects it opens, returns (open function, list)
+    sap_objects = []
+
+    def open_function(**options):
+        sap_objects.append(fake_sap_open(**options))
+        return sap_objects[-1]
+
+    return open_function, sap_objects
+
+
+def truth_sweep(truth):
+    # sweep runner that looks the rows of native_ground_truth up instead of analysing them
+    return lambda combinations: (
+        (combination, truth[tuple(combination)]) for combination in combinations
+    )
+
+
+def truth_front(truth):
+
+    # the combinations of the Pareto front of the truth that the surrogate screen must keep: passing ULS
+    # and the deflection limit, minimum module mass and deflection, maximum occupied resonating harmonic
+    feasible = [
+        combination
+        for combination, row in truth.items()
+        if row["Passed member design check for ULS"]
+        and row["Percentage of deflection limit for SLS (%)"] <= 100.0
+    ]
+    objectives = np.array(
+        [
+            [
+                truth[combination]["Module mass (kg)"],
+                truth[combination]["Max vertical deflection for SLS (m)"],
+                -truth[combination]["Resonating harmonic occupied"],
+            ]
+            for combination in feasible
+        ]
+    )
+    return {
+        combination
+        for combination, is_front in zip(feasible, nondominated(objectives))
+        if is_front
+    }
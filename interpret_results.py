@@ -3,6 +3,9 @@ import matplotlib.pyplot as plt
 import os
 import numpy as np
 
+from pareto import *
+from sweep import SCREENED_STATUS
+
 
 def plot_save(plt, out_path, section, name):
 
@@ -15,56 +18,79 @@ def plot_save(plt, out_path, section, name):
 
 
 def get_uls_indices(df):
-    uls_result = df["Passed member design check for ULS"].to_numpy()
+    uls_result = df["Passed member design check for ULS"].to_numpy(dtype=bool)
     index_true = np.where(uls_result)[0]
     index_false = np.where(~uls_result)[0]
     return index_true, index_false
 
 
-def determine_optimal_section(mass, harmonic, deflection):
-
-    # normalize the harmonics, masses and deflections so they range from 0 to 1, where 1 is good and 0 is bad
-    # for instance, a high harmonic is good so normalize up, whereas low mass is good so normalize down
-    max_mass = np.max(mass)
-    min_mass = np.min(mass)
-    max_harmonic = np.max(harmonic)
-    min_harmonic = np.min(harmonic)
-    max_deflection = np.max(deflection)
-    min_deflection = np.min(deflection)
-
-    normalized_mass = 1.0 - (mass - min_mass) / (max_mass - min_mass)
-    normalized_harmonic = (harmonic - min_harmonic) / (max_harmonic - min_harmonic)
-    normalized_deflection = 1.0 - (deflection - min_deflection) / (
-        max_deflection - min_deflection
-    )
+def determine_optimal_section(
+    mass,
+    harmonic,
+    deflection,
+    cost_matrix_weighting=0.35,
+    serviceability_matrix_weighting=0.1,
+):
 
-    # assign equal weighting to mass and harmonic
-    cost_matrix_weighting = 0.35
-    serviceability_matrix_weighting = 0.1
-    mass_weighting = cost_matrix_weighting / (
-        cost_matrix_weighting + serviceability_matrix_weighting
+    score = section_scores(
+        *normalize_objectives(mass, harmonic, deflection),
+        cost_matrix_weighting,
+        serviceability_matrix_weighting,
     )
-    harmonic_weighting = (serviceability_matrix_weighting / 2.0) / (
-        cost_matrix_weighting + serviceability_matrix_weighting
-    )
-    deflection_weighting = (serviceability_matrix_weighting / 2.0) / (
-        cost_matrix_weighting + serviceability_matrix_weighting
-    )
-    score = (
-        mass_weighting * normalized_mass
-        + harmonic_weighting * normalized_harmonic
-        + deflection_weighting * normalized_deflection
-    )
-
     high_score_index = np.argmax(score)
     return high_score_index
 
 
+def pareto_sections(df, max_rank=None):
+
+    # the section combinations that pass ULS, with their Pareto rank over module mass, occupied resonating
+    # harmonic and deflection (1 is the Pareto front, see pareto.py), the crowding distance within their rank,
+    # the normalized objectives and the score with the default weighting, best score first. with max_rank
+    # the ranking stops early and the rest get max_rank + 1
+    # the scores are normalized over all the rows that pass ULS like determine_optimal_section, and a
+    # dominated row never scores higher than the row dominating it, so the optimum is always on the front
+    index_true, index_false = get_uls_indices(df)
+    sections = df.iloc[index_true].reset_index(drop=True)
+    mass = sections["Module mass (kg)"].to_numpy(dtype=float)
+    harmonic = sections["Resonating harmonic occupied"].to_numpy(dtype=float)
+    deflection = sections["Max vertical deflection for SLS (m)"].to_numpy(dtype=float)
+
+    objectives = np.column_stack([mass, -harmonic, deflection])
+    ranks = pareto_ranks(objectives, max_rank)
+    sections["Pareto rank"] = ranks
+    sections["Crowding distance"] = crowding_distance(objectives, ranks)
+    (
+        sections["Normalized mass"],
+        sections["Normalized harmonic"],
+        sections["Normalized deflection"],
+    ) = normalize_objectives(mass, harmonic, deflection)
+    return reweight_sections(sections)
+
+
+def reweight_sections(
+    sections, cost_matrix_weighting=0.35, serviceability_matrix_weighting=0.1
+):
+
+    # scores the rows of pareto_sections (or only its front, ex. sections[sections["Pareto rank"] == 1])
+    # with another weighting, best score first, without reloading the results
+    sections = sections.copy()
+    sections["Score"] = section_scores(
+        sections["Normalized mass"].to_numpy(),
+        sections["Normalized harmonic"].to_numpy(),
+        sections["Normalized deflection"].to_numpy(),
+        cost_matrix_weighting,
+        serviceability_matrix_weighting,
+    )
+    return sections.sort_values("Score", ascending=False, kind="stable")
+
+
 def plot_mass_vs_deflection(
     mass_uls_passed,
     mass_uls_failed,
     deflection_uls_passed,
     deflection_uls_failed,
+    mass_pareto,
+    deflection_pareto,
     optimal_mass,
     optimal_deflection,
     optimal_sections,
@@ -87,6 +113,13 @@ def plot_mass_vs_deflection(
         color="green",
         s=10,
     )
+    plt.scatter(
+        mass_pareto,
+        deflection_pareto * 1000,
+        label="Pareto Front",
+        color="blue",
+        s=10,
+    )
     plt.scatter(
         optimal_mass,
         optimal_deflection * 1000,
@@ -118,6 +151,8 @@ def plot_mass_vs_harmonic(
     mass_uls_failed,
     harmonic_uls_passed,
     harmonic_uls_failed,
+    mass_pareto,
+    harmonic_pareto,
     optimal_mass,
     optimal_harmonic,
     optimal_sections,
@@ -132,6 +167,7 @@ def plot_mass_vs_harmonic(
     plt.scatter(
         mass_uls_passed, harmonic_uls_passed, label="ULS Passed", color="green", s=10
     )
+    plt.scatter(mass_pareto, harmonic_pareto, label="Pareto Front", color="blue", s=10)
     plt.scatter(
         optimal_mass,
         optimal_harmonic,
@@ -159,6 +195,7 @@ def plot_mass_vs_harmonic(
 
 
 # interpret_results can be run from main.py, or just from the run() function in this file
+# returns {sheet: pareto_sections of the sheet}, use reweight_sections to try other weightings
 def interpret_results(file_path, sheets, folderpath):
 
     os.makedirs("./plots", exist_ok=True)
@@ -166,9 +203,14 @@ def interpret_results(file_path, sheets, folderpath):
 
     dfs = []
     for sheet in sheets:
-        dfs.append(pd.read_excel(file_path, sheet_name=sheet))
+        df = pd.read_excel(file_path, sheet_name=sheet)
+        # combinations skipped by the surrogate screen have no results
+        if "Status" in df:
+            df = df[df["Status"] != SCREENED_STATUS].reset_index(drop=True)
+        dfs.append(df)
 
     # track the optimal deflections, harmonics, and masses for each section combination type
+    ranked_sections = {}
 
     for index, df in enumerate(dfs):
 
@@ -193,6 +235,14 @@ def interpret_results(file_path, sheets, folderpath):
         bottom_chord_uls_passed = bottom_chord[index_true]
         web_uls_passed = web[index_true]
 
+        # the points on the Pareto front are highlighted in the plots
+        sections = pareto_sections(df)
+        ranked_sections[sheets[index]] = sections
+        front = sections[sections["Pareto rank"] == 1]
+        mass_pareto = front["Module mass (kg)"].to_numpy()
+        harmonic_pareto = front["Resonating harmonic occupied"].to_numpy()
+        deflection_pareto = front["Max vertical deflection for SLS (m)"].to_numpy()
+
         high_score_index = determine_optimal_section(
             mass_uls_passed, harmonic_uls_passed, deflection_uls_passed
         )
@@ -217,6 +267,8 @@ def interpret_results(file_path, sheets, folderpath):
             mass_uls_failed,
             deflection_uls_passed,
             deflection_uls_failed,
+            mass_pareto,
+            deflection_pareto,
             optimal_mass,
             optimal_deflection,
             optimal_sections_spaced,
@@ -228,6 +280,8 @@ def interpret_results(file_path, sheets, folderpath):
             mass_uls_failed,
             harmonic_uls_passed,
             harmonic_uls_failed,
+            mass_pareto,
+            harmonic_pareto,
             optimal_mass,
             optimal_harmonic,
             optimal_sections_spaced,
@@ -235,6 +289,8 @@ def interpret_results(file_path, sheets, folderpath):
             out_path,
         )
 
+    return ranked_sections
+
 
 def run():
     root_path = os.getcwd()
@@ -0,0 +1,219 @@
+import numpy as np
+
+# load combinations by superposition. every load pattern is analysed once per combination of sections,
+# as its own linear case with a factor of 1: native_run_batch solves all the patterns in one multi right
+# hand side solve, and SAP adds a linear case for each pattern (LoadPatterns.Add with add_case True). the
+# analysis is linear, so the response to a factored load combination is the same linear combination of the
+# pattern responses, and checking more combinations costs a matrix product on the stored results instead
+# of more analyses
+#
+# a set of combinations is {name: {pattern: factor}}, patterns that are left out have a factor of 0.
+# design_combinations gives the governing ULS and SLS combinations (the ULS and SLS linear cases), more
+# can be added to either set (ex. with principal_companion_combinations). the member design check takes
+# the envelope of the ULS combinations (largest utilization) and the deflection the envelope of the SLS
+# combinations (largest magnitude)
+#   native   native_member_design and native_batch_deflection superpose the pattern results of
+#            native_run_batch
+#   SAP      the ULS and SLS combinations are read from their linear cases. the other ULS combinations are
+#            added as linear add response combinations selected for the design check (sap_set_combinations),
+#            which SAP forms from the case results without another analysis, and sap_deflection superposes
+#            the other SLS combinations from the pattern displacements read by sap_extract_results
+#
+# pattern live loading: for a continuous truss, the live load on only some of the spans governs the midspan
+# deflection (checkerboard, every other span loaded) and the moments over the supports (the two spans next
+# to the support loaded). the live load is also applied one span at a time, as the patterns "LIVE 1" to
+# "LIVE <num_spans>" (native_span_live_loads, sap_span_live_loads), and pattern_live_combinations adds
+# the combinations with the live load on each arrangement of loaded spans. every span pattern is analysed
+# once, so enveloping all 2^num_spans arrangements doesn't add analyses
+
+# every load pattern of the model, in the order of the linear cases of sap_set_loads
+LOAD_PATTERNS = [
+    "DEAD",
+    "LIVE",
+    "BARRIER_VERTICAL",
+    "BARRIER_HORIZONTAL",
+    "DECK",
+    "WEARING SURFACE",
+    "ROOF",
+    "SNOW",
+]
+# combinations that are also linear cases (sap_set_loads, native_set_loads)
+CASE_COMBINATIONS = ["ULS", "SLS"]
+# most spans for the "all" live load arrangements. the arrangements don't add analyses, but every one of
+# them is another combination to superpose and, on SAP, another response combination in the design check
+# (sap_set_combinations), 2^num_spans - 1 of them per ULS combination. use "alternate" for longer bridges
+MAX_ALL_ARRANGEMENT_SPANS = 6
+
+
+def design_combinations(
+    dead_factor, live_factor, wearing_surface_factor, concrete_deck_factor, snow_factor
+):
+
+    # the governing ULS combination, 1.7 live and 1.5 snow, and SLS, no snow and 1.0 factors, as
+    # ({"ULS": {pattern: factor}}, {"SLS": {pattern: factor}})
+    uls_combinations = {
+        "ULS": {
+            "DEAD": dead_factor,
+            "LIVE": live_factor,
+            "BARRIER_VERTICAL": live_factor,
+            "BARRIER_HORIZONTAL": live_factor,
+            "DECK": concrete_deck_factor,
+            "WEARING SURFACE": wearing_surface_factor,
+            "ROOF": dead_factor,
+            "SNOW": snow_factor,
+        }
+    }
+    sls_combinations = {
+        "SLS": {
+            "DEAD": 1.0,
+            "LIVE": 1.0,
+            "BARRIER_VERTICAL": 1.0,
+            "BARRIER_HORIZONTAL": 1.0,
+            "DECK": 1.0,
+            "WEARING SURFACE": 1.0,
+            "ROOF": 1.0,
+        }
+    }
+    return uls_combinations, sls_combinations
+
+
+def principal_companion_combinations(
+    prefix, permanent, principal, companion, leading=None
+):
+
+    # one combination per leading load, like the principal plus companion load combinations of the
+    # building code: the permanent loads ({pattern: factor}), the principal factor of the leading load and
+    # the companion factors of the other variable loads. principal and companion are {load: factor}, and a
+    # load is a pattern or a tuple of patterns that act together (ex. ("LIVE", "BARRIER_VERTICAL")).
+    # leading is the list of loads that lead a combination, every load in principal by default
+    # named "<prefix> <first pattern of the leading load>"
+    if leading is None:
+        leading = list(principal)
+    combinations = {}
+    for load in leading:
+        combination = dict(permanent)
+        for other, factor in companion.items():
+            if other != load:
+                for pattern in load_patterns_of(other):
+                    combination[pattern] = factor
+        for pattern in load_patterns_of(load):
+            combination[pattern] = principal[load]
+        combinations[f"{prefix} {load_patterns_of(load)[0]}"] = combination
+    return combinations
+
+
+def load_patterns_of(load):
+    # a load of principal_companion_combinations as a tuple of patterns
+    if isinstance(load, str):
+        return (load,)
+    return tuple(load)
+
+
+def span_live_patterns(num_spans):
+    # the live load patterns of each span, from left to right
+    return [f"LIVE {span + 1}" for span in range(num_spans)]
+
+
+def span_arrangements(num_spans, arrangements="all"):
+
+    # the loaded spans (0 based) of each live load arrangement, without the one with every span loaded
+    # (the LIVE pattern itself)
+    #   "all"        every arrangement, 2^num_spans - 1 of them (no span loaded included), up to
+    #                MAX_ALL_ARRANGEMENT_SPANS spans
+    #   "alternate"  the arrangements prescribed for continuous spans: every other span loaded (both ways),
+    #                for the largest midspan moments and deflections, and for each interior support the two
+    #                spans next to it and every other span beyond them, for the largest support moments
+    if arrangements == "all":
+        if num_spans > MAX_ALL_ARRANGEMENT_SPANS:
+            raise ValueError(
+                f'{2**num_spans - 1} live load arrangements for {num_spans} spans, "all" is limited to '
+                f'{MAX_ALL_ARRANGEMENT_SPANS} spans, use "alternate"'
+            )
+        loaded = [
+            tuple(span for span in range(num_spans) if mask & (1 << span))
+            for mask in range(2**num_spans - 1)
+        ]
+    elif arrangements == "alternate":
+        loaded = [tuple(range(0, num_spans, 2)), tuple(range(1, num_spans, 2))]
+        for support in range(1, num_spans):
+            loaded.append(
+                tuple(
+                    sorted(
+                        list(range(support - 1, -1, -2))
+                        + list(range(support, num_spans, 2))
+                    )
+                )
+            )
+    else:
+        raise ValueError(f"unknown live load arrangements {arrangements}")
+
+    # without duplicates and the fully loaded arrangement (ex. a single span)
+    unique = []
+    for spans in loaded:
+        if spans not in unique and len(spans) < num_spans:
+            unique.append(spans)
+    return unique
+
+
+def pattern_live_combinations(combinations, num_spans, arrangements="all"):
+
+    # for each combination with the LIVE pattern, one more per arrangement of span_arrangements with LIVE
+    # replaced by the span patterns of the loaded spans, at the same factor. named "<name> LIVE <loaded
+    # spans, 1 based>" ("<name> LIVE none" with no span loaded)
+    patterns = span_live_patterns(num_spans)
+    pattern_combinations = {}
+    for name, combination in combinations.items():
+        if "LIVE" not in combination:
+            continue
+        for spans in span_arrangements(num_spans, arrangements):
+            arrangement = {
+                pattern: factor
+                for pattern, factor in combination.items()
+                if pattern != "LIVE"
+            }
+            for span in spans:
+                arrangement[patterns[span]] = combination["LIVE"]
+            loaded = " ".join(str(span + 1) for span in spans) or "none"
+            pattern_combinations[f"{name} LIVE {loaded}"] = arrangement
+    return pattern_combinations
+
+
+def combination_difference(combination, base):
+    # {pattern: factor} to add to the base combination to get combination, without the zeros
+    difference = {}
+    for pattern in list(combination) + [
+        pattern for pattern in base if pattern not in combination
+    ]:
+        factor = combination.get(pattern, 0.0) - base.get(pattern, 0.0)
+        if factor != 0.0:
+            difference[pattern] = factor
+    return difference
+
+
+def combination_factors(patterns, combinations):
+    # (num patterns, num combinations) factor of each combination on each pattern, for the pattern
+    # responses in the order of patterns
+    factors = np.zeros((len(patterns), len(combinations)))
+    for j, combination in enumerate(combinations.values()):
+        for pattern, factor in combination.items():
+            factors[patterns.index(pattern), j] = factor
+    return factors
+
+
+def combination_patterns(combinations):
+    # the patterns with a factor in at least one of the combinations, in the order of LOAD_PATTERNS
+    used = set()
+    for combination in combinations.values():
+        used.update(combination)
+    return [pattern for pattern in LOAD_PATTERNS if pattern in used] + sorted(
+        used - set(LOAD_PATTERNS)
+    )
+
+
+def superposed_combinations(combinations):
+    # the combinations that aren't linear cases, formed by superposition
+    return {
+        name: combination
+        for name, combination in combinations.items()
+        if name not in CASE_COMBINATIONS
+    }
@@ -1,12 +1,31 @@
+import argparse
 import os
 from tqdm import tqdm
 
 from sap_interface import *
 from define_geometry import *
 from define_sections import *
+from native_solver import *
+from native_design import *
+from sweep import *
+from results_store import *
+from analysis_cache import *
+from profiling import *
+from surrogate import *
+from pruning import *
+from pareto import *
+from load_combinations import *
 
 if __name__ == "__main__":
 
+    # --resume continues the last sweep with the same model parameters, skipping the combinations already
+    # in the results store. --profile records the time, COM calls and memory of every stage of every
+    # combination in profile_trace.jsonl and prints a summary at the end (see profiling.py)
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--resume", action="store_true")
+    parser.add_argument("--profile", action="store_true")
+    args = parser.parse_args()
+
     """------------------------ DEFINE MODEL PARAMETERS ------------------------"""
 
     height = 2.5
@@ -28,6 +47,57 @@ if __name__ == "__main__":
     is_gerber = False
     # default analysis is for steel. for aluminum set is_alu to true
     is_alu = True
+    # "sap" runs every combination through SAP2000, "native" uses the numpy solver in native_solver.py
+    # (no SAP licence needed, use it to screen combinations and SAP for final verification)
+    backend = "sap"
+    # number of SAP2000 instances to run in parallel, each in its own process with its own model file
+    # (1 runs everything in this process like before)
+    num_workers = 1
+    # build the SAP model once per SAP instance and only change the sections of the TOP_CHORD, BOTTOM_CHORD
+    # and WEB groups for each combination, instead of rebuilding it from BASE.sdb. off by default: it is
+    # only checked against the fake SAP object (fake_sap.py), not yet against SAP2000 itself
+    template_model = False
+    # keep the SAP results of every combination in analysis_cache.db, so re-runs with the same geometry,
+    # loads, BASE.sdb and section library only analyse new combinations (least recently used results are
+    # dropped past the size cap)
+    use_cache = True
+    cache_max_bytes = 100 * 1024**2
+    # fit a surrogate to the results analysed so far and skip the combinations it predicts can't be on the
+    # Pareto front (failing ULS, over the deflection limit, or dominated), see surrogate.py. off by default:
+    # the skipped combinations are a guess, not an analysis. they are written to the results store and the
+    # output with the "screened" Status and no results, and listed with the predictions and the reason in
+    # screened_<sheet index>.csv. the first surrogate_min_samples combinations of each sheet are always
+    # analysed
+    use_surrogate = False
+    surrogate_min_samples = 40
+    # skip the combinations that only make a member group that failed ULS smaller (smaller A and I, same
+    # other sections), see pruning.py. off by default: that only failing combinations are skipped, and the
+    # optimum doesn't change, is checked against the native solver (python benchmark.py dominance_pruning)
+    # and not yet against SAP
+    use_pruning = False
+    # stop each sheet early once the Pareto front of the combinations passing ULS (module mass, occupied
+    # resonating harmonic and SLS deflection) hasn't changed for stop_unchanged combinations in a row, or
+    # after stop_seconds or stop_analyses (None for no limit). --resume continues a stopped sheet
+    stop_unchanged = None
+    stop_seconds = None
+    stop_analyses = None
+    # number of combinations generated at a time, and solved per batched call by the native backend
+    # (bounds memory)
+    native_chunk_size = 32
+    # "banded" (cholesky, linear in bridge length) or "dense" (batched np.linalg.solve)
+    native_solver = "banded"
+    # number of modes extracted by the native modal solve. a continuous truss has a cluster of num_spans
+    # vertical modes and the governing (highest Uz) one is at the top of that cluster
+    native_num_modes = num_spans + 5
+    # the barrier section is defined in BASE.sdb, so the native solver needs its properties directly
+    # (massless like in SAP, A in m2, I in m4, E in kN/m2)
+    barrier_properties = {
+        "A": 0.002,
+        "I": 2.0e-6,
+        "E": MATERIALS["aluminum"]["E"],
+        "weight": 0.0,
+        "mass": 0.0,
+    }
 
     """ ------------------------ DEFINE LOADS ------------------------ """
 
@@ -50,6 +120,43 @@ if __name__ == "__main__":
     concrete_deck_factor = 1.2
     snow_factor = 1.5
 
+    # load combinations checked by the member design (ULS) and the deflection (SLS), {name: {pattern:
+    # factor}}. each pattern is analysed once and the combinations are superposed from the pattern
+    # results (see load_combinations.py), so adding combinations doesn't add analyses. the ULS and SLS
+    # combinations are the linear cases from the factors above, the sweep takes the envelope of all of them
+    uls_combinations, sls_combinations = design_combinations(
+        dead_factor,
+        live_factor,
+        wearing_surface_factor,
+        concrete_deck_factor,
+        snow_factor,
+    )
+    # ex. one combination led by each of live and snow, with the other as a companion load
+    # uls_combinations.update(
+    #     principal_companion_combinations(
+    #         "ULS",
+    #         {"DEAD": 1.25, "DECK": 1.25, "WEARING SURFACE": 1.5, "ROOF": 1.25},
+    #         {("LIVE", "BARRIER_VERTICAL", "BARRIER_HORIZONTAL"): 1.5, "SNOW": 1.5},
+    #         {("LIVE", "BARRIER_VERTICAL", "BARRIER_HORIZONTAL"): 0.5, "SNOW": 0.5},
+    #     )
+    # )
+    # pattern live loading: the live load is also applied one span at a time, and every combination above
+    # is also checked with the live load on only some of the spans, which governs the midspan deflection
+    # and the support moments of a continuous truss. "all" checks every arrangement of loaded spans
+    # (2^num_spans - 1 more of each combination, up to MAX_ALL_ARRANGEMENT_SPANS spans), "alternate" the
+    # checkerboard and adjacent span arrangements prescribed for continuous spans, None only the fully
+    # loaded spans. each span is analysed once and the arrangements are superposed, so they don't add
+    # analyses, but they change the ULS and SLS results and on SAP every arrangement is another response
+    # combination in the design check
+    pattern_live_load = None
+    if pattern_live_load is not None:
+        uls_combinations.update(
+            pattern_live_combinations(uls_combinations, num_spans, pattern_live_load)
+        )
+        sls_combinations.update(
+            pattern_live_combinations(sls_combinations, num_spans, pattern_live_load)
+        )
+
     # compute UDLs
     live_UDL = trib_area * pedestrian_pressure
     barrier_UDL = barrier_load
@@ -68,186 +175,319 @@ if __name__ == "__main__":
     )
 
     # import the section combinations
-    # will be a list of lists, each sublist has the combinations for different section types
-    # ex. round, box, round-box combo
+    # will be a list of generators, each generator yields chunks of combinations (catalog indices) for
+    # different section types ex. round, box, round-box combo. the combinations are only enumerated as
+    # the loop below asks for them, so analysis starts right away
+    # the section catalog holds the properties of every section parsed from the xml library
     if is_alu:
-        section_combinations = create_section_combinations_alu()
+        section_catalog, section_combinations = create_section_combinations_alu(
+            native_chunk_size
+        )
     else:
-        section_combinations = create_section_combinations_steel()
+        section_catalog, section_combinations = create_section_combinations_steel(
+            native_chunk_size
+        )
 
     # set file paths
     root_path = os.getcwd()
     base_file_path = root_path + "/BASE.sdb"
-    os.makedirs("./models", exist_ok=True)
-    model_path = root_path + "/models/MODEL.sdb"
+    model_dir = root_path + "/models"
+    os.makedirs(model_dir, exist_ok=True)
+
+    # the native model is built once with placeholder section names (TOP_CHORD, BOTTOM_CHORD, WEB),
+    # and each combination only supplies the section properties of those groups
+    if backend == "native":
+        model = native_initialize_model()
+        (
+            bottom_chord_frames,
+            top_chord_frames,
+            diagonal_web_frames,
+            vertical_web_frames,
+        ) = native_create_frame(
+            model,
+            bottom_chord_points,
+            top_chord_points,
+            diagonal_web_points,
+            vertical_web_points,
+            "BOTTOM_CHORD",
+            "TOP_CHORD",
+            "WEB",
+        )
+        native_set_restraints(model, vertical_web_frames, num_spans)
+        native_set_releases(
+            model,
+            vertical_web_frames,
+            bottom_chord_frames,
+            top_chord_frames,
+            diagonal_web_frames,
+            num_modules,
+            module_divisions,
+        )
+        native_brace_bottom_chord(
+            model, bottom_chord_frames, num_spans, module_divisions
+        )
+        barrier_frames = native_barrier_load(
+            model, total_length, barrier_height, barrier_section, barrier_UDL
+        )
+        native_set_loads(
+            model,
+            bottom_chord_frames,
+            top_chord_frames,
+            dead_factor,
+            live_factor,
+            wearing_surface_factor,
+            concrete_deck_factor,
+            snow_factor,
+            live_UDL,
+            wearing_surface_UDL,
+            concrete_deck_UDL,
+            snow_UDL,
+            roof_UDL,
+        )
+        if pattern_live_load is not None:
+            native_span_live_loads(
+                model, bottom_chord_frames, num_spans, module_divisions, live_UDL
+            )
+        if is_gerber:
+            vertical_web_frames, top_chord_frames, barrier_frames = (
+                native_gerber_modification(
+                    model,
+                    vertical_web_frames,
+                    top_chord_frames,
+                    barrier_frames,
+                    num_spans,
+                    module_divisions,
+                )
+            )
+        prepared_model = native_prepare(model)
+
+    # everything the sweep runners in sweep.py need to build and check a model
+    settings = {
+        "base_file_path": base_file_path,
+        "model_dir": model_dir,
+        # the contents of BASE.sdb and of the section library, for the analysis cache and the results store
+        "base_model_hash": file_hash(base_file_path),
+        "section_library_hash": file_hash(ALU_LIBRARY if is_alu else STEEL_LIBRARY),
+        "height": height,
+        "module_length": module_length,
+        "bottom_chord_points": bottom_chord_points,
+        "top_chord_points": top_chord_points,
+        "diagonal_web_points": diagonal_web_points,
+        "vertical_web_points": vertical_web_points,
+        "num_spans": num_spans,
+        "num_modules": num_modules,
+        "module_divisions": module_divisions,
+        "span_length": span_length,
+        "total_length": total_length,
+        "barrier_height": barrier_height,
+        "barrier_section": barrier_section,
+        "barrier_UDL": barrier_UDL,
+        "barrier_properties": barrier_properties,
+        "dead_factor": dead_factor,
+        "live_factor": live_factor,
+        "wearing_surface_factor": wearing_surface_factor,
+        "concrete_deck_factor": concrete_deck_factor,
+        "snow_factor": snow_factor,
+        "uls_combinations": uls_combinations,
+        "sls_combinations": sls_combinations,
+        "pattern_live_load": pattern_live_load,
+        "live_UDL": live_UDL,
+        "wearing_surface_UDL": wearing_surface_UDL,
+        "concrete_deck_UDL": concrete_deck_UDL,
+        "snow_UDL": snow_UDL,
+        "roof_UDL": roof_UDL,
+        "pedestrian_density": pedestrian_density,
+        "is_gerber": is_gerber,
+        "is_alu": is_alu,
+        "native_chunk_size": native_chunk_size,
+        "native_solver": native_solver,
+        "native_num_modes": native_num_modes,
+        "backend": backend,
+    }
+
+    if use_cache:
+        analysis_cache = open_analysis_cache(
+            root_path + os.sep + "analysis_cache.db", cache_max_bytes
+        )
 
-    # open SAP application
-    sap_object = sap_open()
+    # every finished combination is stored straight away, keyed by its sections and the settings
+    store = open_results_store(root_path + os.sep + "results.db")
+    store_key = settings_hash(settings)
+    completed = resume_results(store, store_key, args.resume)
+    if args.resume:
+        print(f"Resuming, {len(completed)} combinations already done.")
 
-    # delete old output file if it exists
+    # results are appended to one csv per sheet during the sweep, and written to the excel file at the end
+    # delete old output files if they exist
     results_file = "output.xlsx"
     results_path = root_path + os.sep + results_file
     if os.path.exists(results_path):
         os.remove(results_path)
     sheet_names = ["Box Box Box", "Box Box Round"]
+    csv_paths = {}
+
+    if args.profile:
+        start_profiling(root_path + os.sep + "profile_trace.jsonl")
 
-    first_write = True
     for index, combination_type in enumerate(section_combinations):
-        results = []
         sheet_name = sheet_names[index]
+        csv_path = root_path + os.sep + "output_" + str(index) + ".csv"
+        csv_paths[sheet_name] = csv_path
+        # the output files are rewritten, so they start with the rows from the store when resuming
+        stored_rows = load_results(store, store_key, sheet_name)
+        rewrite_csv(stored_rows, csv_path)
+        if completed:
+            combination_type = skip_completed(
+                combination_type, section_catalog, completed
+            )
 
-        for combo_index, combination in enumerate(tqdm(combination_type)):
-
-            top_chord_section = combination[0]
-            bottom_chord_section = combination[1]
-            web_section = combination[2]
-
-            # initialize fresh model from BASE in root folder
-            sap_model = sap_initialize_model(base_file_path, sap_object)
-
-            """ ------------------------ CREATE SAP MODEL ------------------------ """
+        """ ------------------------ RUN MODELS AND COLLECT RESULTS ------------------------ """
 
-            # generate frames
-            (
+        # the runners yield (combination, result row) in the order of the combinations
+        if backend == "native":
+            sweep = native_sweep(
+                prepared_model,
                 bottom_chord_frames,
-                top_chord_frames,
-                diagonal_web_frames,
-                vertical_web_frames,
-            ) = sap_create_frame(
-                sap_model,
-                bottom_chord_points,
-                top_chord_points,
-                diagonal_web_points,
-                vertical_web_points,
-                bottom_chord_section,
-                top_chord_section,
-                web_section,
-            )
-
-            # set the restraints
-            sap_set_restraints(sap_model, vertical_web_frames, num_spans)
-
-            # set the releases for moment splice between modules
-            sap_set_releases(
-                sap_model,
-                vertical_web_frames,
-                bottom_chord_frames,
-                top_chord_frames,
-                diagonal_web_frames,
-                num_modules,
-                module_divisions,
+                combination_type,
+                section_catalog,
+                settings,
             )
-
-            # brace bottom chord at the midpoint of each frame to the left and right of the support
-            # this is to prevent those members from failing the kl/r_y check
-            sap_brace_bottom_chord(
-                sap_model, bottom_chord_frames, num_spans, module_divisions
+        else:
+            combination_labels = (
+                combination
+                for chunk_labels, chunk_index, combination in iterate_combinations(
+                    section_catalog, combination_type
+                )
             )
-
-            # create barrier and apply vertical and horizontal barrier load patterns (cases created in sap_set_loads)
-            barrier_frames = sap_barrier_load(
-                sap_model, total_length, barrier_height, barrier_section, barrier_UDL
+            # with num_workers > 1 each worker starts its own SAP instance
+            run_sweep = lambda combinations: sap_sweep(
+                combinations,
+                settings,
+                num_workers,
+                sap_open,
+                {"attach": num_workers == 1},
+                template_model=template_model,
             )
-
-            # set the load case, apply deck load to bottom chord
-            sap_set_loads(
-                sap_model,
-                bottom_chord_frames,
-                top_chord_frames,
-                dead_factor,
-                live_factor,
-                wearing_surface_factor,
-                concrete_deck_factor,
-                snow_factor,
-                live_UDL,
-                wearing_surface_UDL,
-                concrete_deck_UDL,
-                snow_UDL,
-                roof_UDL,
-            )
-
-            if is_gerber:
-                vertical_web_frames, top_chord_frames, barrier_frames = (
-                    sap_gerber_modification(
-                        sap_model,
-                        vertical_web_frames,
-                        top_chord_frames,
-                        barrier_frames,
-                        num_spans,
-                        module_divisions,
-                    )
+            # only the combinations that aren't in the cache are sent to SAP
+            if use_cache:
+                analyse = lambda combinations: cached_sweep(
+                    combinations, settings, analysis_cache, run_sweep
                 )
-
-            """ ------------------------ RUN MODEL AND COLLECT RESULTS ------------------------ """
-
-            # save the file to a new file in the models folder (so don't override the BASE file)
-            sap_run_analysis(sap_model, model_path)
-
-            deflection, deflection_percentage = sap_deflection(
-                sap_model, bottom_chord_frames, span_length
-            )
-            # get the reaction output from dead case and divide by num_modules
-            module_mass = sap_module_mass(sap_model, num_modules)
-
-            (
-                natural_frequency,
-                in_crit_range,
-                natural_frequency_occupied,
-                resonating_harmonic,
-                resonating_harmonic_occupied,
-            ) = sap_vibration_analysis(
-                sap_model, pedestrian_density, concrete_deck_UDL, live_UDL
-            )
-            # verify frames pass steel design check, and get list of sections that fail if ULS does not pass
-            passed, failed_section_names = sap_member_design(sap_model, is_alu)
-
-            results.append(
-                {
-                    "Top chord": top_chord_section,
-                    "Bottom chord": bottom_chord_section,
-                    "Web members": web_section,
-                    "Max vertical deflection for SLS (m)": deflection,
-                    "Percentage of deflection limit for SLS (%)": deflection_percentage,
-                    "Module mass (kg)": module_mass,
-                    "Natural frequency (Hz)": natural_frequency,
-                    "Natural frequency in critical range": in_crit_range,
-                    "Natural frequency occupied (Hz)": natural_frequency_occupied,
-                    "Resonating harmonic": resonating_harmonic,
-                    "Resonating harmonic occupied": resonating_harmonic_occupied,
-                    "Passed member design check for ULS": passed,
-                    "Failed section": failed_section_names,
-                }
-            )
+            else:
+                analyse = run_sweep
+            # the screen goes around the cache, so skipped combinations aren't read from the cache either
+            if use_surrogate:
+                screen_path = root_path + os.sep + "screened_" + str(index) + ".csv"
+                if os.path.exists(screen_path) and not args.resume:
+                    os.remove(screen_path)
+                screen = open_screen(surrogate_min_samples, audit_path=screen_path)
+                seed_screen(screen, section_catalog, stored_rows)
+                run_screened = lambda combinations: screened_sweep(
+                    combinations, section_catalog, screen, analyse
+                )
+            else:
+                run_screened = analyse
+            # the pruning goes around the screen, so it sees the combinations sorted heaviest first and the
+            # pruned ones are never screened (see pruning.py)
+            if use_pruning:
+                pruning = open_pruning()
+                seed_pruning(pruning, section_catalog, stored_rows)
+                sweep = pruned_sweep(
+                    combination_labels, section_catalog, pruning, run_screened
+                )
+            else:
+                sweep = run_screened(combination_labels)
+
+        # the Pareto front is kept up to date as the results come in (see pareto.py)
+        online_front = open_online_front(stop_unchanged, stop_seconds, stop_analyses)
+        seed_online_front(online_front, stored_rows)
+        sweep = stop_early(sweep, online_front)
+
+        for combo_index, (combination, row) in enumerate(tqdm(sweep)):
+
+            top_chord_section, bottom_chord_section, web_section = combination
+            # screened rows are stored too, so --resume doesn't screen them again. failed ones aren't
+            store_result(store, store_key, sheet_name, combination, row)
+            if row is None:
+                tqdm.write(
+                    f"Top chord section: {top_chord_section}, Bottom chord section: {bottom_chord_section}, Web member section: {web_section}"
+                )
+                tqdm.write("Analysis failed, skipping combination.")
+                continue
+            if is_screened(row):
+                tqdm.write(
+                    f"Top chord section: {top_chord_section}, Bottom chord section: {bottom_chord_section}, Web member section: {web_section}"
+                )
+                tqdm.write("Skipped by the surrogate screen, not analysed.")
+                append_to_csv([row], csv_path)
+                continue
 
             # log results to console
             tqdm.write(
                 f"Top chord section: {top_chord_section}, Bottom chord section: {bottom_chord_section}, Web member section: {web_section}"
             )
             tqdm.write(
-                f"Deflection of central node for SLS (mm): {round(deflection * 1000, 4)}"
+                f"Deflection of central node for SLS (mm): {round(row['Max vertical deflection for SLS (m)'] * 1000, 4)}"
+            )
+            tqdm.write(
+                f"Percentage of deflection limit for SLS (%): {round(row['Percentage of deflection limit for SLS (%)'])}"
+            )
+            tqdm.write(
+                f"Mass of single module (kg): {round(row['Module mass (kg)'], 4)}"
             )
             tqdm.write(
-                f"Percentage of deflection limit for SLS (%): {round(deflection_percentage)}"
+                f"Natural frequency of span (Hz): {round(row['Natural frequency (Hz)'], 4)}"
             )
-            tqdm.write(f"Mass of single module (kg): {round(module_mass, 4)}")
-            tqdm.write(f"Natural frequency of span (Hz): {round(natural_frequency, 4)}")
-            tqdm.write(f"Natural frequency in critical range?: {in_crit_range}")
             tqdm.write(
-                f"Natural frequency of span occupied (Hz): {round(natural_frequency_occupied, 4)}"
+                f"Natural frequency in critical range?: {row['Natural frequency in critical range']}"
             )
-            tqdm.write(f"Resonating harmonic of span: {round(resonating_harmonic, 4)}")
             tqdm.write(
-                f"Resonating harmonic of span occupied: {round(resonating_harmonic_occupied, 4)}"
+                f"Natural frequency of span occupied (Hz): {round(row['Natural frequency occupied (Hz)'], 4)}"
             )
-            tqdm.write(f"Passed member design check for ULS: {passed}")
-            tqdm.write(f"Failed section: {failed_section_names}")
+            tqdm.write(
+                f"Resonating harmonic of span: {round(row['Resonating harmonic'], 4)}"
+            )
+            tqdm.write(
+                f"Resonating harmonic of span occupied: {round(row['Resonating harmonic occupied'], 4)}"
+            )
+            tqdm.write(
+                f"Passed member design check for ULS: {row['Passed member design check for ULS']}"
+            )
+            tqdm.write(f"Failed section: {row['Failed section']}")
 
-            # write result to excel
-            if combo_index % 10 == 0:
-                write_to_excel(results, results_path, sheet_name, first_write)
-                tqdm.write("Successfully updated output file.")
-                first_write = False
+            # write result to csv
+            append_to_csv([row], csv_path)
 
-            sap_model = None
+            if online_front["unchanged"] == 0:
+                best = online_optimum(online_front)
+                tqdm.write(
+                    f"Pareto front: {len(online_front['rows'])} combinations, best so far: "
+                    f"{best['Top chord']}, {best['Bottom chord']}, {best['Web members']}"
+                )
 
-    sap_close(sap_object)
+        reason = stop_reason(online_front)
+        if reason is not None:
+            print(f"Stopped {sheet_name} early, {reason}.")
+
+        if backend != "native" and use_pruning:
+            print(pruning_summary(pruning))
+        if backend != "native" and use_surrogate:
+            print(screen_summary(screen))
+
+    # write all the sheets to excel
+    csv_paths = {
+        sheet: path for sheet, path in csv_paths.items() if os.path.exists(path)
+    }
+    if csv_paths:
+        export_to_excel(csv_paths, results_path)
+        print(f"Successfully wrote output file {results_file}.")
+
+    if args.profile:
+        print_profile_summary(finish_profiling())
+
+    if use_cache:
+        print(
+            f"Analysis cache: {analysis_cache['hits']} hits, {analysis_cache['misses']} misses."
+        )
+        analysis_cache["connection"].close()
+    store.close()
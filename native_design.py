@@ -0,0 +1,160 @@
+import numpy as np
+
+from load_combinations import combination_factors
+
+# vectorised member design check for native_run_batch results, the native counterpart of
+# sap_member_design. checks every element of every combination at once for:
+#   tension:      Tf/Tr + Mf/Mr <= 1, with Tr = phi A Fy
+#   compression:  Cf/Cr + Mf/Mr <= 1, with Cr = phi A Fy (1 + lambda^2n)^(-1/n)
+#   slenderness:  KL/r <= 200 for members in compression
+# Mr = phi S Fy uses the elastic section modulus, and there is no moment amplification, so this is a
+# screening check to reject failing combinations before running them through SAP
+
+RESISTANCE_FACTOR = 0.9
+MAX_SLENDERNESS = 200.0
+# axial forces smaller than this (kN) are treated as numerical noise for the slenderness limit
+COMPRESSION_TOLERANCE = 1e-6
+# load combinations superposed at a time by native_member_utilization (bounds the memory of the superposed
+# forces)
+LOAD_COMBINATION_BLOCK = 8
+
+
+def native_design_lengths(prepared):
+
+    # unbraced lengths for each element. SAP uses the length of the frame object for both axes, and
+    # the bottom chord frames braced at their midpoint by sap_brace_bottom_chord get half that out of plane
+    model = prepared["model"]
+    frame_lengths = {}
+    for name, frame in model["frames"].items():
+        x_1, _, z_1 = model["point_coords"][frame["points"][0]]
+        x_2, _, z_2 = model["point_coords"][frame["points"][1]]
+        frame_lengths[name] = np.hypot(x_2 - x_1, z_2 - z_1)
+
+    length_33 = np.array([frame_lengths[frame] for frame in prepared["element_frames"]])
+    length_22 = length_33.copy()
+    for i, frame in enumerate(prepared["element_frames"]):
+        if frame in model["braced_frames"]:
+            length_22[i] = length_33[i] / 2.0
+
+    return length_33, length_22
+
+
+def native_member_utilization(
+    prepared, batch, section_tables, case="ULS", combinations=None
+):
+
+    # utilization ratio of every element for every combination, (num combinations, num elements)
+    # sections without a yield strength (ex. the barrier) aren't designed and get a ratio of 0
+    # with combinations ({name: {pattern: factor}}, see load_combinations.py) the largest ratio over them
+    # instead of the ratio for case. the resistances only depend on the sections, so they are computed
+    # once, and the forces are superposed from the pattern forces LOAD_COMBINATION_BLOCK load combinations
+    # at a time
+    model = prepared["model"]
+    sections = prepared["element_sections"]
+    if combinations is None:
+        combinations = {case: model["load_cases"][case]}
+    factors = combination_factors(batch["patterns"], combinations)
+    # end forces used by the check (P, V2, M3 at i, P and M3 at j) and UDL, with the patterns first, so
+    # each block is one matrix product and comes out with the load combinations first
+    num_patterns = factors.shape[0]
+    shape = batch["element_loads"].shape[:2]
+    element_forces = np.transpose(
+        batch["element_forces"][:, :, [0, 1, 2, 3, 5]], (3, 2, 0, 1)
+    ).reshape(num_patterns, -1)
+    element_loads = np.moveaxis(batch["element_loads"], 2, 0).reshape(num_patterns, -1)
+    lengths = prepared["element_lengths"]
+    length_33, length_22 = native_design_lengths(prepared)
+
+    # section properties per combination, (num combinations, num sections)
+    names = ["A", "S", "r", "r22", "E", "Fy", "n"]
+    props = {
+        name: np.ones((len(section_tables), len(prepared["sections"])))
+        for name in names
+    }
+    designed = np.zeros((len(section_tables), len(prepared["sections"])), dtype=bool)
+    for n, section_table in enumerate(section_tables):
+        for i, section in enumerate(prepared["sections"]):
+            if "Fy" in section_table[section]:
+                designed[n, i] = True
+                for name in names:
+                    props[name][n, i] = section_table[section][name]
+
+    # per element properties, (num combinations, num elements)
+    A = props["A"][:, sections]
+    S = props["S"][:, sections]
+    E = props["E"][:, sections]
+    Fy = props["Fy"][:, sections]
+    exponent = props["n"][:, sections]
+    slenderness = np.maximum(
+        length_33 / props["r"][:, sections], length_22 / props["r22"][:, sections]
+    )
+
+    Tr = RESISTANCE_FACTOR * A * Fy
+    reduced_slenderness = slenderness * np.sqrt(Fy / (np.pi**2 * E))
+    Cr = Tr * (1.0 + reduced_slenderness ** (2 * exponent)) ** (-1.0 / exponent)
+    Mr = RESISTANCE_FACTOR * S * Fy
+
+    ratio = np.zeros(A.shape)
+    compressed = np.zeros(A.shape, dtype=bool)
+    for start in range(0, factors.shape[1], LOAD_COMBINATION_BLOCK):
+        block = factors[:, start : start + LOAD_COMBINATION_BLOCK].T
+        # (block size, num combinations, num elements)
+        axial_i, shear_i, moment_i, axial_j, moment_j = np.swapaxes(
+            (block @ element_forces).reshape(len(block), 5, *shape), 0, 1
+        )
+        w = (block @ element_loads).reshape(len(block), *shape)
+
+        # axial force is tension positive. the moment is checked at both ends and at midspan, where the
+        # transverse UDL adds to the moment from the end forces
+        axial_i = -axial_i
+        moment_mid = shear_i * lengths / 2.0 - moment_i + w * lengths**2 / 8.0
+        Mf = np.maximum.reduce([np.abs(moment_i), np.abs(moment_j), np.abs(moment_mid)])
+        Tf = np.maximum(0.0, np.maximum(axial_i, axial_j))
+        Cf = np.maximum(0.0, -np.minimum(axial_i, axial_j))
+
+        block_ratio = np.maximum(Tf / Tr, Cf / Cr) + Mf / Mr
+        ratio = np.maximum(ratio, np.max(block_ratio, axis=0))
+        compressed |= np.any(Cf > COMPRESSION_TOLERANCE, axis=0)
+
+    # members in compression that are too slender fail regardless of the force
+    ratio = np.where(compressed & (slenderness > MAX_SLENDERNESS), np.inf, ratio)
+    ratio = np.where(designed[:, sections], ratio, 0.0)
+
+    return ratio
+
+
+def native_member_design(
+    prepared, batch, section_tables, case="ULS", combinations=None
+):
+
+    # same outputs as sap_member_design for every combination of a native_run_batch result:
+    # a list of passed flags and a list of failed section names ("None" if everything passes)
+    # with combinations, an element fails when it fails for any of them
+    ratio = native_member_utilization(
+        prepared, batch, section_tables, case, combinations
+    )
+    failed = ratio > 1.0
+
+    # which sections have a failed element, (num combinations, num sections)
+    failed_sections = np.zeros(
+        (len(section_tables), len(prepared["sections"])), dtype=bool
+    )
+    np.logical_or.at(failed_sections.T, prepared["element_sections"], failed.T)
+
+    passed = []
+    failed_section_names = []
+    for n, section_table in enumerate(section_tables):
+        names = sorted(
+            set(
+                section_table[section].get("label", section)
+                for i, section in enumerate(prepared["sections"])
+                if failed_sections[n, i]
+            )
+        )
+        passed.append(len(names) == 0)
+        if len(names) == 0:
+            failed_section_names.append("None")
+        else:
+            failed_section_names.append(", ".join(names))
+
+    return passed, failed_section_names
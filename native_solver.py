@@ -0,0 +1,1053 @@
+import numpy as np
+from scipy.linalg import solveh_banded
+from scipy.sparse import csc_matrix
+from scipy.sparse.linalg import LinearOperator, eigsh, splu
+
+from define_sections import section_properties
+from load_combinations import (
+    combination_factors,
+    design_combinations,
+    span_live_patterns,
+)
+from sap_interface import vibration_response
+
+# native 2D frame solver for the warren truss, in the XZ plane of the SAP model
+# each joint has 3 dofs (U1, U3, R2) and every frame is an euler-bernoulli beam element
+# units follow the SAP model (kN, m), so masses come out in tonnes (kN s2/m)
+# the functions mirror the sap_* pipeline in sap_interface.py so main.py can swap between the two
+
+# material properties (E and Fy in kN/m2, weight per volume in kN/m3, mass per volume in t/m3)
+# E, weight and mass match the SAP defaults for steel and 6061-T6 aluminum. Fy is 350W for the HSS
+# and 6061-T6 for the aluminum, n is the column curve exponent used by native_design.py
+MATERIALS = {
+    "steel": {
+        "E": 199947978.8,
+        "weight": 76.9729,
+        "mass": 7.849,
+        "Fy": 350000.0,
+        "n": 1.34,
+    },
+    "aluminum": {
+        "E": 69637055.0,
+        "weight": 26.6018,
+        "mass": 2.7125,
+        "Fy": 240000.0,
+        "n": 1.34,
+    },
+}
+
+# coordinates are rounded before being used as keys, so points created from different frames merge
+COORD_DECIMALS = 6
+
+
+def native_section_table(section_names, is_alu, extra_sections=None, catalog=None):
+
+    # build the {section: properties} table used by native_run_analysis
+    # properties come from the section catalog if given, otherwise from the dimensions in the labels
+    material = MATERIALS["aluminum"] if is_alu else MATERIALS["steel"]
+    table = {}
+    for section in section_names:
+        props = section_properties(section, is_alu, catalog)
+        props.update(material)
+        props["label"] = section
+        table[section] = props
+
+    # sections that aren't in the XML library (ex. the barrier) are passed in directly
+    if extra_sections is not None:
+        table.update(extra_sections)
+
+    return table
+
+
+def native_initialize_model():
+
+    model = {
+        "point_coords": {},
+        "point_names": {},
+        "frames": {},
+        "restraints": {},
+        "braced_frames": [],
+        "load_patterns": {},
+        "load_cases": {},
+        "results": None,
+    }
+    return model
+
+
+def native_add_point(model, x, y, z):
+
+    key = (round(x, COORD_DECIMALS), round(y, COORD_DECIMALS), round(z, COORD_DECIMALS))
+    if key in model["point_names"]:
+        return model["point_names"][key]
+
+    # name points the same way SAP does, as increasing integers
+    name = str(len(model["point_coords"]) + 1)
+    model["point_names"][key] = name
+    model["point_coords"][name] = key
+    return name
+
+
+def native_add_frame(model, start, end, section):
+
+    point_1 = native_add_point(model, *start)
+    point_2 = native_add_point(model, *end)
+
+    name = str(len(model["frames"]) + 1)
+    while name in model["frames"]:
+        name = str(int(name) + 1)
+
+    model["frames"][name] = {
+        "points": [point_1, point_2],
+        # interior joints where other frames connect (ex. the barrier crossing a web)
+        "joints": [],
+        "section": section,
+        "releases": ([False] * 6, [False] * 6),
+        # list of (load pattern, UDL in the gravity direction)
+        "loads": [],
+    }
+    return name
+
+
+def native_create_frame(
+    model,
+    bottom_chord_points,
+    top_chord_points,
+    diagonal_web_points,
+    vertical_web_points,
+    bottom_chord_section,
+    top_chord_section,
+    web_section,
+):
+
+    bottom_chord_frames = []
+    top_chord_frames = []
+    diagonal_web_frames = []
+    vertical_web_frames = []
+
+    for i in range(len(bottom_chord_points) - 1):
+        bottom_chord_frames.append(
+            native_add_frame(
+                model,
+                bottom_chord_points[i],
+                bottom_chord_points[i + 1],
+                bottom_chord_section,
+            )
+        )
+    for i in range(len(top_chord_points) - 1):
+        top_chord_frames.append(
+            native_add_frame(
+                model, top_chord_points[i], top_chord_points[i + 1], top_chord_section
+            )
+        )
+    for i in range(len(diagonal_web_points) - 1):
+        diagonal_web_frames.append(
+            native_add_frame(
+                model, diagonal_web_points[i], diagonal_web_points[i + 1], web_section
+            )
+        )
+    for i in range(int(len(vertical_web_points) / 2)):
+        vertical_web_frames.append(
+            native_add_frame(
+                model,
+                vertical_web_points[i * 2],
+                vertical_web_points[i * 2 + 1],
+                web_section,
+            )
+        )
+
+    return (
+        bottom_chord_frames,
+        top_chord_frames,
+        diagonal_web_frames,
+        vertical_web_frames,
+    )
+
+
+def native_set_restraint(model, point, restraint):
+    model["restraints"][point] = list(restraint)
+
+
+def native_set_restraints(model, vertical_web_frames, num_spans):
+
+    # same restraints as sap_set_restraints. the y restraints have no effect on the in-plane solve
+    # but are kept so the model matches the SAP one
+    y_translation_restraint = [False, True, False, False, False, False]
+    for frame in vertical_web_frames:
+        point_1, point_2 = model["frames"][frame]["points"]
+        native_set_restraint(model, point_1, y_translation_restraint)
+        native_set_restraint(model, point_2, y_translation_restraint)
+
+    # pin the base of every span end and the top corners of the edge modules
+    pin_restraint = [True, True, True, False, False, False]
+    for i in range(num_spans + 1):
+        point_1, _ = model["frames"][vertical_web_frames[i * 2]]["points"]
+        native_set_restraint(model, point_1, pin_restraint)
+
+    _, point_2 = model["frames"][vertical_web_frames[0]]["points"]
+    native_set_restraint(model, point_2, pin_restraint)
+    _, point_2 = model["frames"][vertical_web_frames[-1]]["points"]
+    native_set_restraint(model, point_2, pin_restraint)
+
+
+def native_set_release(model, frame, release_i, release_j):
+    model["frames"][frame]["releases"] = (list(release_i), list(release_j))
+
+
+def native_set_releases(
+    model,
+    vertical_web_frames,
+    bottom_chord_frames,
+    top_chord_frames,
+    diagonal_web_frames,
+    num_modules,
+    module_divisions,
+):
+
+    # same moment splice releases as sap_set_releases (M3 is the in-plane moment)
+    moment_release = [False, False, False, False, False, True]
+    no_release = [False, False, False, False, False, False]
+
+    for i in range(len(vertical_web_frames)):
+        if i == 0 or i == len(vertical_web_frames) - 1:
+            continue
+        native_set_release(
+            model, vertical_web_frames[i], moment_release, moment_release
+        )
+
+    for i in range(num_modules - 1):
+        native_set_release(
+            model,
+            bottom_chord_frames[module_divisions - 1 + i * module_divisions],
+            no_release,
+            moment_release,
+        )
+        native_set_release(
+            model,
+            top_chord_frames[module_divisions + i * (module_divisions + 1)],
+            no_release,
+            moment_release,
+        )
+
+    for i in range(num_modules - 1):
+        native_set_release(
+            model,
+            diagonal_web_frames[module_divisions * 2 - 1 + i * 2 * module_divisions],
+            no_release,
+            moment_release,
+        )
+
+
+def native_brace_bottom_chord(model, bottom_chord_frames, num_spans, num_divisions):
+
+    # the braces are out of plane, so just record which frames are braced at their midpoint
+    # (used for the kl/r_y check of the native member design)
+    for i in range(num_spans):
+        left_frame = bottom_chord_frames[i * num_divisions * 2]
+        right_frame = bottom_chord_frames[
+            (i * num_divisions * 2) + (num_divisions * 2 - 1)
+        ]
+        model["braced_frames"].append(left_frame)
+        model["braced_frames"].append(right_frame)
+
+
+def native_central_node(model, bottom_chord_frames):
+    index = int(len(bottom_chord_frames) / 2)
+    point_1, _ = model["frames"][bottom_chord_frames[index]]["points"]
+    return point_1
+
+
+def native_barrier_load(model, length, barrier_height, barrier_section, barrier_UDL):
+
+    # find where the frames cross the barrier line, these become joints shared by the barrier and the frame
+    crossings = []
+    for name, frame in model["frames"].items():
+        x_1, _, z_1 = model["point_coords"][frame["points"][0]]
+        x_2, _, z_2 = model["point_coords"][frame["points"][1]]
+        if min(z_1, z_2) < barrier_height < max(z_1, z_2):
+            x = x_1 + (barrier_height - z_1) / (z_2 - z_1) * (x_2 - x_1)
+            if 0 <= x <= length:
+                point = native_add_point(model, x, 0.0, barrier_height)
+                frame["joints"].append(point)
+                crossings.append(x)
+
+    # divide the barrier at the crossings, like EditFrame.DivideAtIntersections
+    stations = sorted(
+        set([0.0, length] + [round(x, COORD_DECIMALS) for x in crossings])
+    )
+    barriers = []
+    for i in range(len(stations) - 1):
+        barrier = native_add_frame(
+            model,
+            (stations[i], 0.0, barrier_height),
+            (stations[i + 1], 0.0, barrier_height),
+            barrier_section,
+        )
+        barriers.append(barrier)
+
+    # horizontal barrier load is out of plane (dir y), so only the vertical pattern is applied
+    model["load_patterns"]["BARRIER_VERTICAL"] = 0
+    model["load_patterns"]["BARRIER_HORIZONTAL"] = 0
+    for barrier in barriers:
+        model["frames"][barrier]["loads"].append(("BARRIER_VERTICAL", barrier_UDL))
+
+    return barriers
+
+
+def native_set_loads(
+    model,
+    bottom_chord_frames,
+    top_chord_frames,
+    dead_factor,
+    live_factor,
+    wearing_surface_factor,
+    concrete_deck_factor,
+    snow_factor,
+    live_UDL,
+    wearing_surface_UDL,
+    concrete_deck_UDL,
+    snow_UDL,
+    roof_UDL,
+):
+
+    # load patterns with their self weight multiplier
+    model["load_patterns"]["DEAD"] = 1
+    model["load_patterns"]["LIVE"] = 0
+    model["load_patterns"]["DECK"] = 0
+    model["load_patterns"]["WEARING SURFACE"] = 0
+    model["load_patterns"]["SNOW"] = 0
+    model["load_patterns"]["ROOF"] = 0
+
+    for frame in bottom_chord_frames:
+        model["frames"][frame]["loads"].append(("LIVE", live_UDL))
+        model["frames"][frame]["loads"].append(("DECK", concrete_deck_UDL))
+        model["frames"][frame]["loads"].append(("WEARING SURFACE", wearing_surface_UDL))
+    for frame in top_chord_frames:
+        model["frames"][frame]["loads"].append(("SNOW", snow_UDL))
+        model["frames"][frame]["loads"].append(("ROOF", roof_UDL))
+
+    # same linear cases as sap_set_loads, as {pattern: factor}
+    uls_combinations, sls_combinations = design_combinations(
+        dead_factor,
+        live_factor,
+        wearing_surface_factor,
+        concrete_deck_factor,
+        snow_factor,
+    )
+    model["load_cases"].update(uls_combinations)
+    model["load_cases"].update(sls_combinations)
+    # every pattern also gets its own linear case, like SAP does when adding a load pattern
+    for pattern in model["load_patterns"]:
+        model["load_cases"][pattern] = {pattern: 1.0}
+
+
+def native_span_live_loads(
+    model, bottom_chord_frames, num_spans, num_divisions, live_UDL
+):
+
+    # the live load of each span on its own, for pattern live loading (load_combinations.py). a span is 2
+    # modules, num_divisions * 2 bottom chord frames
+    for span, pattern in enumerate(span_live_patterns(num_spans)):
+        model["load_patterns"][pattern] = 0
+        model["load_cases"][pattern] = {pattern: 1.0}
+        for frame in bottom_chord_frames[
+            span * num_divisions * 2 : (span + 1) * num_divisions * 2
+        ]:
+            model["frames"][frame]["loads"].append((pattern, live_UDL))
+
+
+def native_gerber_modification(
+    model,
+    vertical_web_frames,
+    top_chord_frames,
+    barrier_frames,
+    num_spans,
+    module_divisions,
+):
+
+    web_deleted = []
+    top_deleted = []
+
+    for index, frame in enumerate(vertical_web_frames):
+        if index % 2 == 0:
+            del model["frames"][frame]
+            web_deleted.append(frame)
+
+    y_translation_restraint = [False, True, False, False, False, False]
+    for i in range(num_spans):
+        left_index = i * (module_divisions + 1) * 2
+        right_index = left_index + (module_divisions + 1) * 2 - 1
+        left_frame = top_chord_frames[left_index]
+        right_frame = top_chord_frames[right_index]
+
+        top_deleted.append(left_frame)
+        top_deleted.append(right_frame)
+
+        _, point_2 = model["frames"][left_frame]["points"]
+        native_set_restraint(model, point_2, y_translation_restraint)
+        point_1, _ = model["frames"][right_frame]["points"]
+        native_set_restraint(model, point_1, y_translation_restraint)
+
+        del model["frames"][left_frame]
+        del model["frames"][right_frame]
+
+    del model["frames"][barrier_frames[0]]
+    del model["frames"][barrier_frames[-1]]
+
+    for web in web_deleted:
+        vertical_web_frames.remove(web)
+    for top in top_deleted:
+        top_chord_frames.remove(top)
+    del barrier_frames[0]
+    del barrier_frames[-1]
+
+    return vertical_web_frames, top_chord_frames, barrier_frames
+
+
+def native_elements(model):
+
+    # split every frame at its interior joints into elements
+    # returns the list of (frame, point_1, point_2, release_i, release_j)
+    elements = []
+    for name, frame in model["frames"].items():
+        point_1, point_2 = frame["points"]
+        x_1, _, z_1 = model["point_coords"][point_1]
+        x_2, _, z_2 = model["point_coords"][point_2]
+        length = np.hypot(x_2 - x_1, z_2 - z_1)
+
+        # order the joints along the frame
+        joints = []
+        for joint in frame["joints"]:
+            x, _, z = model["point_coords"][joint]
+            joints.append((np.hypot(x - x_1, z - z_1) / length, joint))
+        stations = [point_1] + [joint for _, joint in sorted(joints)] + [point_2]
+
+        release_i, release_j = frame["releases"]
+        for i in range(len(stations) - 1):
+            elements.append(
+                (
+                    name,
+                    stations[i],
+                    stations[i + 1],
+                    release_i[5] and i == 0,
+                    release_j[5] and i == len(stations) - 2,
+                )
+            )
+    return elements
+
+
+def element_stiffness(EA, EI, length):
+
+    # local stiffness in (u1, v1, theta1, u2, v2, theta2)
+    a = EA / length
+    b = 12.0 * EI / length**3
+    c = 6.0 * EI / length**2
+    d = 4.0 * EI / length
+    e = 2.0 * EI / length
+    return np.array(
+        [
+            [a, 0, 0, -a, 0, 0],
+            [0, b, c, 0, -b, c],
+            [0, c, d, 0, -c, e],
+            [-a, 0, 0, a, 0, 0],
+            [0, -b, -c, 0, b, -c],
+            [0, c, e, 0, -c, d],
+        ]
+    )
+
+
+def element_load(w_x, w_y, length):
+    # equivalent nodal loads for a uniform load in local x (axial) and y (transverse)
+    return np.array(
+        [
+            w_x * length / 2.0,
+            w_y * length / 2.0,
+            w_y * length**2 / 12.0,
+            w_x * length / 2.0,
+            w_y * length / 2.0,
+            -w_y * length**2 / 12.0,
+        ]
+    )
+
+
+def element_condense(k, f, released):
+
+    # statically condense out the released rotations. the released dofs are left as zero rows/columns
+    if len(released) == 0:
+        return k, f
+    kept = [i for i in range(6) if i not in released]
+    k_rr = k[np.ix_(released, released)]
+    k_kr = k[np.ix_(kept, released)]
+    k_cond = np.zeros((6, 6))
+    f_cond = np.zeros(f.shape)
+    correction = k_kr @ np.linalg.inv(k_rr)
+    k_cond[np.ix_(kept, kept)] = k[np.ix_(kept, kept)] - correction @ k_kr.T
+    f_cond[kept] = f[kept] - correction @ f[released]
+    return k_cond, f_cond
+
+
+def element_mass(length, lumped=True, released=()):
+
+    # mass matrix for a unit mass per length in local axes
+    # lumped puts half the mass on the translations of each end (like SAP), consistent uses the
+    # cubic shape functions, with the rotational terms of released ends dropped
+    if lumped:
+        return np.diag([length / 2.0, length / 2.0, 0, length / 2.0, length / 2.0, 0])
+
+    L = length
+    m = np.array(
+        [
+            [140, 0, 0, 70, 0, 0],
+            [0, 156, 22 * L, 0, 54, -13 * L],
+            [0, 22 * L, 4 * L**2, 0, 13 * L, -3 * L**2],
+            [70, 0, 0, 140, 0, 0],
+            [0, 54, 13 * L, 0, 156, -22 * L],
+            [0, -13 * L, -3 * L**2, 0, -22 * L, 4 * L**2],
+        ]
+    ) * (L / 420.0)
+    for dof in released:
+        m[dof, :] = 0.0
+        m[:, dof] = 0.0
+    return m
+
+
+def element_transformation(c, s):
+    t = np.zeros((6, 6))
+    rotation = np.array([[c, s, 0], [-s, c, 0], [0, 0, 1]])
+    t[:3, :3] = rotation
+    t[3:, 3:] = rotation
+    return t
+
+
+def native_prepare(model):
+
+    # everything that doesn't depend on the section properties is computed once here: dof numbering,
+    # direction cosines, element load vectors and the global stiffness split by section
+    # each section contributes EA * K_axial + EI * K_bending, so the global stiffness for any set of
+    # properties is a linear sum of these matrices (see native_run_batch)
+    elements = native_elements(model)
+    patterns = list(model["load_patterns"])
+    sections = sorted(set(frame["section"] for frame in model["frames"].values()))
+
+    # only number the points that have elements attached (brace points and points orphaned by the
+    # gerber modification are skipped)
+    nodes = []
+    node_index = {}
+    for _, point_1, point_2, _, _ in elements:
+        for point in (point_1, point_2):
+            if point not in node_index:
+                node_index[point] = len(nodes)
+                nodes.append(point)
+
+    # number the points along the span (then by height) so every element couples nearby dofs only.
+    # this keeps the bandwidth of the stiffness constant as the bridge gets longer
+    nodes = sorted(
+        nodes,
+        key=lambda point: (
+            model["point_coords"][point][0],
+            model["point_coords"][point][2],
+        ),
+    )
+    node_index = {point: index for index, point in enumerate(nodes)}
+    ndof = 3 * len(nodes)
+
+    num_elements = len(elements)
+    element_dofs = np.zeros((num_elements, 6), dtype=int)
+    element_sections = np.zeros(num_elements, dtype=int)
+    element_t = np.zeros((num_elements, 6, 6))
+    element_k_axial = np.zeros((num_elements, 6, 6))
+    element_k_bending = np.zeros((num_elements, 6, 6))
+    element_m_lumped = np.zeros((num_elements, 6, 6))
+    element_m_consistent = np.zeros((num_elements, 6, 6))
+    # applied loads per pattern, and the self weight of a unit weight per length
+    element_f_applied = np.zeros((num_elements, 6, len(patterns)))
+    element_f_weight = np.zeros((num_elements, 6, len(patterns)))
+    # transverse UDL on each element per pattern (applied and unit self weight), and element lengths
+    element_w_applied = np.zeros((num_elements, len(patterns)))
+    element_w_weight = np.zeros((num_elements, len(patterns)))
+    element_lengths = np.zeros(num_elements)
+
+    self_weight = np.array([model["load_patterns"][pattern] for pattern in patterns])
+
+    for i, (frame, point_1, point_2, release_i, release_j) in enumerate(elements):
+        x_1, _, z_1 = model["point_coords"][point_1]
+        x_2, _, z_2 = model["point_coords"][point_2]
+        length = np.hypot(x_2 - x_1, z_2 - z_1)
+        c = (x_2 - x_1) / length
+        s = (z_2 - z_1) / length
+
+        # gravity UDL per unit length of frame, projected into local axes
+        f = np.zeros((6, len(patterns)))
+        for pattern, w in model["frames"][frame]["loads"]:
+            f[:, patterns.index(pattern)] += element_load(-s * w, -c * w, length)
+            element_w_applied[i, patterns.index(pattern)] += -c * w
+        f_weight = np.outer(element_load(-s, -c, length), self_weight)
+        element_w_weight[i] = -c * self_weight
+        element_lengths[i] = length
+
+        # the releases only involve the bending terms, so condensing the unit EI stiffness is enough
+        released = []
+        if release_i:
+            released.append(2)
+        if release_j:
+            released.append(5)
+        k_bending, f = element_condense(
+            element_stiffness(0.0, 1.0, length), f, released
+        )
+        _, f_weight = element_condense(
+            element_stiffness(0.0, 1.0, length), f_weight, released
+        )
+
+        element_dofs[i] = [
+            3 * node_index[point_1],
+            3 * node_index[point_1] + 1,
+            3 * node_index[point_1] + 2,
+            3 * node_index[point_2],
+            3 * node_index[point_2] + 1,
+            3 * node_index[point_2] + 2,
+        ]
+        element_sections[i] = sections.index(model["frames"][frame]["section"])
+        element_t[i] = element_transformation(c, s)
+        element_k_axial[i] = element_stiffness(1.0, 0.0, length)
+        element_k_bending[i] = k_bending
+        element_m_lumped[i] = element_mass(length)
+        element_m_consistent[i] = element_mass(length, False, released)
+        element_f_applied[i] = f
+        element_f_weight[i] = f_weight
+
+    # global matrices in the order (axial section 1, bending section 1, axial section 2, ...)
+    k_global_axial = np.einsum(
+        "eji,ejk,ekl->eil", element_t, element_k_axial, element_t
+    )
+    k_global_bending = np.einsum(
+        "eji,ejk,ekl->eil", element_t, element_k_bending, element_t
+    )
+    f_global_applied = np.einsum("eji,ejp->eip", element_t, element_f_applied)
+    f_global_weight = np.einsum("eji,ejp->eip", element_t, element_f_weight)
+
+    F_weight = np.zeros((len(sections), ndof, len(patterns)))
+    F_applied = np.zeros((ndof, len(patterns)))
+    np.add.at(F_weight, (element_sections[:, None], element_dofs), f_global_weight)
+    np.add.at(F_applied, element_dofs, f_global_applied)
+
+    # restrained dofs are U1, U3 and R2 of the SAP restraint
+    restrained = np.zeros(ndof, dtype=bool)
+    for point, restraint in model["restraints"].items():
+        if point in node_index:
+            restrained[3 * node_index[point]] = restraint[0]
+            restrained[3 * node_index[point] + 1] = restraint[2]
+            restrained[3 * node_index[point] + 2] = restraint[4]
+    free = ~restrained
+    free_index = np.cumsum(free) - 1
+
+    # sparsity pattern of the global stiffness, shared by every section. K_values holds the value of
+    # each nonzero for a unit EA or EI of each section, in the order (axial section 1, bending section 1,
+    # axial section 2, ...), so the stiffness for any properties is stiffness @ K_values
+    rows = np.broadcast_to(element_dofs[:, :, None], (num_elements, 6, 6)).ravel()
+    cols = np.broadcast_to(element_dofs[:, None, :], (num_elements, 6, 6)).ravel()
+    entries, inverse = np.unique(rows * ndof + cols, return_inverse=True)
+    rows = entries // ndof
+    cols = entries % ndof
+    K_values = np.zeros((2 * len(sections), len(entries)))
+    coefficient = np.repeat(2 * element_sections, 36)
+    np.add.at(K_values, (coefficient, inverse), k_global_axial.ravel())
+    np.add.at(K_values, (coefficient + 1, inverse), k_global_bending.ravel())
+
+    # mass matrices use the same pattern, with values for a unit mass per length of each section
+    M_lumped_values = np.zeros((len(sections), len(entries)))
+    M_consistent_values = np.zeros((len(sections), len(entries)))
+    coefficient = np.repeat(element_sections, 36)
+    np.add.at(
+        M_lumped_values,
+        (coefficient, inverse),
+        np.einsum("eji,ejk,ekl->eil", element_t, element_m_lumped, element_t).ravel(),
+    )
+    np.add.at(
+        M_consistent_values,
+        (coefficient, inverse),
+        np.einsum(
+            "eji,ejk,ekl->eil", element_t, element_m_consistent, element_t
+        ).ravel(),
+    )
+
+    # free-free entries, with their position in the dense and in the upper banded storage
+    # used by scipy.linalg.solveh_banded (ab[bandwidth + i - j, j] = K[i, j] for i <= j)
+    in_free = free[rows] & free[cols]
+    free_rows = free_index[rows[in_free]]
+    free_cols = free_index[cols[in_free]]
+    bandwidth = int(np.max(np.abs(free_rows - free_cols)))
+    upper = free_rows <= free_cols
+
+    # restrained rows are kept dense, there are only a few of them
+    in_restrained = ~free[rows]
+    restrained_index = np.cumsum(restrained) - 1
+    K_restrained = np.zeros((2 * len(sections), np.sum(restrained), ndof))
+    K_restrained[:, restrained_index[rows[in_restrained]], cols[in_restrained]] = (
+        K_values[:, in_restrained]
+    )
+
+    prepared = {
+        "model": model,
+        "patterns": patterns,
+        "sections": sections,
+        "node_index": node_index,
+        "free": free,
+        "bandwidth": bandwidth,
+        "K_free_values": K_values[:, in_free],
+        "K_free_rows": free_rows,
+        "K_free_cols": free_cols,
+        "K_banded_values": K_values[:, in_free][:, upper],
+        "K_banded_rows": bandwidth + free_rows[upper] - free_cols[upper],
+        "K_banded_cols": free_cols[upper],
+        "K_restrained": K_restrained,
+        "M_lumped_free_values": M_lumped_values[:, in_free],
+        "M_consistent_free_values": M_consistent_values[:, in_free],
+        # vertical (U3) free dofs, for the participating mass ratios
+        "free_uz": (np.arange(ndof) % 3 == 1)[free],
+        "F_weight": F_weight,
+        "F_applied": F_applied,
+        "element_frames": [element[0] for element in elements],
+        "element_dofs": element_dofs,
+        "element_sections": element_sections,
+        "element_t": element_t,
+        "element_k_axial": element_k_axial,
+        "element_k_bending": element_k_bending,
+        "element_f_applied": element_f_applied,
+        "element_f_weight": element_f_weight,
+        "element_w_applied": element_w_applied,
+        "element_w_weight": element_w_weight,
+        "element_lengths": element_lengths,
+    }
+    return prepared
+
+
+def native_section_coefficients(prepared, section_tables):
+
+    # (EA, EI) for each section in the order of K_values, and the self weight and mass per length of
+    # each section. one row per section table
+    stiffness = np.zeros((len(section_tables), 2 * len(prepared["sections"])))
+    weight = np.zeros((len(section_tables), len(prepared["sections"])))
+    mass = np.zeros((len(section_tables), len(prepared["sections"])))
+    for n, section_table in enumerate(section_tables):
+        for i, section in enumerate(prepared["sections"]):
+            props = section_table[section]
+            stiffness[n, 2 * i] = props["E"] * props["A"]
+            stiffness[n, 2 * i + 1] = props["E"] * props["I"]
+            weight[n, i] = props["weight"] * props["A"]
+            mass[n, i] = props["mass"] * props["A"]
+    return stiffness, weight, mass
+
+
+def native_combination_table(
+    top_chord_section,
+    bottom_chord_section,
+    web_section,
+    is_alu,
+    extra_sections=None,
+    catalog=None,
+):
+
+    # section table for a template model built with the TOP_CHORD, BOTTOM_CHORD and WEB placeholders
+    properties = native_section_table(
+        [top_chord_section, bottom_chord_section, web_section],
+        is_alu,
+        catalog=catalog,
+    )
+    section_table = {
+        "TOP_CHORD": properties[top_chord_section],
+        "BOTTOM_CHORD": properties[bottom_chord_section],
+        "WEB": properties[web_section],
+    }
+    if extra_sections is not None:
+        section_table.update(extra_sections)
+    return section_table
+
+
+def native_run_batch(prepared, section_tables, chunk_size=32, solver="banded"):
+
+    # solve one prepared model for many section tables at once
+    # solver="dense" stacks the stiffness matrices and solves them with a single batched np.linalg.solve,
+    # chunk_size bounds the size of the stack. solver="banded" uses a banded cholesky per combination,
+    # which scales linearly with the length of the bridge instead of cubically
+    # section_table maps the section names the model was built with to their properties
+    stiffness, weight, _ = native_section_coefficients(prepared, section_tables)
+    free = prepared["free"]
+    sections = prepared["element_sections"]
+    num_combinations = len(section_tables)
+    ndof, num_patterns = prepared["F_applied"].shape
+    num_elements = len(sections)
+    num_free = np.sum(free)
+
+    U = np.zeros((num_combinations, ndof, num_patterns))
+    R = np.zeros((num_combinations, ndof, num_patterns))
+    element_forces = np.zeros((num_combinations, num_elements, 6, num_patterns))
+    element_loads = np.zeros((num_combinations, num_elements, num_patterns))
+
+    for start in range(0, num_combinations, chunk_size):
+        end = min(start + chunk_size, num_combinations)
+        chunk_stiffness = stiffness[start:end]
+        chunk_weight = weight[start:end]
+
+        F = prepared["F_applied"] + np.tensordot(
+            chunk_weight, prepared["F_weight"], axes=1
+        )
+
+        # solve every load pattern at once, cases are built by superposition
+        if solver == "dense":
+            K_free = np.zeros((end - start, num_free, num_free))
+            K_free[:, prepared["K_free_rows"], prepared["K_free_cols"]] = (
+                chunk_stiffness @ prepared["K_free_values"]
+            )
+            U[start:end, free] = np.linalg.solve(K_free, F[:, free])
+        elif solver == "banded":
+            K_banded = np.zeros((prepared["bandwidth"] + 1, num_free))
+            values = chunk_stiffness @ prepared["K_banded_values"]
+            for n in range(end - start):
+                K_banded[prepared["K_banded_rows"], prepared["K_banded_cols"]] = values[
+                    n
+                ]
+                U[start + n, free] = solveh_banded(K_banded, F[n, free])
+        else:
+            raise ValueError(f"Unknown native solver: {solver}")
+
+        # reactions only need the restrained rows of the stiffness
+        K_restrained = np.tensordot(chunk_stiffness, prepared["K_restrained"], axes=1)
+        R[start:end, ~free] = K_restrained @ U[start:end] - F[:, ~free]
+
+        # element end forces in local axes (axial, shear, moment), per pattern
+        k = (
+            chunk_stiffness[:, 2 * sections, None, None] * prepared["element_k_axial"]
+            + chunk_stiffness[:, 2 * sections + 1, None, None]
+            * prepared["element_k_bending"]
+        )
+        f = (
+            prepared["element_f_applied"]
+            + chunk_weight[:, sections, None, None] * prepared["element_f_weight"]
+        )
+        u_local = prepared["element_t"] @ U[start:end][:, prepared["element_dofs"]]
+        element_forces[start:end] = k @ u_local - f
+        element_loads[start:end] = (
+            prepared["element_w_applied"]
+            + chunk_weight[:, sections, None] * prepared["element_w_weight"]
+        )
+
+    results = {
+        "patterns": prepared["patterns"],
+        "node_index": prepared["node_index"],
+        "displacements": U,
+        "reactions": R,
+        "element_frames": prepared["element_frames"],
+        "element_forces": element_forces,
+        "element_loads": element_loads,
+    }
+    return results
+
+
+def native_run_prepared(prepared, section_table, solver="banded"):
+
+    # single combination, stored on the model so the native_* result functions can read it
+    batch = native_run_batch(prepared, [section_table], solver=solver)
+    results = {
+        "patterns": batch["patterns"],
+        "node_index": batch["node_index"],
+        "displacements": batch["displacements"][0],
+        "reactions": batch["reactions"][0],
+        "element_frames": batch["element_frames"],
+        "element_forces": batch["element_forces"][0],
+        "element_loads": batch["element_loads"][0],
+    }
+    prepared["model"]["results"] = results
+    return results
+
+
+def native_batch_deflection(
+    prepared, batch, bottom_chord_frames, span_length, combinations=None
+):
+
+    # same as native_deflection, for every combination of a native_run_batch result. with combinations
+    # ({name: {pattern: factor}}, see load_combinations.py) the largest deflection over them, superposed
+    # from the pattern displacements, instead of the SLS case
+    deflection_limit = span_length / 360.0
+
+    model = prepared["model"]
+    if combinations is None:
+        combinations = {"SLS": model["load_cases"]["SLS"]}
+    center_node = native_central_node(model, bottom_chord_frames)
+    dof = 3 * batch["node_index"][center_node] + 1
+    factors = combination_factors(batch["patterns"], combinations)
+    deflection = np.max(np.abs(batch["displacements"][:, dof] @ factors), axis=1)
+    percentage = deflection / deflection_limit * 100
+
+    return deflection, percentage
+
+
+def native_batch_module_mass(prepared, batch, num_modules):
+
+    # same as native_module_mass, for every combination of a native_run_batch result
+    factors = native_case_factors(prepared["model"], "DEAD", batch["patterns"])
+    reaction = np.sum(batch["reactions"][:, 1::3] @ factors, axis=1)
+
+    total_mass = reaction / 9.81 * 1000
+    module_mass = total_mass / num_modules
+
+    return module_mass
+
+
+def native_run_analysis(model, section_table, solver="banded"):
+    return native_run_prepared(native_prepare(model), section_table, solver)
+
+
+def native_run_modal(prepared, section_tables, num_modes=6, lumped=True):
+
+    # lowest num_modes modes for each section table, from a lanczos solve of the inverse problem
+    # the truss is only modelled in plane (no lateral modes), so the governing vertical mode is among
+    # the first few instead of needing the 40 modes of the SAP MODAL case
+    # the lumped mass has no rotational terms, so its M is singular. the dofs without mass are condensed
+    # out (K_c = K_mm - K_mr K_rr^-1 K_rm) and the modes come from M^-1/2 K_c M^-1/2 on the dofs with
+    # mass, where K_c^-1 is applied through a factorization of the full K (the condensed dofs carry no
+    # load). the consistent mass is positive definite and uses a shift-invert solve around 0 Hz
+    # returns the periods and Uz participating mass ratios, each (num section tables, num_modes)
+    stiffness, _, mass = native_section_coefficients(prepared, section_tables)
+    rows = prepared["K_free_rows"]
+    cols = prepared["K_free_cols"]
+    num_free = len(prepared["free_uz"])
+    if lumped:
+        M_values = prepared["M_lumped_free_values"]
+    else:
+        M_values = prepared["M_consistent_free_values"]
+
+    # unit vertical ground displacement
+    r = prepared["free_uz"].astype(float)
+
+    periods = np.zeros((len(section_tables), num_modes))
+    Uz = np.zeros((len(section_tables), num_modes))
+    for n in range(len(section_tables)):
+        K = csc_matrix(
+            (stiffness[n] @ prepared["K_free_values"], (rows, cols)),
+            shape=(num_free, num_free),
+        )
+        M = csc_matrix((mass[n] @ M_values, (rows, cols)), shape=(num_free, num_free))
+        if lumped:
+            # the lumped M is diagonal
+            m = M.diagonal()
+            massed = m > 0
+            num_massed = np.sum(massed)
+            if num_modes >= num_massed:
+                raise ValueError(
+                    f"{num_modes} modes asked for a model with {num_massed} dofs with mass"
+                )
+            sqrt_m = np.sqrt(m[massed])
+            K_lu = splu(K)
+
+            def flexibility(y):
+                load = np.zeros(num_free)
+                load[massed] = sqrt_m * np.ravel(y)
+                return sqrt_m * K_lu.solve(load)[massed]
+
+            inverse_eigenvalues, modes = eigsh(
+                LinearOperator((num_massed, num_massed), matvec=flexibility),
+                k=num_modes,
+                which="LA",
+            )
+            order = np.argsort(inverse_eigenvalues)[::-1]
+            eigenvalues = 1.0 / inverse_eigenvalues[order]
+            # the modes are mass normalized, phi = M^-1/2 y
+            M_r = m[massed] * r[massed]
+            modal_mass = np.ones(num_modes)
+            participation = (modes[:, order].T / sqrt_m) @ M_r
+            r_M_r = r[massed] @ M_r
+        else:
+            eigenvalues, modes = eigsh(K, k=num_modes, M=M, sigma=0, which="LM")
+            order = np.argsort(eigenvalues)
+            eigenvalues = eigenvalues[order]
+            modes = modes[:, order]
+            M_r = M @ r
+            modal_mass = np.sum(modes * (M @ modes), axis=0)
+            participation = modes.T @ M_r
+            r_M_r = r @ M_r
+
+        # participating mass ratio = (phi' M r)^2 / (phi' M phi) / (r' M r)
+        Uz[n] = participation**2 / modal_mass / r_M_r
+        periods[n] = 2 * np.pi / np.sqrt(eigenvalues)
+
+    return periods, Uz
+
+
+def native_case_factors(model, case, patterns=None):
+    # factors on each solved pattern for a load case
+    if patterns is None:
+        patterns = model["results"]["patterns"]
+    factors = np.zeros(len(patterns))
+    for pattern, factor in model["load_cases"][case].items():
+        factors[patterns.index(pattern)] = factor
+    return factors
+
+
+def native_joint_displacement(model, point, case):
+    results = model["results"]
+    node = results["node_index"][point]
+    U = results["displacements"] @ native_case_factors(model, case)
+    # (U1, U3, R2)
+    return U[3 * node], U[3 * node + 1], U[3 * node + 2]
+
+
+def native_base_reaction(model, case):
+    results = model["results"]
+    R = results["reactions"] @ native_case_factors(model, case)
+    # (FX, FZ)
+    return np.sum(R[0::3]), np.sum(R[1::3])
+
+
+def native_frame_forces(model, case):
+    # element end forces in local axes for every element, with the frame each element belongs to
+    results = model["results"]
+    forces = results["element_forces"] @ native_case_factors(model, case)
+    return results["element_frames"], forces
+
+
+def native_deflection(model, bottom_chord_frames, span_length):
+
+    deflection_limit = span_length / 360.0
+
+    center_node = native_central_node(model, bottom_chord_frames)
+    _, temp, _ = native_joint_displacement(model, center_node, "SLS")
+    deflection = abs(temp)
+    percentage = deflection / deflection_limit * 100
+
+    return deflection, percentage
+
+
+def native_module_mass(model, num_modules):
+
+    _, reaction = native_base_reaction(model, "DEAD")
+
+    # convert kN to kg
+    total_mass = reaction / 9.81 * 1000
+    module_mass = total_mass / num_modules
+
+    return module_mass
+
+
+def native_vibration_analysis(
+    periods, Uz, pedestrian_density, concrete_deck_UDL, live_UDL
+):
+
+    # same as sap_vibration_analysis, from the periods and Uz ratios of one row of native_run_modal
+    mode_index = np.argmax(Uz)
+    natural_frequency = 1 / periods[mode_index]
+
+    (
+        in_crit_range,
+        natural_frequency_occupied,
+        m_empty,
+        m_occupied,
+    ) = vibration_response(
+        natural_frequency, pedestrian_density, concrete_deck_UDL, live_UDL
+    )
+
+    return (
+        natural_frequency,
+        in_crit_range,
+        natural_frequency_occupied,
+        m_empty,
+        m_occupied,
+    )
@@ -0,0 +1,321 @@
+import time
+
+import numpy as np
+
+from sweep import is_screened
+
+# Pareto front extraction and ranking of the sweep results. objectives are (n, k) arrays with every column
+# minimised (negate a column to maximise it, ex. the resonating harmonic)
+#
+# equal rows don't dominate each other, so the front is found on the unique rows, sorted lexicographically
+# (np.unique), and mapped back. in that order a row can only be dominated by rows before it, which are no
+# larger in the first objective, so only the other objectives are compared. the front is built
+# block_size rows at a time, each block checked against the front found so far and against the rows before
+# it in the block:
+#   2 objectives  running minimum of the second objective
+#   3 objectives  staircase of the front projected on the second and third objectives, one binary
+#                 search per row
+#   more          every row of the block against every row of the front
+# so it handles 10^6 rows for the 2 and 3 objectives of interpret_results
+#
+# during the sweep, the online front keeps the Pareto front of the results so far (open_online_front), so
+# main.py can show the best combination as it goes and stop a sheet early (stop_early) once the front
+# stops changing or a time or analysis budget runs out
+
+# columns of the objectives of the sections: module mass (minimised), occupied resonating harmonic
+# (maximised) and SLS deflection (minimised), over the rows passing ULS
+OBJECTIVE_COLUMNS = [
+    "Module mass (kg)",
+    "Resonating harmonic occupied",
+    "Max vertical deflection for SLS (m)",
+]
+PASSED_COLUMN = "Passed member design check for ULS"
+
+
+def staircase(rows):
+    # the rows of a 2 objective set not dominated by another (in the projection), sorted by the first
+    # objective, so the second one decreases
+    rows = rows[np.lexsort(rows.T[::-1])]
+    previous = np.minimum.accumulate(rows[:, 1])
+    return rows[np.r_[True, rows[1:, 1] < previous[:-1]]]
+
+
+def dominated_by_front(front, rows):
+    # mask of rows dominated by at least one row of front, both without the first objective, every front row
+    # coming before every row in the sorted order. with 2 objectives left front is a staircase
+    if len(front) == 0:
+        return np.zeros(len(rows), dtype=bool)
+    if front.shape[1] == 2:
+        position = np.searchsorted(front[:, 0], rows[:, 0], side="right")
+        return (position > 0) & (front[np.maximum(position - 1, 0), 1] <= rows[:, 1])
+    return np.any(np.all(front[None, :, :] <= rows[:, None, :], axis=2), axis=1)
+
+
+def unique_rows(objectives):
+    # the unique rows sorted lexicographically, without the first objective, and the unique row of each row
+    order = np.lexsort(objectives.T[::-1])
+    ordered = objectives[order]
+    new = np.r_[True, np.any(ordered[1:] != ordered[:-1], axis=1)]
+    inverse = np.empty(len(objectives), dtype=int)
+    inverse[order] = np.cumsum(new) - 1
+    return ordered[new][:, 1:], inverse
+
+
+def sorted_front(rest, block_size):
+    # nondominated on the output of unique_rows (or a subset of its rows, which stays sorted)
+    front = np.zeros(len(rest), dtype=bool)
+    if len(rest) == 0:
+        return front
+    if rest.shape[1] == 0:
+        front[0] = True
+        return front
+    if rest.shape[1] == 1:
+        # dominated when an earlier row has a second objective no larger
+        previous = np.minimum.accumulate(rest[:, 0])
+        front[0] = True
+        front[1:] = rest[1:, 0] < previous[:-1]
+        return front
+
+    front_rows = rest[:0]
+    for start in range(0, len(rest), block_size):
+        block = rest[start : start + block_size]
+        candidates = np.flatnonzero(~dominated_by_front(front_rows, block))
+        # against the earlier candidates of the block. a candidate dominated by a block row that is itself
+        # dominated is also dominated by the row dominating that one, so the candidates are enough
+        rows = block[candidates]
+        earlier = np.tri(len(rows), k=-1, dtype=bool)
+        within = np.any(
+            np.all(rows[None, :, :] <= rows[:, None, :], axis=2) & earlier, axis=1
+        )
+        survivors = candidates[~within]
+        if len(survivors) == 0:
+            continue
+        front[start + survivors] = True
+        front_rows = np.concatenate([front_rows, block[survivors]])
+        if front_rows.shape[1] == 2:
+            front_rows = staircase(front_rows)
+    return front
+
+
+def nondominated(objectives, block_size=256):
+    # mask of the rows not dominated by any other row
+    objectives = np.asarray(objectives, dtype=float)
+    if len(objectives) == 0:
+        return np.zeros(0, dtype=bool)
+    rest, inverse = unique_rows(objectives)
+    return sorted_front(rest, block_size)[inverse]
+
+
+def pareto_ranks(objectives, max_rank=None, block_size=256):
+    # non-dominated sorting: rank 1 is the Pareto front, rank 2 the front once rank 1 is removed, and so on.
+    # with max_rank the sort stops early and the remaining rows get max_rank + 1. the rows are only sorted
+    # once, every rank is found on the remaining unique rows
+    objectives = np.asarray(objectives, dtype=float)
+    if len(objectives) == 0:
+        return np.zeros(0, dtype=int)
+    rest, inverse = unique_rows(objectives)
+    ranks = np.zeros(len(rest), dtype=int)
+    remaining = np.arange(len(rest))
+    rank = 1
+    while len(remaining) > 0 and (max_rank is None or rank <= max_rank):
+        front = sorted_front(rest[remaining], block_size)
+        ranks[remaining[front]] = rank
+        remaining = remaining[~front]
+        rank += 1
+    ranks[remaining] = rank
+    return ranks[inverse]
+
+
+def crowding_distance(objectives, ranks):
+
+    # NSGA-II crowding distance of every row within its rank: the sum over the objectives of the gap
+    # between its two neighbours, over the range of the objective in the rank. the rows at the ends of a
+    # rank get inf, so a larger distance means a less crowded part of the front
+    objectives = np.asarray(objectives, dtype=float)
+    num_rows = len(objectives)
+    distance = np.zeros(num_rows)
+    if num_rows == 0:
+        return distance
+
+    for values in objectives.T:
+        order = np.lexsort((values, ranks))
+        sorted_values = values[order]
+        sorted_ranks = ranks[order]
+        first = np.r_[True, sorted_ranks[1:] != sorted_ranks[:-1]]
+        last = np.r_[sorted_ranks[1:] != sorted_ranks[:-1], True]
+
+        # range of the objective in each rank, repeated for each of its rows
+        starts = np.flatnonzero(first)
+        ends = np.flatnonzero(last)
+        span = np.repeat(sorted_values[ends] - sorted_values[starts], ends - starts + 1)
+
+        gap = np.zeros(num_rows)
+        gap[1:-1] = sorted_values[2:] - sorted_values[:-2]
+        gap = np.divide(gap, span, out=np.zeros(num_rows), where=span > 0)
+        gap[first | last] = np.inf
+        distance[order] += gap
+
+    return distance
+
+
+def normalize_objectives(mass, harmonic, deflection, low=None, high=None):
+
+    # normalize the harmonics, masses and deflections so they range from 0 to 1, where 1 is good and 0 is bad
+    # for instance, a high harmonic is good so normalize up, whereas low mass is good so normalize down
+    # low and high are the [mass, harmonic, deflection] to normalize between, the ranges of the arrays by
+    # default
+    if low is None:
+        low = [np.min(mass), np.min(harmonic), np.min(deflection)]
+    if high is None:
+        high = [np.max(mass), np.max(harmonic), np.max(deflection)]
+    min_mass, min_harmonic, min_deflection = low
+    max_mass, max_harmonic, max_deflection = high
+
+    normalized_mass = 1.0 - (mass - min_mass) / (max_mass - min_mass)
+    normalized_harmonic = (harmonic - min_harmonic) / (max_harmonic - min_harmonic)
+    normalized_deflection = 1.0 - (deflection - min_deflection) / (
+        max_deflection - min_deflection
+    )
+    return normalized_mass, normalized_harmonic, normalized_deflection
+
+
+def section_scores(
+    normalized_mass,
+    normalized_harmonic,
+    normalized_deflection,
+    cost_matrix_weighting=0.35,
+    serviceability_matrix_weighting=0.1,
+):
+
+    # assign equal weighting to mass and harmonic
+    mass_weighting = cost_matrix_weighting / (
+        cost_matrix_weighting + serviceability_matrix_weighting
+    )
+    harmonic_weighting = (serviceability_matrix_weighting / 2.0) / (
+        cost_matrix_weighting + serviceability_matrix_weighting
+    )
+    deflection_weighting = (serviceability_matrix_weighting / 2.0) / (
+        cost_matrix_weighting + serviceability_matrix_weighting
+    )
+    score = (
+        mass_weighting * normalized_mass
+        + harmonic_weighting * normalized_harmonic
+        + deflection_weighting * normalized_deflection
+    )
+    return score
+
+
+def open_online_front(max_unchanged=None, max_seconds=None, max_analyses=None):
+
+    # Pareto front of the results of a sweep so far, see update_online_front. the limits of stop_early
+    # (None for no limit): the number of results in a row that didn't change the front, the time since
+    # opening (s) and the number of results
+    return {
+        "rows": [],  # rows on the front
+        "objectives": np.zeros((0, 3)),  # [mass, -harmonic, deflection] of the rows
+        # range of [mass, harmonic, deflection] over every passing row, to normalize the scores like
+        # determine_optimal_section
+        "low": None,
+        "high": None,
+        "analyses": 0,
+        "unchanged": 0,
+        "start": time.perf_counter(),
+        "max_unchanged": max_unchanged,
+        "max_seconds": max_seconds,
+        "max_analyses": max_analyses,
+    }
+
+
+def update_online_front(front, row):
+    # adds a result (None for a failed analysis) to the front, returns True when the front changed. rows
+    # of the surrogate screen aren't analyses and don't count towards the limits of stop_early
+    if is_screened(row):
+        return False
+    front["analyses"] += 1
+    changed = False
+    if row is not None and row[PASSED_COLUMN]:
+        values = np.array([float(row[column]) for column in OBJECTIVE_COLUMNS])
+        if front["low"] is None:
+            front["low"] = values
+            front["high"] = values
+        front["low"] = np.minimum(front["low"], values)
+        front["high"] = np.maximum(front["high"], values)
+
+        objectives = values * [1.0, -1.0, 1.0]
+        existing = front["objectives"]
+        if not np.any(
+            np.all(existing <= objectives, axis=1)
+            & np.any(existing < objectives, axis=1)
+        ):
+            # the new row joins the front, and the rows it dominates leave
+            keep = ~(
+                np.all(objectives <= existing, axis=1)
+                & np.any(objectives < existing, axis=1)
+            )
+            front["rows"] = [
+                front_row for front_row, kept in zip(front["rows"], keep) if kept
+            ] + [row]
+            front["objectives"] = np.vstack([existing[keep], objectives])
+            changed = True
+    front["unchanged"] = 0 if changed else front["unchanged"] + 1
+    return changed
+
+
+def seed_online_front(front, rows):
+    # results from before (ex. load_results from the results store when resuming), they don't count
+    # towards the limits of stop_early
+    for row in rows:
+        update_online_front(front, row)
+    front["analyses"] = 0
+    front["unchanged"] = 0
+
+
+def online_optimum(
+    front, cost_matrix_weighting=0.35, serviceability_matrix_weighting=0.1
+):
+    # the row determine_optimal_section would pick from the passing rows so far (it is always on the
+    # front), None before any row passes
+    if len(front["rows"]) == 0:
+        return None
+    mass, harmonic, deflection = (front["objectives"] * [1.0, -1.0, 1.0]).T
+    # an objective that is the same for every passing row so far (ex. only one passed) doesn't count
+    with np.errstate(divide="ignore", invalid="ignore"):
+        normalized = normalize_objectives(
+            mass, harmonic, deflection, front["low"], front["high"]
+        )
+    score = section_scores(
+        *[np.nan_to_num(values, nan=1.0) for values in normalized],
+        cost_matrix_weighting,
+        serviceability_matrix_weighting,
+    )
+    return front["rows"][np.argmax(score)]
+
+
+def stop_reason(front):
+    # why the sweep should stop, None to keep going
+    if (
+        front["max_unchanged"] is not None
+        and front["unchanged"] >= front["max_unchanged"]
+    ):
+        return f"Pareto front unchanged for {front['unchanged']} combinations"
+    if (
+        front["max_seconds"] is not None
+        and time.perf_counter() - front["start"] >= front["max_seconds"]
+    ):
+        return f"time budget of {front['max_seconds']} s used"
+    if front["max_analyses"] is not None and front["analyses"] >= front["max_analyses"]:
+        return f"budget of {front['max_analyses']} analyses used"
+    return None
+
+
+def stop_early(sweep, front):
+    # passes the (combination, row) of a sweep runner through, updating the front, and stops (closing the
+    # runner, so SAP is closed or the workers stopped) once stop_reason says so
+    try:
+        for combination, row in sweep:
+            update_online_front(front, row)
+            yield combination, row
+            if stop_reason(front) is not None:
+                return
+    finally:
+        sweep.close()
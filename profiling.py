@@ -0,0 +1,248 @@
+import functools
+import json
+import os
+import time
+import tracemalloc
+from collections import Counter
+from contextlib import contextmanager
+
+import numpy as np
+
+# per stage instrumentation of the sweep (python main.py --profile). every sap_* function (and the output
+# writers) is a stage: while profiling is on, each call records its wall time, the number of COM calls
+# made during it, and the change in python memory. the stages of one combination are collected into a
+# trace record, written as one line of the trace file (JSON lines), and profile_summary gives the
+# percentiles per stage at the end of the sweep
+#
+# stage times include the stages nested in them (ex. sap_build_model includes sap_create_frame), depth is
+# the nesting level. stages that run outside a combination in the main process (opening SAP, writing the
+# output) are written as a record with combination None when profiling stops. with num_workers > 1 the
+# workers profile their own stages and send the trace records back with the results, only the main process
+# writes the file
+#
+# profiling is off by default and then costs one check per call. memory is measured with tracemalloc,
+# which slows python allocations down, so memory=False leaves it out
+
+# state while profiling is on, None when off
+PROFILER = None
+
+
+def start_profiling(trace_path=None, memory=True):
+    global PROFILER
+    if trace_path is not None:
+        os.makedirs(os.path.dirname(os.path.abspath(trace_path)), exist_ok=True)
+        open(trace_path, "w").close()
+    if memory and not tracemalloc.is_tracing():
+        tracemalloc.start()
+    PROFILER = {
+        "trace_path": trace_path,
+        "memory": memory,
+        "com_calls": Counter(),  # "SapModel.Interface.Method" -> calls
+        "depth": 0,
+        "current": None,  # trace record of the combination being analysed
+        "stages": [],  # stages outside a combination
+        "traces": [],
+    }
+
+
+def profiling_enabled():
+    return PROFILER is not None
+
+
+def profiling_options():
+    # arguments of start_profiling for the sweep worker processes, None when profiling is off
+    if PROFILER is None:
+        return None
+    return {"memory": PROFILER["memory"]}
+
+
+def finish_profiling():
+    # stops profiling and returns every trace record (the ones from the workers included)
+    global PROFILER
+    if PROFILER is None:
+        return []
+    if PROFILER["stages"]:
+        record_trace({"combination": None, "time": None, "stages": PROFILER["stages"]})
+    if PROFILER["memory"]:
+        tracemalloc.stop()
+    traces = PROFILER["traces"]
+    PROFILER = None
+    return traces
+
+
+def traced_memory():
+    if not PROFILER["memory"]:
+        return 0
+    return tracemalloc.get_traced_memory()[0]
+
+
+@contextmanager
+def stage(name):
+    if PROFILER is None:
+        yield
+        return
+    profiler = PROFILER
+    com_calls = sum(profiler["com_calls"].values())
+    memory = traced_memory()
+    depth = profiler["depth"]
+    profiler["depth"] += 1
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        profiler["depth"] -= 1
+        record = {
+            "stage": name,
+            "depth": depth,
+            "time": elapsed,
+            "com_calls": sum(profiler["com_calls"].values()) - com_calls,
+            "memory": traced_memory() - memory,
+        }
+        if profiler["current"] is not None:
+            profiler["current"]["stages"].append(record)
+        else:
+            profiler["stages"].append(record)
+
+
+def profiled(function):
+    # runs every call of function as a stage named after it
+    @functools.wraps(function)
+    def wrapper(*args, **kwargs):
+        if PROFILER is None:
+            return function(*args, **kwargs)
+        with stage(function.__name__):
+            return function(*args, **kwargs)
+
+    return wrapper
+
+
+@contextmanager
+def profile_combination(combination):
+    # collects the stages run inside into the trace record of combination (None when profiling is off),
+    # pass it to record_trace once the combination is done
+    if PROFILER is None:
+        yield None
+        return
+    trace = {"combination": list(combination), "time": None, "stages": []}
+    PROFILER["current"] = trace
+    start = time.perf_counter()
+    try:
+        yield trace
+    finally:
+        trace["time"] = time.perf_counter() - start
+        PROFILER["current"] = None
+
+
+def record_trace(trace):
+    # keeps a trace record and appends it to the trace file
+    if PROFILER is None or trace is None:
+        return
+    PROFILER["traces"].append(trace)
+    if PROFILER["trace_path"] is not None:
+        with open(PROFILER["trace_path"], "a") as file:
+            file.write(json.dumps(trace) + "\n")
+
+
+def load_trace(trace_path):
+    with open(trace_path) as file:
+        return [json.loads(line) for line in file if line.strip()]
+
+
+class ComCallCounter:
+    # wraps the SAP object and counts the calls of every method reached from it (ex.
+    # "SapModel.FrameObj.AddByCoord") in counter. interfaces are wrapped on access, plain values and the
+    # results of calls are returned as they are
+
+    def __init__(self, target, counter, path=""):
+        self._target = target
+        self._counter = counter
+        self._path = path
+
+    def __getattr__(self, name):
+        attribute = getattr(self._target, name)
+        path = f"{self._path}.{name}" if self._path else name
+        if callable(attribute):
+            counter = self._counter
+
+            def call(*args, **kwargs):
+                counter[path] += 1
+                return attribute(*args, **kwargs)
+
+            return call
+        if isinstance(attribute, (str, bytes, int, float, bool, list, tuple, dict)):
+            return attribute
+        if attribute is None:
+            return attribute
+        return ComCallCounter(attribute, self._counter, path)
+
+
+def profile_com_calls(sap_object):
+    # the SAP object to use for the analyses, counting its COM calls while profiling is on
+    if PROFILER is None:
+        return sap_object
+    return ComCallCounter(sap_object, PROFILER["com_calls"])
+
+
+def com_call_counts():
+    # calls per COM method so far, for the whole run
+    if PROFILER is None:
+        return Counter()
+    return Counter(PROFILER["com_calls"])
+
+
+def profile_summary(traces):
+
+    # per stage statistics over the trace records, the stages taking the most time first. time percentiles
+    # are in ms, share is the stage's total time over the total time of the combinations
+    stages = {}
+    for trace in traces:
+        for record in trace["stages"]:
+            stages.setdefault(record["stage"], []).append(record)
+    combination_time = sum(
+        trace["time"] for trace in traces if trace["combination"] is not None
+    )
+
+    summary = []
+    for name, records in stages.items():
+        times = np.array([record["time"] for record in records]) * 1000.0
+        p50, p90, p99 = np.percentile(times, [50, 90, 99])
+        summary.append(
+            {
+                "stage": name,
+                "depth": min(record["depth"] for record in records),
+                "calls": len(records),
+                "total (s)": times.sum() / 1000.0,
+                "share (%)": (
+                    times.sum() / 1000.0 / combination_time * 100.0
+                    if combination_time > 0
+                    else float("nan")
+                ),
+                "mean (ms)": times.mean(),
+                "p50 (ms)": p50,
+                "p90 (ms)": p90,
+                "p99 (ms)": p99,
+                "max (ms)": times.max(),
+                "COM calls": np.mean([record["com_calls"] for record in records]),
+                "memory (KiB)": np.mean([record["memory"] for record in records])
+                / 1024.0,
+            }
+        )
+    summary.sort(key=lambda row: row["total (s)"], reverse=True)
+    return summary
+
+
+def print_profile_summary(traces):
+    summary = profile_summary(traces)
+    num_combinations = sum(1 for trace in traces if trace["combination"] is not None)
+    print(f"Profile of {num_combinations} combinations, per call of each stage")
+    columns = list(summary[0])[1:] if summary else []
+    print(f"{'stage':<28}" + "".join(f"{column:>14}" for column in columns))
+    for row in summary:
+        values = []
+        for column in columns:
+            if column in ["depth", "calls"]:
+                values.append(f"{row[column]:>14}")
+            else:
+                values.append(f"{row[column]:>14.2f}")
+        print(f"{row['stage']:<28}" + "".join(values))
@@ -0,0 +1,123 @@
+from collections import Counter
+
+import numpy as np
+
+from sweep import is_screened
+
+# monotonic dominance pruning for the SAP sweep. a section that is no larger than another in every one of
+# properties (A and I by default) has no more tension, compression or bending capacity. so when a member
+# group (top chord, bottom chord or web) fails ULS, the same combination with a section in that group that
+# is no larger fails as well, and is skipped instead of being sent to SAP
+#
+# the other two groups have to keep the same sections. the truss is continuous with rigid joints, so the
+# forces in a group depend on the stiffness of the others, both ways: a stiffer web pulls more moment into
+# the bottom chord, stiffer chords take moment off the web. a failure doesn't say anything about
+# combinations where the other groups changed (python benchmark.py dominance_pruning checks this against
+# the native solver)
+#
+# the sections are sorted largest first (create_section_combinations_*), so the sweep runs from the
+# heaviest combinations to the lightest and the smaller sections of a group come after the failure that
+# prunes them. pruned combinations would fail ULS, so the rows that pass, and the optimum picked from them
+# by determine_optimal_section, are the same as without pruning
+#
+# a passing combination isn't used to bound the mass of the rest. determine_optimal_section scores mass
+# against the occupied harmonic and the deflection, normalized over every row that passes ULS, so a heavier
+# passing combination can still be the optimum and leaving any passing row out can change the scores of the
+# others. only failures prune
+#
+# with the surrogate screen (surrogate.py) the pruning goes around it (main.py): it sees the combinations
+# in the sorted order, and the pruned ones never reach the screen. the screened combinations pass through
+# (they have no results, so no failures), and only the analysed ones record failures. python benchmark.py
+# sweep_stack compares the stacks
+
+
+def open_pruning(properties=("A", "I")):
+    return {
+        "properties": list(properties),
+        # (failed group, labels of the other two groups) -> (n, properties) array, the properties of the
+        # failed sections with these other sections. groups are 0 top chord, 1 bottom chord, 2 web. only the
+        # failures not dominated by another one are kept
+        "failed": {},
+        "audit": Counter(),
+    }
+
+
+def failure_key(combination, group):
+    # the failed group and the sections of the other two
+    return (group,) + tuple(
+        label for other, label in enumerate(combination) if other != group
+    )
+
+
+def section_properties_of(pruning, catalog, label):
+    i = catalog["index"][label]
+    return np.array([catalog[name][i] for name in pruning["properties"]])
+
+
+def is_pruned(pruning, catalog, combination):
+    # True when the same combination with a section at least as large in one group failed in that group
+    for group, label in enumerate(combination):
+        failed = pruning["failed"].get(failure_key(combination, group))
+        if failed is not None and np.any(
+            np.all(section_properties_of(pruning, catalog, label) <= failed, axis=1)
+        ):
+            return True
+    return False
+
+
+def record_failure(pruning, catalog, combination, failed_sections):
+    # failed_sections is the "Failed section" column, the failed labels joined with ", " (the barrier
+    # isn't a member group and doesn't prune anything)
+    for group, label in enumerate(combination):
+        if label not in failed_sections.split(", "):
+            continue
+        key = failure_key(combination, group)
+        properties = section_properties_of(pruning, catalog, label)
+        failed = pruning["failed"].get(key, np.zeros((0, len(properties))))
+        if np.any(np.all(properties <= failed, axis=1)):
+            continue
+        # drop the failures the new one dominates
+        dominated = np.all(failed <= properties, axis=1)
+        pruning["failed"][key] = np.vstack([failed[~dominated], properties])
+
+
+def pruned_sweep(combinations, catalog, pruning, run_sweep):
+
+    # wraps a sweep runner (ex. sap_sweep or cached_sweep) with the pruning. run_sweep takes an iterable of
+    # combinations and yields (combination, row) in the same order. combinations dominated by a failure
+    # found so far are not sent to the runner and are not yielded. the runner asks for the combinations one
+    # at a time, so each one is checked against every result returned before it (with num_workers > 1 the
+    # combinations queued for the workers are checked before the results ahead of them come back)
+    def unpruned():
+        for combination in combinations:
+            pruning["audit"]["seen"] += 1
+            if is_pruned(pruning, catalog, combination):
+                pruning["audit"]["pruned"] += 1
+                continue
+            yield combination
+
+    for combination, row in run_sweep(unpruned()):
+        if is_screened(row):
+            pruning["audit"]["screened"] += 1
+        else:
+            pruning["audit"]["analysed"] += 1
+            if row is not None and not row["Passed member design check for ULS"]:
+                record_failure(pruning, catalog, combination, row["Failed section"])
+        yield combination, row
+
+
+def seed_pruning(pruning, catalog, rows):
+    # failures from earlier results (ex. load_results from the results store when resuming)
+    for row in rows:
+        if not is_screened(row) and not row["Passed member design check for ULS"]:
+            combination = [row["Top chord"], row["Bottom chord"], row["Web members"]]
+            record_failure(pruning, catalog, combination, row["Failed section"])
+
+
+def pruning_summary(pruning):
+    audit = pruning["audit"]
+    screened = f", {audit['screened']} screened" if audit["screened"] else ""
+    return (
+        f"Dominance pruning: {audit['seen']} combinations, {audit['analysed']} analysed{screened}, "
+        f"{audit['pruned']} pruned ({sum(len(failed) for failed in pruning['failed'].values())} failures bounding the rest)."
+    )
@@ -0,0 +1,122 @@
+import hashlib
+import json
+import os
+import sqlite3
+
+import numpy as np
+
+from profiling import profiled
+
+# results store for the sweep in main.py. every combination is written to a SQLite file as soon as it
+# finishes, keyed by (top, bottom, web, settings hash), so a sweep that is stopped (SAP crash, reboot) can
+# be continued with python main.py --resume without running the finished combinations again
+#
+# the settings hash covers the model parameters (geometry, loads, factors, backend, contents of BASE.sdb and
+# of the section library), so changing any of them
+# starts a new set of results instead of mixing old and new ones. rows are only ever added, never updated
+
+# settings that don't change the results, left out of the hash: the file locations, the number of
+# combinations solved per batched call and the native solve method (banded and dense give the same rows)
+UNHASHED_SETTINGS = [
+    "base_file_path",
+    "model_dir",
+    "native_chunk_size",
+    "native_solver",
+]
+# settings only the native backend uses, left out of the hash with the SAP backend. they do change the
+# native results: native_num_modes is the number of modes the modal solve extracts, with too few the
+# governing vertical mode (the top of the cluster of num_spans vertical modes) is missed, and
+# barrier_properties are the barrier section (SAP reads it from BASE.sdb)
+NATIVE_SETTINGS = [
+    "native_num_modes",
+    "barrier_properties",
+]
+
+
+def json_default(value):
+    # numpy scalars from the native backend
+    if isinstance(value, np.generic):
+        return value.item()
+    raise TypeError(f"{type(value)} is not JSON serializable")
+
+
+def settings_hash(settings):
+    unhashed = list(UNHASHED_SETTINGS)
+    if settings.get("backend") != "native":
+        unhashed += NATIVE_SETTINGS
+    hashed = {name: value for name, value in settings.items() if name not in unhashed}
+    text = json.dumps(hashed, sort_keys=True, default=json_default)
+    return hashlib.sha1(text.encode()).hexdigest()[:16]
+
+
+def open_results_store(store_path):
+
+    # the WAL journal keeps the finished rows safe if the process dies mid-write
+    os.makedirs(os.path.dirname(os.path.abspath(store_path)), exist_ok=True)
+    store = sqlite3.connect(store_path)
+    store.execute("PRAGMA journal_mode=WAL")
+    store.execute(
+        "CREATE TABLE IF NOT EXISTS results ("
+        "top TEXT, bottom TEXT, web TEXT, settings_hash TEXT, sheet TEXT, row TEXT, "
+        "PRIMARY KEY (top, bottom, web, settings_hash))"
+    )
+    store.commit()
+    return store
+
+
+def clear_results(store, key):
+    # remove the results of a previous sweep with the same settings (run without --resume)
+    store.execute("DELETE FROM results WHERE settings_hash = ?", (key,))
+    store.commit()
+
+
+def resume_results(store, key, resume):
+    # set of (top, bottom, web) already done with --resume, otherwise the previous results with the same
+    # settings are cleared and the sweep starts over
+    if resume:
+        return completed_combinations(store, key)
+    clear_results(store, key)
+    return set()
+
+
+@profiled
+def store_result(store, key, sheet, combination, row):
+    # committed straight away, so at most the combination being analysed is lost on a crash. failed
+    # analyses (row None) aren't stored, so --resume tries them again
+    if row is None:
+        return
+    store.execute(
+        "INSERT OR IGNORE INTO results VALUES (?, ?, ?, ?, ?, ?)",
+        (*combination, key, sheet, json.dumps(row, default=json_default)),
+    )
+    store.commit()
+
+
+def completed_combinations(store, key):
+    # set of (top, bottom, web) already in the store
+    rows = store.execute(
+        "SELECT top, bottom, web FROM results WHERE settings_hash = ?", (key,)
+    )
+    return set(rows)
+
+
+def load_results(store, key, sheet):
+    # rows of one sheet, in the order they were stored
+    rows = store.execute(
+        "SELECT row FROM results WHERE settings_hash = ? AND sheet = ? ORDER BY rowid",
+        (key, sheet),
+    )
+    return [json.loads(row) for (row,) in rows]
+
+
+def skip_completed(chunks, catalog, completed):
+
+    # drops the combinations in completed from combination_chunks, chunks that end up empty are skipped
+    labels = catalog["label"]
+    for chunk in chunks:
+        keep = np.array(
+            [tuple(labels[chunk[i]]) not in completed for i in range(len(chunk))],
+            dtype=bool,
+        )
+        if np.any(keep):
+            yield chunk[keep]
@@ -1,12 +1,27 @@
-import comtypes.client
 import math
 
+import numpy as np
 
-def sap_open():
+from load_combinations import *
+from profiling import profiled
+
+try:
+    import comtypes.client
+except ImportError:
+    # comtypes (and SAP2000) is windows only, the native backend in native_solver.py runs without it
+    comtypes = None
+
+
+@profiled
+def sap_open(attach=True):
     # create API helper object
     helper = comtypes.client.CreateObject("SAP2000v1.Helper")
     helper = helper.QueryInterface(comtypes.gen.SAP2000v1.cHelper)
-    sap_object = helper.GetObject("CSI.SAP2000.API.SapObject")
+    # attach to a running instance if there is one. the parallel sweep workers use attach=False so each
+    # worker starts its own instance
+    sap_object = None
+    if attach:
+        sap_object = helper.GetObject("CSI.SAP2000.API.SapObject")
     if sap_object is None:
         sap_object = helper.CreateObjectProgID("CSI.SAP2000.API.SapObject")
         sap_object.ApplicationStart()
@@ -14,11 +29,13 @@ def sap_open():
     return sap_object
 
 
+@profiled
 def sap_close(sap_object):
     ret = sap_object.ApplicationExit(False)
     sap_object = None
 
 
+@profiled
 def sap_initialize_model(base_file_path, sap_object):
 
     sap_model = sap_object.SapModel
@@ -26,6 +43,7 @@ def sap_initialize_model(base_file_path, sap_object):
     return sap_model
 
 
+@profiled
 def sap_create_frame(
     sap_model,
     bottom_chord_points,
@@ -42,89 +60,181 @@ def sap_create_frame(
     top_chord_frames = []
     diagonal_web_frames = []
     vertical_web_frames = []
+    # end coordinates of every frame, for the model index
+    frame_coordinates = {}
+
+    def add_frame(start, end, section):
+        frame = sap_model.FrameObj.AddByCoord(*start, *end, "foo", section)[0]
+        frame_coordinates[frame] = (start, end)
+        return frame
 
     for i in range(len(bottom_chord_points) - 1):
         bottom_chord_frames.append(
-            sap_model.FrameObj.AddByCoord(
-                *bottom_chord_points[i],
-                *bottom_chord_points[i + 1],
-                "foo",
-                bottom_chord_section
-            )[0]
+            add_frame(
+                bottom_chord_points[i], bottom_chord_points[i + 1], bottom_chord_section
+            )
         )
     # generate top chord
     for i in range(len(top_chord_points) - 1):
         top_chord_frames.append(
-            sap_model.FrameObj.AddByCoord(
-                *top_chord_points[i], *top_chord_points[i + 1], "foo", top_chord_section
-            )[0]
+            add_frame(top_chord_points[i], top_chord_points[i + 1], top_chord_section)
         )
     # generate diagonal webs
     for i in range(len(diagonal_web_points) - 1):
         diagonal_web_frames.append(
-            sap_model.FrameObj.AddByCoord(
-                *diagonal_web_points[i], *diagonal_web_points[i + 1], "foo", web_section
-            )[0]
+            add_frame(diagonal_web_points[i], diagonal_web_points[i + 1], web_section)
         )
     # generate vertical webs
     for i in range(int(len(vertical_web_points) / 2)):
         vertical_web_frames.append(
-            sap_model.FrameObj.AddByCoord(
-                *vertical_web_points[i * 2],
-                *vertical_web_points[i * 2 + 1],
-                "foo",
-                web_section
-            )[0]
+            add_frame(
+                vertical_web_points[i * 2], vertical_web_points[i * 2 + 1], web_section
+            )
         )
 
+    model_index = sap_model_index(sap_model, frame_coordinates)
+
     return (
         bottom_chord_frames,
         top_chord_frames,
         diagonal_web_frames,
         vertical_web_frames,
+        model_index,
     )
 
 
-def sap_set_restraints(sap_model, vertical_web_frames, num_spans):
+@profiled
+def sap_model_index(sap_model, frame_coordinates):
+
+    # local copy of the model topology, so the end points of a frame and the coordinates of a point are
+    # looked up in memory instead of with GetPoints/GetCoordCartesian round trips
+    #   frames        {frame: (point_1, point_2)}
+    #   points        {point: (x, y, z)}
+    #   coordinates   {rounded (x, y, z): point}
+    # the coordinates are already known (generate_warren), only the point names SAP gave the frame ends
+    # are needed. they are read from the frame connectivity table in one call, or one GetPoints per
+    # frame if the table can't be read
+    model_index = {"frames": {}, "points": {}, "coordinates": {}}
+    connectivity = {}
+    *_, fields, num_records, data, ret = (
+        sap_model.DatabaseTables.GetTableForDisplayArray(
+            "Connectivity - Frame", [], "All", 0, [], 0, []
+        )
+    )
+    if ret == 0:
+        fields = list(fields)
+        width = len(fields)
+        frame_field = fields.index("Frame")
+        joint_i_field = fields.index("JointI")
+        joint_j_field = fields.index("JointJ")
+        for i in range(num_records):
+            record = data[i * width : (i + 1) * width]
+            connectivity[record[frame_field]] = (
+                record[joint_i_field],
+                record[joint_j_field],
+            )
+
+    for frame, (start, end) in frame_coordinates.items():
+        if frame in connectivity:
+            point_1, point_2 = connectivity[frame]
+        else:
+            point_1, point_2, ret = sap_model.FrameObj.GetPoints(frame, "", "")
+        model_index["frames"][frame] = (point_1, point_2)
+        index_point(model_index, point_1, start)
+        index_point(model_index, point_2, end)
+
+    return model_index
+
+
+def coordinate_key(coordinates):
+    # coincident points (within SAP's merge tolerance) get the same key
+    return tuple(round(float(value), 6) for value in coordinates)
+
+
+def index_point(model_index, point, coordinates):
+    model_index["points"][point] = tuple(float(value) for value in coordinates)
+    model_index["coordinates"][coordinate_key(coordinates)] = point
+
+
+@profiled
+def sap_create_groups(sap_model, groups):
+
+    # groups is {group name: (object type, names)}, object type is "Frame" or "Joint". the loads, releases,
+    # restraints and sections are assigned to whole groups with ItemType=1, so the number of COM calls
+    # doesn't grow with the number of members
+    # every assignment is sent in one edit of the "Groups 2 - Assignments" table, so call this once with
+    # all the groups. if SAP rejects the table the objects are assigned one at a time
+    data = []
+    for group, (object_type, names) in groups.items():
+        ret = sap_model.GroupDef.SetGroup(group)
+        for name in names:
+            data += [group, object_type, name]
+
+    fields = ["GroupName", "ObjectType", "ObjectLabel"]
+    *_, ret = sap_model.DatabaseTables.SetTableForEditingArray(
+        "Groups 2 - Assignments", 0, fields, len(data) // 3, data
+    )
+    num_fatal, num_errors, _, _, _, ret_apply = (
+        sap_model.DatabaseTables.ApplyEditedTables(False, 0, 0, 0, 0, "")
+    )
+    if ret == 0 and ret_apply == 0 and num_fatal == 0 and num_errors == 0:
+        return
 
-    point_1 = ""
-    point_2 = ""
+    for group, (object_type, names) in groups.items():
+        for name in names:
+            if object_type == "Frame":
+                ret = sap_model.FrameObj.SetGroupAssign(name, group)
+            else:
+                ret = sap_model.PointObj.SetGroupAssign(name, group)
 
-    # for 2D truss, need to restrain the corners of every module in the y (out of plane) direction
-    # this allows the truss to sway in the y direction but not completely shift out of plane
-    y_translation_restraint = [False, True, False, False, False, False]
-    # these points are all points of the vertical members
-    for i in range(len(vertical_web_frames)):
-        point_1, point_2, ret = sap_model.FrameObj.GetPoints(
-            vertical_web_frames[i], point_1, point_2
-        )
-        ret = sap_model.PointObj.SetRestraint(point_1, y_translation_restraint)
-        ret = sap_model.PointObj.SetRestraint(point_2, y_translation_restraint)
 
-    # assign pin to base of every span end (every 2 modules)
-    # left pin corresponds with the first node of the first entry to vertical web list
-    # this overrides the y_translation_restraint
-    pin_restraint = [True, True, True, False, False, False]
+@profiled
+def sap_member_groups(bottom_chord_frames, top_chord_frames, web_frames):
+    # frames of each member type, the loads go on the chords and the sections are set per member type
+    return {
+        "BOTTOM_CHORD": ("Frame", bottom_chord_frames),
+        "TOP_CHORD": ("Frame", top_chord_frames),
+        "WEB": ("Frame", web_frames),
+    }
 
-    for i in range(num_spans + 1):
-        point_1, point_2, ret = sap_model.FrameObj.GetPoints(
-            vertical_web_frames[i * 2], point_1, point_2
-        )
-        ret = sap_model.PointObj.SetRestraint(point_1, pin_restraint)
 
-    # should also pin the corners of the edge modules
-    point_1, point_2, ret = sap_model.FrameObj.GetPoints(
-        vertical_web_frames[0], point_1, point_2
-    )
-    ret = sap_model.PointObj.SetRestraint(point_2, pin_restraint)
-    point_1, point_2, ret = sap_model.FrameObj.GetPoints(
-        vertical_web_frames[-1], point_1, point_2
-    )
-    ret = sap_model.PointObj.SetRestraint(point_2, pin_restraint)
+@profiled
+def sap_restraint_groups(model_index, vertical_web_frames, num_spans):
 
+    # for 2D truss, need to restrain the corners of every module in the y (out of plane) direction
+    # these points are all points of the vertical members (WEB_POINTS)
+    web_points = []
+    for frame in vertical_web_frames:
+        web_points += model_index["frames"][frame]
+
+    # pin the base of every span end (every 2 modules). the left pin corresponds with the first node of the
+    # first entry to vertical web list. should also pin the corners of the edge modules (SUPPORT_POINTS)
+    support_points = [web_points[i * 4] for i in range(num_spans + 1)]
+    support_points += [web_points[1], web_points[-1]]
+
+    return {
+        "WEB_POINTS": ("Joint", web_points),
+        "SUPPORT_POINTS": ("Joint", support_points),
+    }
+
+
+@profiled
+def sap_span_groups(bottom_chord_frames, num_spans, num_divisions):
+    # bottom chord frames of each span (SPAN_1 to SPAN_<num_spans>), for sap_span_live_loads. a span is 2
+    # modules, num_divisions * 2 frames
+    return {
+        f"SPAN_{span + 1}": (
+            "Frame",
+            bottom_chord_frames[
+                span * num_divisions * 2 : (span + 1) * num_divisions * 2
+            ],
+        )
+        for span in range(num_spans)
+    }
 
-def sap_set_releases(
-    sap_model,
+
+@profiled
+def sap_release_groups(
     vertical_web_frames,
     bottom_chord_frames,
     top_chord_frames,
@@ -133,58 +243,76 @@ def sap_set_releases(
     module_divisions,
 ):
 
-    # set the release for the moment splice between modules. Release M3
-    # applies to the vertical, diagonal, and the chord members to the LEFT of the splice
-    # need to not have releases at the chord to the right
-    moment_release = [False, False, False, False, False, True]
-    no_release = [False, False, False, False, False, False]
-    startval = [0, 0, 0, 0, 0, 0]
-    endval = [0, 0, 0, 0, 0, 0]
-    # loop through verticals and release only the interior webs
-    for i in range(len(vertical_web_frames)):
-        if i == 0 or i == len(vertical_web_frames) - 1:
-            continue
-        ret = sap_model.FrameObj.SetReleases(
-            vertical_web_frames[i], moment_release, moment_release, startval, endval
-        )
+    # the moment splice between modules releases M3 of the vertical, diagonal, and the chord members to the
+    # LEFT of the splice. need to not have releases at the chord to the right
+    # only the interior verticals are released, at both ends (SPLICE_VERTICAL)
+    splice_verticals = vertical_web_frames[1:-1]
 
-    # find the chords to the left of the moment splice
+    # find the chords to the left of the moment splice, released at the j end (SPLICE)
     # for the bottom chord there are module_divisions number of segments, so need to get the segment at index module_divisions-1
     # for top chord, there will be module_divisions+1 number of segments, so get the segment at module_division
     # apply only to interior splices
+    splice_frames = []
     for i in range(num_modules - 1):
-        ret = sap_model.FrameObj.SetReleases(
-            bottom_chord_frames[module_divisions - 1 + i * module_divisions],
-            no_release,
-            moment_release,
-            startval,
-            endval,
+        splice_frames.append(
+            bottom_chord_frames[module_divisions - 1 + i * module_divisions]
         )
-        ret = sap_model.FrameObj.SetReleases(
-            top_chord_frames[module_divisions + i * (module_divisions + 1)],
-            no_release,
-            moment_release,
-            startval,
-            endval,
+        splice_frames.append(
+            top_chord_frames[module_divisions + i * (module_divisions + 1)]
         )
 
     # find the diagonals to the left of the moment splice
     # for each module, there are module_divisions*2 diagonals, need to release the last one
     for i in range(num_modules - 1):
-
-        ret = sap_model.FrameObj.SetReleases(
-            diagonal_web_frames[module_divisions * 2 - 1 + i * 2 * module_divisions],
-            no_release,
-            moment_release,
-            startval,
-            endval,
+        splice_frames.append(
+            diagonal_web_frames[module_divisions * 2 - 1 + i * 2 * module_divisions]
         )
 
+    return {
+        "SPLICE_VERTICAL": ("Frame", splice_verticals),
+        "SPLICE": ("Frame", splice_frames),
+    }
+
+
+@profiled
+def sap_set_restraints(sap_model):
+
+    # restraints of the WEB_POINTS and SUPPORT_POINTS groups (sap_restraint_groups)
+    # the y restraint allows the truss to sway in the y direction but not completely shift out of plane
+    y_translation_restraint = [False, True, False, False, False, False]
+    ret = sap_model.PointObj.SetRestraint("WEB_POINTS", y_translation_restraint, 1)
+
+    # the pins override the y_translation_restraint
+    pin_restraint = [True, True, True, False, False, False]
+    ret = sap_model.PointObj.SetRestraint("SUPPORT_POINTS", pin_restraint, 1)
+
 
-def sap_brace_bottom_chord(sap_model, bottom_chord_frames, num_spans, num_divisions):
+@profiled
+def sap_set_releases(sap_model):
+
+    # releases of the SPLICE_VERTICAL and SPLICE groups (sap_release_groups)
+    moment_release = [False, False, False, False, False, True]
+    no_release = [False, False, False, False, False, False]
+    startval = [0, 0, 0, 0, 0, 0]
+    endval = [0, 0, 0, 0, 0, 0]
+    ret = sap_model.FrameObj.SetReleases(
+        "SPLICE_VERTICAL", moment_release, moment_release, startval, endval, 1
+    )
+    ret = sap_model.FrameObj.SetReleases(
+        "SPLICE", no_release, moment_release, startval, endval, 1
+    )
+
+
+@profiled
+def sap_brace_groups(
+    sap_model, model_index, bottom_chord_frames, num_spans, num_divisions
+):
 
     # loop over the bottom chord, and locate the frames to the left and right of the supports
     # get the location of their nodes, get the midpoint and add a point
+    # the points are returned as the BRACE_POINTS group, to go in the one sap_create_groups call with the
+    # other groups (a second call would replace their assignments)
+    brace_points = []
     for i in range(num_spans):
         left_frame = bottom_chord_frames[i * num_divisions * 2]
         right_frame = bottom_chord_frames[
@@ -194,36 +322,43 @@ def sap_brace_bottom_chord(sap_model, bottom_chord_frames, num_spans, num_divisi
         frames = [left_frame, right_frame]
         points = []
         for frame in frames:
-            # brace left at middle of frame by creating special joint
-            point_1 = ""
-            point_2 = ""
-            point_1, point_2, ret = sap_model.FrameObj.GetPoints(frame)
+            # brace left at middle of frame by creating special joint (unless there is a joint there)
+            point_1, point_2 = model_index["frames"][frame]
+            x_1 = model_index["points"][point_1][0]
+            x_2 = model_index["points"][point_2][0]
 
-            x_1, _, _, ret = sap_model.PointObj.GetCoordCartesian(point_1)
-            x_2, _, _, ret = sap_model.PointObj.GetCoordCartesian(point_2)
+            mid = ((x_1 + x_2) / 2.0, 0.0, 0.0)
+            point = model_index["coordinates"].get(coordinate_key(mid))
+            if point is None:
+                point = sap_model.PointObj.AddCartesian(*mid)[0]
+                index_point(model_index, point, mid)
+            points.append(point)
 
-            mid = (x_1 + x_2) / 2.0
+        brace_points.extend(points)
 
-            points.append(sap_model.PointObj.AddCartesian(mid, 0, 0)[0])
+    return {"BRACE_POINTS": ("Joint", brace_points)}
 
-        # set the restraint in the y-direction to the midpoints
-        y_translation_restraint = [False, True, False, False, False, False]
-        for point in points:
-            ret = sap_model.PointObj.SetRestraint(point, y_translation_restraint)
+
+@profiled
+def sap_brace_bottom_chord(sap_model):
+
+    # set the restraint in the y-direction to the midpoints of the BRACE_POINTS group (sap_brace_groups)
+    y_translation_restraint = [False, True, False, False, False, False]
+    ret = sap_model.PointObj.SetRestraint("BRACE_POINTS", y_translation_restraint, 1)
 
 
-def sap_central_node(sap_model, bottom_chord_frames):
+@profiled
+def sap_central_node(model_index, bottom_chord_frames):
     # get the displacement of node in center of of the middlemost span (need num_spans to be odd)
     # bottom_chord_frames has even number of frames. the frame with its right node at the point we want
     # is at the halfway point in the array
     index = int(len(bottom_chord_frames) / 2)
     target = bottom_chord_frames[index]
-    point_1 = ""
-    point_2 = ""
-    point_1, point_2, ret = sap_model.FrameObj.GetPoints(target, point_1, point_2)
+    point_1, point_2 = model_index["frames"][target]
     return point_1
 
 
+@profiled
 def sap_barrier_load(sap_model, length, barrier_height, barrier_section, barrier_UDL):
 
     start = (0, 0, barrier_height)
@@ -259,10 +394,9 @@ def sap_barrier_load(sap_model, length, barrier_height, barrier_section, barrier
     return list(barriers)
 
 
+@profiled
 def sap_set_loads(
     sap_model,
-    bottom_chord_frames,
-    top_chord_frames,
     dead_factor,
     live_factor,
     wearing_surface_factor,
@@ -283,105 +417,85 @@ def sap_set_loads(
     ret = sap_model.LoadPatterns.Add("SNOW", 8, 0, True)
     ret = sap_model.LoadPatterns.Add("ROOF", 8, 0, True)
 
-    for i in range(len(bottom_chord_frames)):
-        # apply live, deck, and asphalt as UDL to bottom chord
-        # (name, load case, type (1 is force per unit length, 2 is moment per unit length),
-        # integer indicating direction (10 is gravity dir), dist1, dist2, val1, val2)
+    # apply live, deck, and asphalt as UDL to the BOTTOM_CHORD group (sap_member_groups)
+    # (name, load case, type (1 is force per unit length, 2 is moment per unit length),
+    # integer indicating direction (10 is gravity dir), dist1, dist2, val1, val2), item type 1 is a group
+    for pattern, UDL in [
+        ("LIVE", live_UDL),
+        ("DECK", concrete_deck_UDL),
+        ("WEARING SURFACE", wearing_surface_UDL),
+    ]:
         ret = sap_model.FrameObj.SetLoadDistributed(
-            bottom_chord_frames[i],
-            "LIVE",
-            1,
-            10,
-            0,
-            1,
-            live_UDL,
-            live_UDL,
-            RelDist=True,
+            "BOTTOM_CHORD", pattern, 1, 10, 0, 1, UDL, UDL, RelDist=True, ItemType=1
         )
+    # snow load applies to top chord
+    # roof load also applies to top
+    for pattern, UDL in [("SNOW", snow_UDL), ("ROOF", roof_UDL)]:
         ret = sap_model.FrameObj.SetLoadDistributed(
-            bottom_chord_frames[i],
-            "DECK",
-            1,
-            10,
-            0,
-            1,
-            concrete_deck_UDL,
-            concrete_deck_UDL,
-            RelDist=True,
+            "TOP_CHORD", pattern, 1, 10, 0, 1, UDL, UDL, RelDist=True, ItemType=1
         )
+
+    # for our governing ULS case, take 1.7 live and 1.5 snow
+    # for SLS its no snow, just 1.0 factors
+    uls_combinations, sls_combinations = design_combinations(
+        dead_factor,
+        live_factor,
+        wearing_surface_factor,
+        concrete_deck_factor,
+        snow_factor,
+    )
+    for case, loads in {**uls_combinations, **sls_combinations}.items():
+        ret = sap_model.LoadCases.StaticLinear.SetCase(case)
+        ret = sap_model.LoadCases.StaticLinear.SetLoads(
+            case, len(loads), ["Load"] * len(loads), list(loads), list(loads.values())
+        )
+
+    # for modal analysis, increase the number of modes (eigen) to 40
+    ret = sap_model.LoadCases.ModalEigen.SetNumberModes("MODAL", 40, 20)
+
+
+@profiled
+def sap_span_live_loads(sap_model, num_spans, live_UDL):
+    # the live load of each span on its own (the SPAN_ groups of sap_span_groups), for pattern live loading
+    # (load_combinations.py). each pattern gets its own linear case
+    for span, pattern in enumerate(span_live_patterns(num_spans)):
+        ret = sap_model.LoadPatterns.Add(pattern, 3, 0, True)
         ret = sap_model.FrameObj.SetLoadDistributed(
-            bottom_chord_frames[i],
-            "WEARING SURFACE",
+            f"SPAN_{span + 1}",
+            pattern,
             1,
             10,
             0,
             1,
-            wearing_surface_UDL,
-            wearing_surface_UDL,
+            live_UDL,
+            live_UDL,
             RelDist=True,
-        )
-    # snow load applies to top chord
-    # roof load also applies to top
-    for i in range(len(top_chord_frames)):
-        ret = sap_model.FrameObj.SetLoadDistributed(
-            top_chord_frames[i], "SNOW", 1, 10, 0, 1, snow_UDL, snow_UDL, RelDist=True
-        )
-        ret = sap_model.FrameObj.SetLoadDistributed(
-            top_chord_frames[i], "ROOF", 1, 10, 0, 1, roof_UDL, roof_UDL, RelDist=True
+            ItemType=1,
         )
 
-    # for our governing ULS case, take 1.7 live and 1.5 snow
-    ret = sap_model.LoadCases.StaticLinear.SetCase("ULS")
-    ret = sap_model.LoadCases.StaticLinear.SetLoads(
-        "ULS",
-        8,
-        ["Load", "Load", "Load", "Load", "Load", "Load", "Load", "Load"],
-        [
-            "DEAD",
-            "LIVE",
-            "BARRIER_VERTICAL",
-            "BARRIER_HORIZONTAL",
-            "DECK",
-            "WEARING SURFACE",
-            "ROOF",
-            "SNOW",
-        ],
-        [
-            dead_factor,
-            live_factor,
-            live_factor,
-            live_factor,
-            concrete_deck_factor,
-            wearing_surface_factor,
-            dead_factor,
-            snow_factor,
-        ],
-    )
 
-    # for SLS its no snow, just 1.0 factors
-    ret = sap_model.LoadCases.StaticLinear.SetCase("SLS")
-    ret = sap_model.LoadCases.StaticLinear.SetLoads(
-        "SLS",
-        7,
-        ["Load", "Load", "Load", "Load", "Load", "Load", "Load"],
-        [
-            "DEAD",
-            "LIVE",
-            "BARRIER_VERTICAL",
-            "BARRIER_HORIZONTAL",
-            "DECK",
-            "WEARING SURFACE",
-            "ROOF",
-        ],
-        [1.0, 1.0, 1.0, 1.0, 1.0, 1.0, 1.0],
-    )
+@profiled
+def sap_set_combinations(sap_model, uls_combinations, is_alu):
 
-    # for modal analysis, increase the number of modes (eigen) to 40
-    ret = sap_model.LoadCases.ModalEigen.SetNumberModes("MODAL", 40, 20)
+    # adds the ULS combinations that aren't linear cases (superposed_combinations) as linear add response
+    # combinations of the pattern cases, and selects them for the strength design check. SAP forms them
+    # from the results of the linear cases, so they don't add an analysis
+    for name, combination in superposed_combinations(uls_combinations).items():
+        # (name, combo type 0 is linear additive)
+        ret = sap_model.RespCombo.Add(name, 0)
+        for pattern, factor in combination.items():
+            # (combo name, case name type 0 is a load case, case name, scale factor)
+            ret = sap_model.RespCombo.SetCaseList(name, 0, pattern, factor)
+        if is_alu:
+            ret = sap_model.DesignAluminum.SetComboStrength(name, True)
+        else:
+            ret = sap_model.DesignSteel.SetComboStrength(name, True)
 
 
+@profiled
 def sap_gerber_modification(
     sap_model,
+    model_index,
     vertical_web_frames,
     top_chord_frames,
     barrier_frames,
@@ -413,17 +527,11 @@ def sap_gerber_modification(
         # deleting the vertical webs at the supports deletes the y-bracing. so need to rebrace at the
         # corners of top chord of each gerber span
         # rebrace before deleting the top chord frames
-        point_1 = ""
-        point_2 = ""
         y_translation_restraint = [False, True, False, False, False, False]
-        point_1, point_2, ret = sap_model.FrameObj.GetPoints(
-            left_frame, point_1, point_2
-        )
+        point_1, point_2 = model_index["frames"][left_frame]
         # for the left frame we are about to delete, we want to brace the point_2 (right node)
         ret = sap_model.PointObj.SetRestraint(point_2, y_translation_restraint)
-        point_1, point_2, ret = sap_model.FrameObj.GetPoints(
-            right_frame, point_1, point_2
-        )
+        point_1, point_2 = model_index["frames"][right_frame]
         # for the right frame brace the point_1 (left node)
         ret = sap_model.PointObj.SetRestraint(point_1, y_translation_restraint)
 
@@ -446,66 +554,234 @@ def sap_gerber_modification(
     return vertical_web_frames, top_chord_frames, barrier_frames
 
 
+@profiled
 def sap_run_analysis(sap_model, file_path):
     ret = sap_model.File.Save(file_path)
     ret = sap_model.Analyze.RunAnalysis()
 
 
-def sap_deflection(sap_model, bottom_chord_frames, span_length):
+@profiled
+def sap_set_sections(sap_model, top_chord_section, bottom_chord_section, web_section):
 
-    deflection_limit = span_length / 360.0
+    # the model is locked after an analysis, unlock it (deletes the results) before changing the sections
+    # item type 1 applies the section to every frame in the group
+    ret = sap_model.SetModelIsLocked(False)
+    ret = sap_model.FrameObj.SetSection("TOP_CHORD", top_chord_section, 1)
+    ret = sap_model.FrameObj.SetSection("BOTTOM_CHORD", bottom_chord_section, 1)
+    ret = sap_model.FrameObj.SetSection("WEB", web_section, 1)
+
+
+@profiled
+def sap_rerun_analysis(sap_model):
+    # the model file was saved by sap_run_analysis, RunAnalysis writes to the same file
+    ret = sap_model.Analyze.RunAnalysis()
 
+
+# static cases read by sap_extract_results, the modal case is only read for its participating mass ratios
+OUTPUT_CASES = ["SLS", "DEAD", "ULS"]
+
+
+def sap_output_cases(sls_combinations=None):
+    # OUTPUT_CASES and the pattern cases the SLS combinations that aren't linear cases are superposed from,
+    # the patterns where they differ from the SLS case (see sap_deflection)
+    if not sls_combinations:
+        return OUTPUT_CASES
+    differences = {
+        name: combination_difference(combination, sls_combinations["SLS"])
+        for name, combination in superposed_combinations(sls_combinations).items()
+    }
+    return OUTPUT_CASES + [
+        pattern
+        for pattern in combination_patterns(differences)
+        if pattern not in OUTPUT_CASES
+    ]
+
+
+@profiled
+def sap_extract_results(sap_model, cases=OUTPUT_CASES):
+
+    # reads every result the sweep needs from an analysed model in one pass: the output cases are selected
+    # once and the joint displacements, base reactions, frame forces and modal participation are pulled
+    # for the whole model (the ALL group, item type 2) in one call each. the metrics (sap_deflection,
+    # sap_module_mass, sap_vibration_analysis) are computed from this snapshot, and the member forces can
+    # be used later without going back to SAP
+    #   joints          joint names, the rows of displacements
+    #   displacements   {case: (num_joints, 6) U1, U2, U3, R1, R2, R3}
+    #   reactions       {case: (6,) FX, FY, FZ, MX, MY, MZ}
+    #   frame_forces    {case: {"frame": (n,), "station": (n,), "forces": (n, 6) P, V2, V3, T, M2, M3}}, a row
+    #                   per output station
+    #   period, Uz      (num_modes,) period and Z participating mass ratio of each mode
     ret = sap_model.Results.Setup.DeselectAllCasesAndCombosForOutput()
-    ret = sap_model.Results.Setup.SetCaseSelectedForOutput("SLS")
+    for case in cases:
+        ret = sap_model.Results.Setup.SetCaseSelectedForOutput(case)
+
+    results = {}
+
+    (
+        _,
+        joints,
+        _,
+        load_cases,
+        _,
+        _,
+        *displacements,
+        ret,
+    ) = sap_model.Results.JointDispl(
+        "ALL", 2, 0, [], [], [], [], [], [], [], [], [], [], []
+    )
+    load_cases = np.asarray(load_cases)
+    results["joints"], rows = np.unique(np.asarray(joints), return_inverse=True)
+    displacements = np.column_stack(displacements)
+    results["displacements"] = {}
+    for case in np.unique(load_cases):
+        values = np.zeros((len(results["joints"]), 6))
+        in_case = load_cases == case
+        values[rows[in_case]] = displacements[in_case]
+        results["displacements"][str(case)] = values
+
+    _, load_cases, _, _, *reactions, _, _, _, ret = sap_model.Results.BaseReact(
+        0, [], [], [], [], [], [], [], [], [], 0, 0, 0
+    )
+    reactions = np.column_stack(reactions)
+    results["reactions"] = {
+        str(case): reactions[i] for i, case in enumerate(load_cases)
+    }
+
+    _, frames, stations, _, _, load_cases, _, _, *forces, ret = (
+        sap_model.Results.FrameForce(
+            "ALL", 2, 0, [], [], [], [], [], [], [], [], [], [], [], [], []
+        )
+    )
+    load_cases = np.asarray(load_cases)
+    frames = np.asarray(frames)
+    stations = np.asarray(stations, dtype=float)
+    forces = np.column_stack(forces)
+    results["frame_forces"] = {}
+    for case in np.unique(load_cases):
+        in_case = load_cases == case
+        results["frame_forces"][str(case)] = {
+            "frame": frames[in_case],
+            "station": stations[in_case],
+            "forces": forces[in_case],
+        }
+
+    # the modal case is selected last, with it selected the calls above would also return every mode shape
+    ret = sap_model.Results.Setup.SetCaseSelectedForOutput("MODAL")
+    _, _, _, _, period, _, _, Uz, _, _, _, _, _, _, _, _, _, ret = (
+        sap_model.Results.ModalParticipatingMassRatios(
+            0, [], [], [], [], [], [], [], [], [], [], [], [], [], [], [], []
+        )
+    )
+    results["period"] = np.asarray(period, dtype=float)
+    results["Uz"] = np.asarray(Uz, dtype=float)
+
+    return results
+
+
+def joint_displacement(results, case, joint):
+    # (6,) displacement of one joint from a sap_extract_results snapshot
+    row = np.searchsorted(results["joints"], joint)
+    if row == len(results["joints"]) or results["joints"][row] != joint:
+        raise KeyError(f"no results for joint {joint}")
+    return results["displacements"][case][row]
+
+
+def member_axial_forces(results, case):
+    # frame names and the axial force of largest magnitude along each frame, from a sap_extract_results
+    # snapshot
+    frame_forces = results["frame_forces"][case]
+    frames, rows = np.unique(frame_forces["frame"], return_inverse=True)
+    axial = frame_forces["forces"][:, 0]
+    # sort the stations by frame, then by decreasing magnitude, and take the first of each frame
+    order = np.lexsort((-np.abs(axial), rows))
+    first = order[np.searchsorted(rows[order], np.arange(len(frames)))]
+    return frames, axial[first]
+
+
+def combination_displacement(results, combination, joint):
+    # (6,) displacement of one joint for a load combination ({pattern: factor}), superposed from the
+    # displacements of the pattern cases in a sap_extract_results snapshot
+    return sum(
+        factor * joint_displacement(results, pattern, joint)
+        for pattern, factor in combination.items()
+    )
+
+
+@profiled
+def sap_deflection(
+    results, model_index, bottom_chord_frames, span_length, sls_combinations=None
+):
+
+    # with sls_combinations, the largest deflection over them. the others than SLS are the SLS case plus
+    # their difference with it, superposed from the pattern cases (only the patterns that differ are read,
+    # see sap_output_cases)
+    deflection_limit = span_length / 360.0
 
     # get the central node vertical displacement
-    center_node = sap_central_node(sap_model, bottom_chord_frames)
-    _, _, _, _, _, _, _, _, temp, _, _, _, ret = sap_model.Results.JointDispl(
-        center_node, 0, 0, [], [], [], [], [], [], [], [], [], [], []
-    )
+    center_node = sap_central_node(model_index, bottom_chord_frames)
     # return absolute value
-    deflection = abs(temp[0])
+    displacement = joint_displacement(results, "SLS", center_node)
+    deflection = abs(float(displacement[2]))
+    for combination in superposed_combinations(sls_combinations or {}).values():
+        difference = combination_difference(combination, sls_combinations["SLS"])
+        combined = displacement + combination_displacement(
+            results, difference, center_node
+        )
+        deflection = max(deflection, abs(float(combined[2])))
     percentage = deflection / deflection_limit * 100
 
     return deflection, percentage
 
 
-def sap_module_mass(sap_model, num_modules):
-
-    # get the results from the 'DEAD' load case
-    ret = sap_model.Results.Setup.DeselectAllCasesAndCombosForOutput()
-    ret = sap_model.Results.Setup.SetCaseSelectedForOutput("DEAD")
+@profiled
+def sap_module_mass(results, num_modules):
 
-    _, _, _, _, _, _, reaction, _, _, _, _, _, _, ret = sap_model.Results.BaseReact(
-        0, [], [], [], [], [], [], [], [], [], 0, 0, 0
-    )
+    # get the reaction from the 'DEAD' load case
+    reaction = float(results["reactions"]["DEAD"][2])
 
     # convert kN to kg
-    total_mass = reaction[0] / 9.81 * 1000
+    total_mass = reaction / 9.81 * 1000
     module_mass = total_mass / num_modules
 
     return module_mass
 
 
-def sap_vibration_analysis(sap_model, pedestrian_density, concrete_deck_UDL, live_UDL):
-    # get results from 'MODAL' load case
-    ret = sap_model.Results.Setup.DeselectAllCasesAndCombosForOutput()
-    ret = sap_model.Results.Setup.SetCaseSelectedForOutput("MODAL")
-    Uz = []
-    period = []
+@profiled
+def sap_vibration_analysis(results, pedestrian_density, concrete_deck_UDL, live_UDL):
+    # results from the 'MODAL' load case
     # get the list of modal participating mass ratios for each mode. we want to find the mode that has highest
     # participating ratio in the Z (vertical) direction
-    _, _, _, _, period, _, _, Uz, _, _, _, _, _, _, _, _, _, ret = (
-        sap_model.Results.ModalParticipatingMassRatios(
-            0, [], [], [], period, [], [], [], [], [], [], [], [], [], [], [], []
-        )
-    )
+    Uz = results["Uz"].tolist()
+    period = results["period"].tolist()
     # get the mode that has the highest Uz
     max_Uz = max(Uz)
     mode_index = Uz.index(max_Uz)
     natural_period = period[mode_index]
     natural_frequency = 1 / natural_period
 
+    (
+        in_crit_range,
+        natural_frequency_occupied,
+        m_empty,
+        m_occupied,
+    ) = vibration_response(
+        natural_frequency, pedestrian_density, concrete_deck_UDL, live_UDL
+    )
+
+    return (
+        natural_frequency,
+        in_crit_range,
+        natural_frequency_occupied,
+        m_empty,
+        m_occupied,
+    )
+
+
+def vibration_response(
+    natural_frequency, pedestrian_density, concrete_deck_UDL, live_UDL
+):
+    # shared by sap_vibration_analysis and the native solver
+
     if natural_frequency < 13.0:
         in_crit_range = True
     else:
@@ -529,7 +805,6 @@ def sap_vibration_analysis(sap_model, pedestrian_density, concrete_deck_UDL, liv
     m_occupied = natural_frequency_occupied / forcing_frequency
 
     return (
-        natural_frequency,
         in_crit_range,
         natural_frequency_occupied,
         m_empty,
@@ -537,10 +812,11 @@ def sap_vibration_analysis(sap_model, pedestrian_density, concrete_deck_UDL, liv
     )
 
 
-def sap_member_design(sap_model, is_alu):
+@profiled
+def sap_member_design(sap_model, is_alu, frame_sections=None):
 
-    ret = sap_model.Results.Setup.DeselectAllCasesAndCombosForOutput()
-    ret = sap_model.Results.Setup.SetCaseSelectedForOutput("ULS")
+    # frame_sections ({frame: section}) is used to name the failed sections when given, frames that aren't
+    # in it are looked up in SAP
 
     num_failed = 0
     names = []
@@ -563,9 +839,12 @@ def sap_member_design(sap_model, is_alu):
 
     failed_sections = []
     for name in names:
+        if frame_sections is not None and name in frame_sections:
+            failed_sections.append(frame_sections[name])
+            continue
         section, _, ret = sap_model.FrameObj.GetSection(name, "", "")
         failed_sections.append(section)
-    unique_sections = list(set(failed_sections))
+    unique_sections = sorted(set(failed_sections))
 
     if len(unique_sections) == 0:
         failed_section_names = "None"
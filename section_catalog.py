@@ -0,0 +1,219 @@
+import hashlib
+import math
+import os
+import xml.etree.ElementTree as ET
+from fractions import Fraction
+
+import numpy as np
+
+# section catalog built from the CSI XML property libraries (CISC10.xml, AA2020.xml)
+# the XML is parsed once into numpy columns and cached as a .npz keyed by the file hash and mtime,
+# so later runs load it in milliseconds
+#
+# columns (one entry per section):
+#   label                       section name as used in SAP
+#   is_round                    True for pipes, False for boxes
+#   depth, width, thickness     nominal dimensions from the label, in library units (mm for steel,
+#                               inches for aluminum) so the filters keep using the same limits
+#   A, I, I22, S, r, r22        section properties in m (I is in plane, I22 out of plane)
+#   mass                        mass per length in kg/m
+#   overridden                  properties whose XML value was replaced by the nominal geometry, space
+#                               separated ("" for none), reported by load_section_catalog
+
+CATALOG_VERSION = 2
+
+NS = {"csi": "http://www.csiberkeley.com"}
+
+# length unit of the XML values, if the file doesn't say
+LENGTH_SCALES = {
+    "mm": 0.001,
+    "cm": 0.01,
+    "m": 1.0,
+    "in": 0.0254,
+    "inch": 0.0254,
+    "ft": 0.3048,
+}
+
+# same densities as MATERIALS in native_solver.py (kg/m3)
+DENSITIES = {"steel": 7849.0, "aluminum": 2712.5}
+
+# XML tags to read each property from, in order of preference
+XML_TAGS = {
+    "A": ["A"],
+    "I": ["I33", "I"],
+    "I22": ["I22", "I"],
+    "S": ["S33POS", "S33", "S"],
+    "r": ["R33", "R"],
+    "r22": ["R22", "R"],
+}
+# power of length of each property, to convert to m
+PROPERTY_POWERS = {"A": 2, "I": 4, "I22": 4, "S": 3, "r": 1, "r22": 1}
+
+
+def parse_fraction(s: str) -> float:
+    s = s.strip()
+    if " " in s:  # mixed number like "1 1/2"
+        whole, frac = s.split()
+        return float(whole) + float(Fraction(frac))
+    return float(Fraction(s))  # simple float or fraction
+
+
+def section_dimensions(section, is_alu):
+
+    # split the label into its dimensions, in library units. steel is in format HS###X## (round) and
+    # HS###X###X## (box) in mm, aluminum is in format PIPE ## X ## (round) and RT ## X ## X ## (box) in inches
+    if is_alu:
+        is_round = section.strip().startswith("PIPE")
+        dims = section.replace("PIPE", "").replace("RT", "").split("X")
+        dims = [parse_fraction(dim) for dim in dims]
+    else:
+        dims = section.split("X")
+        is_round = len(dims) == 2
+        dims = [float(dims[0][2:])] + [float(dim) for dim in dims[1:]]
+
+    # depth is always the first dim and thickness always the last dim
+    depth = dims[0]
+    thick = dims[-1]
+    width = depth
+    if len(dims) == 3:
+        width = dims[1]
+
+    return depth, width, thick, is_round
+
+
+def section_geometry(depth, width, thick, is_round):
+
+    # depth is taken as the in-plane dimension, so I is about the axis bending in the plane of the truss
+    # and I22 is about the out of plane axis. results are in the units of the dimensions
+    if is_round:
+        inner = depth - 2 * thick
+        area = math.pi / 4.0 * (depth**2 - inner**2)
+        inertia = math.pi / 64.0 * (depth**4 - inner**4)
+        inertia_22 = inertia
+    else:
+        inner_depth = depth - 2 * thick
+        inner_width = width - 2 * thick
+        area = depth * width - inner_depth * inner_width
+        inertia = (width * depth**3 - inner_width * inner_depth**3) / 12.0
+        inertia_22 = (depth * width**3 - inner_depth * inner_width**3) / 12.0
+
+    return {
+        "A": area,
+        "I": inertia,
+        "I22": inertia_22,
+        "S": inertia / (depth / 2.0),
+        "r": math.sqrt(inertia / area),
+        "r22": math.sqrt(inertia_22 / area),
+    }
+
+
+def parse_section_xml(xml_path, is_alu, prefixes):
+
+    # prefixes is {"STEEL_PIPE": "HS", "STEEL_BOX": "HS"}, only labels starting with the prefix are kept
+    root = ET.parse(xml_path).getroot()
+
+    units = root.find(".//csi:CONTROL/csi:LENGTH_UNITS", NS)
+    if units is not None and units.text.strip().lower() in LENGTH_SCALES:
+        scale = LENGTH_SCALES[units.text.strip().lower()]
+    else:
+        scale = LENGTH_SCALES["in"] if is_alu else LENGTH_SCALES["mm"]
+    density = DENSITIES["aluminum"] if is_alu else DENSITIES["steel"]
+
+    columns = {
+        name: [] for name in ["label", "is_round", "depth", "width", "thickness"]
+    }
+    columns.update({name: [] for name in XML_TAGS})
+    columns["mass"] = []
+    columns["overridden"] = []
+
+    for tag, prefix in prefixes.items():
+        for element in root.findall(".//csi:" + tag, NS):
+            label = element.find("csi:LABEL", NS)
+            if label is None or not label.text.startswith(prefix):
+                continue
+
+            # every numeric value of the section
+            values = {}
+            for child in element:
+                try:
+                    values[child.tag.split("}")[-1]] = float(child.text)
+                except (TypeError, ValueError):
+                    pass
+
+            depth, width, thick, is_round = section_dimensions(label.text, is_alu)
+            geometry = section_geometry(
+                depth * scale, width * scale, thick * scale, is_round
+            )
+
+            columns["label"].append(label.text)
+            columns["is_round"].append(is_round)
+            columns["depth"].append(depth)
+            columns["width"].append(width)
+            columns["thickness"].append(thick)
+            overridden = []
+            for name, xml_tags in XML_TAGS.items():
+                # sections without the property in the XML use the nominal geometry
+                value = geometry[name]
+                for xml_tag in xml_tags:
+                    if xml_tag in values:
+                        value = values[xml_tag] * scale ** PROPERTY_POWERS[name]
+                        break
+                # same if the XML value doesn't make sense (ex. in unexpected units). design thicknesses
+                # only differ by a few percent, so these are recorded as bad catalog data
+                if not 0.5 < value / geometry[name] < 2.0:
+                    value = geometry[name]
+                    overridden.append(name)
+                columns[name].append(value)
+            columns["mass"].append(columns["A"][-1] * density)
+            columns["overridden"].append(" ".join(overridden))
+
+    catalog = {name: np.array(values) for name, values in columns.items()}
+    catalog["label"] = catalog["label"].astype(str)
+    catalog["is_round"] = catalog["is_round"].astype(bool)
+    catalog["overridden"] = catalog["overridden"].astype(str)
+    return catalog
+
+
+def load_section_catalog(xml_path, is_alu, prefixes, cache_dir="./section_cache"):
+
+    # the cache name is a hash of the XML contents, its mtime and the parse options
+    stat = os.stat(xml_path)
+    digest = hashlib.sha1()
+    with open(xml_path, "rb") as file:
+        digest.update(file.read())
+    digest.update(
+        repr(
+            (stat.st_mtime_ns, is_alu, sorted(prefixes.items()), CATALOG_VERSION)
+        ).encode()
+    )
+    stem = os.path.splitext(os.path.basename(xml_path))[0]
+    cache_path = os.path.join(cache_dir, f"{stem}_{digest.hexdigest()[:16]}.npz")
+
+    if os.path.exists(cache_path):
+        with np.load(cache_path) as data:
+            catalog = {name: data[name] for name in data.files}
+    else:
+        catalog = parse_section_xml(xml_path, is_alu, prefixes)
+        os.makedirs(cache_dir, exist_ok=True)
+        np.savez(cache_path, **catalog)
+
+    catalog["index"] = {label: i for i, label in enumerate(catalog["label"])}
+
+    # report the XML values replaced by the nominal geometry on every run, not just when parsing
+    overridden = np.flatnonzero(catalog["overridden"] != "")
+    if len(overridden) > 0:
+        print(
+            f"{os.path.basename(xml_path)}: nominal geometry used instead of the XML value for "
+            f"{len(overridden)} sections: "
+            + ", ".join(
+                f"{catalog['label'][i]} ({catalog['overridden'][i]})"
+                for i in overridden
+            )
+        )
+    return catalog
+
+
+def catalog_properties(catalog, section):
+    # section properties of one label, as used by the native solver
+    i = catalog["index"][section]
+    return {name: float(catalog[name][i]) for name in XML_TAGS}
@@ -0,0 +1,339 @@
+import itertools
+import random
+from collections import Counter
+
+import numpy as np
+
+from define_sections import append_to_csv
+from pareto import nondominated
+from sweep import is_screened, merged_sweep, screened_row
+
+# surrogate pre-screening for the SAP sweep. the rows already analysed (this run, or the results store when
+# resuming) are used to fit cheap regressions of the results on the section A and I of the top chord,
+# bottom chord and web. combinations that the surrogate says have no plausible chance of being on the
+# Pareto front of interpret_results (passing ULS, low module mass, low deflection, high resonating
+# harmonic) are skipped instead of being sent to SAP. a skipped combination still gets a row, with the
+# "screened" Status and no results (screened_row in sweep.py), in its place in the sweep, so the output
+# shows which combinations were never analysed. the rows that were analysed are the same as without the
+# screen
+#
+# the combinations are screened in the order of the sweep (sorted by top chord, then bottom chord), so the
+# first samples share a few sections and the first fits only cover part of the catalog. nothing is skipped
+# until the training data has min_distinct values of every feature (a quadratic in a feature needs three,
+# with two top chords the fit extrapolates along the top chord and skips combinations on the front), and
+# combinations outside the sections analysed so far are never skipped
+#
+# the fits are ridge regressions on the quadratic terms of log A and log I, of the log of each result,
+# and a logistic regression for passing ULS. a combination is skipped when
+#   ULS         its predicted probability of passing ULS is below min_pass_probability
+#   deflection  even its optimistic deflection (z leave-one-out errors better than predicted) is over the limit
+#   dominated   even its optimistic mass, deflection and harmonic are dominated by a combination analysed so far
+# combinations with sections outside the range of the analysed ones are never skipped (no extrapolation),
+# and explore_rate of the skipped ones are analysed anyway, to check the screen (audit["explored"] and
+# audit["explored_relevant"]). every skipped combination is written to audit_path with its predictions
+
+# result columns fitted by the surrogate (all positive, fitted in log)
+SURROGATE_TARGETS = {
+    "mass": "Module mass (kg)",
+    "deflection": "Max vertical deflection for SLS (m)",
+    "percentage": "Percentage of deflection limit for SLS (%)",
+    "harmonic": "Resonating harmonic occupied",
+}
+PASSED_COLUMN = "Passed member design check for ULS"
+
+
+def open_screen(
+    min_samples=40,
+    min_distinct=3,
+    refit_interval=20,
+    z=2.0,
+    min_pass_probability=0.05,
+    explore_rate=0.02,
+    ridge=1.0,
+    audit_path=None,
+    seed=0,
+):
+    return {
+        "min_samples": min_samples,
+        "min_distinct": min_distinct,
+        "refit_interval": refit_interval,
+        "z": z,
+        "min_pass_probability": min_pass_probability,
+        "explore_rate": explore_rate,
+        "ridge": ridge,
+        "audit_path": audit_path,
+        "random": random.Random(seed),
+        # training data, one entry per analysed combination
+        "features": [],
+        "targets": {name: [] for name in SURROGATE_TARGETS},
+        "passed": [],
+        "since_fit": 0,
+        "model": None,
+        "explored": set(),  # combinations that the screen would have skipped
+        "audit": Counter(),
+    }
+
+
+def section_features(catalog, combinations):
+    # (n, 6) log A and log I of the [top, bottom, web] labels
+    index = np.array(
+        [
+            [catalog["index"][label] for label in combination]
+            for combination in combinations
+        ]
+    ).reshape(-1, 3)
+    return np.concatenate(
+        [np.log(catalog["A"][index]), np.log(catalog["I"][index])], axis=1
+    )
+
+
+def quadratic_terms(features):
+    # constant, linear and every product of two features
+    i, j = np.triu_indices(features.shape[1])
+    return np.hstack(
+        [np.ones((len(features), 1)), features, features[:, i] * features[:, j]]
+    )
+
+
+def ridge_fit(X, y, ridge):
+
+    # returns the coefficients and the root mean square leave-one-out error (from the hat matrix, no refits)
+    # the constant isn't penalised
+    penalty = ridge * np.eye(X.shape[1])
+    penalty[0, 0] = 0.0
+    inverse = np.linalg.pinv(X.T @ X + penalty)
+    coefficients = inverse @ X.T @ y
+    leverage = np.einsum("ij,jk,ik->i", X, inverse, X)
+    loo = (y - X @ coefficients) / np.maximum(1.0 - leverage, 1e-6)
+    return coefficients, np.sqrt(np.mean(loo**2))
+
+
+def logistic_fit(X, y, ridge, iterations=25):
+    # ridge penalised logistic regression, newton iterations
+    weights = np.zeros(X.shape[1])
+    penalty = ridge * np.eye(X.shape[1])
+    penalty[0, 0] = 0.0
+    for _ in range(iterations):
+        p = 1.0 / (1.0 + np.exp(-(X @ weights)))
+        hessian = (X * (p * (1.0 - p))[:, None]).T @ X + penalty
+        gradient = X.T @ (p - y) + penalty @ weights
+        weights -= np.linalg.solve(hessian, gradient)
+    return weights
+
+
+def fit_screen(screen):
+
+    # fits the surrogate to the training data, and the Pareto front of the analysed combinations that pass
+    features = np.array(screen["features"])
+    mean = features.mean(axis=0)
+    scale = features.std(axis=0)
+    scale[scale == 0] = 1.0
+    X = quadratic_terms((features - mean) / scale)
+
+    model = {
+        "mean": mean,
+        "scale": scale,
+        "low": features.min(axis=0),
+        "high": features.max(axis=0),
+        "distinct": min(len(np.unique(column)) for column in features.T),
+        "coefficients": {},
+        "error": {},
+    }
+    for name in SURROGATE_TARGETS:
+        y = np.log(np.array(screen["targets"][name]))
+        model["coefficients"][name], model["error"][name] = ridge_fit(
+            X, y, screen["ridge"]
+        )
+    passed = np.array(screen["passed"], dtype=float)
+    model["pass_weights"] = logistic_fit(X, passed, screen["ridge"])
+
+    # objectives of the passing combinations, [mass, deflection, -harmonic] (all minimised)
+    feasible = (passed == 1.0) & (np.array(screen["targets"]["percentage"]) <= 100.0)
+    objectives = np.column_stack(
+        [
+            np.array(screen["targets"]["mass"]),
+            np.array(screen["targets"]["deflection"]),
+            -np.array(screen["targets"]["harmonic"]),
+        ]
+    )[feasible]
+    model["front"] = objectives[nondominated(objectives)]
+
+    screen["model"] = model
+    screen["since_fit"] = 0
+
+
+def predict_screen(model, features):
+    # predicted results of the combinations with these section_features
+    # (log results, clipped so far outside the training data they don't overflow)
+    X = quadratic_terms((features - model["mean"]) / model["scale"])
+    predictions = {
+        name: np.clip(X @ coefficients, -50.0, 50.0)
+        for name, coefficients in model["coefficients"].items()
+    }
+    predictions["pass_probability"] = 1.0 / (
+        1.0 + np.exp(-np.clip(X @ model["pass_weights"], -50.0, 50.0))
+    )
+    return predictions
+
+
+def screen_batch(screen, catalog, combinations):
+
+    # returns the reason each combination is skipped ("ULS", "deflection" or "dominated"), None for the
+    # combinations worth analysing. the skipped ones are recorded in the audit
+    screen["audit"]["seen"] += len(combinations)
+    model = screen["model"]
+    if model is None or model["distinct"] < screen["min_distinct"]:
+        return [None] * len(combinations)
+
+    features = section_features(catalog, combinations)
+    predictions = predict_screen(model, features)
+    z = screen["z"]
+    error = model["error"]
+    # optimistic (z errors better than predicted) mass, deflection and harmonic
+    optimistic = np.column_stack(
+        [
+            np.exp(predictions["mass"] - z * error["mass"]),
+            np.exp(predictions["deflection"] - z * error["deflection"]),
+            -np.exp(predictions["harmonic"] + z * error["harmonic"]),
+        ]
+    )
+    front = model["front"]
+    dominated = np.any(
+        np.all(front[None, :, :] <= optimistic[:, None, :], axis=2), axis=1
+    )
+    percentage = np.exp(predictions["percentage"] - z * error["percentage"])
+    inside = np.all((features >= model["low"]) & (features <= model["high"]), axis=1)
+
+    reasons = []
+    skipped = []
+    for i, combination in enumerate(combinations):
+        reason = None
+        if not inside[i]:
+            pass
+        elif predictions["pass_probability"][i] < screen["min_pass_probability"]:
+            reason = "ULS"
+        elif percentage[i] > 100.0:
+            reason = "deflection"
+        elif dominated[i]:
+            reason = "dominated"
+
+        if reason is not None and screen["random"].random() < screen["explore_rate"]:
+            screen["audit"]["explored"] += 1
+            screen["explored"].add(tuple(combination))
+            reason = None
+        reasons.append(reason)
+        if reason is not None:
+            screen["audit"]["skipped " + reason] += 1
+            skipped.append(
+                {
+                    "Top chord": combination[0],
+                    "Bottom chord": combination[1],
+                    "Web members": combination[2],
+                    "Reason": reason,
+                    "Pass probability": predictions["pass_probability"][i],
+                    "Predicted module mass (kg)": np.exp(predictions["mass"][i]),
+                    "Predicted deflection (m)": np.exp(predictions["deflection"][i]),
+                    "Predicted resonating harmonic occupied": np.exp(
+                        predictions["harmonic"][i]
+                    ),
+                }
+            )
+    if skipped and screen["audit_path"] is not None:
+        append_to_csv(skipped, screen["audit_path"])
+    return reasons
+
+
+def train_screen(screen, catalog, combination, row):
+
+    # adds an analysed combination to the training data, and refits every refit_interval combinations once
+    # there are min_samples
+    if row is None:
+        return
+    add_sample(screen, catalog, combination, row)
+    if len(screen["passed"]) >= screen["min_samples"] and (
+        screen["model"] is None or screen["since_fit"] >= screen["refit_interval"]
+    ):
+        fit_screen(screen)
+
+
+def add_sample(screen, catalog, combination, row):
+    # training data of one analysed combination, without refitting
+    screen["features"].append(section_features(catalog, [combination])[0])
+    for name, column in SURROGATE_TARGETS.items():
+        screen["targets"][name].append(max(float(row[column]), 1e-12))
+    screen["passed"].append(bool(row[PASSED_COLUMN]))
+    screen["since_fit"] += 1
+
+    if tuple(combination) in screen["explored"]:
+        # an explored combination that would have been worth analysing is a miss of the screen
+        model = screen["model"]
+        objectives = np.array(
+            [
+                float(row[SURROGATE_TARGETS["mass"]]),
+                float(row[SURROGATE_TARGETS["deflection"]]),
+                -float(row[SURROGATE_TARGETS["harmonic"]]),
+            ]
+        )
+        feasible = (
+            bool(row[PASSED_COLUMN])
+            and float(row[SURROGATE_TARGETS["percentage"]]) <= 100.0
+        )
+        if feasible and not np.any(np.all(model["front"] <= objectives, axis=1)):
+            screen["audit"]["explored_relevant"] += 1
+
+
+def screened_sweep(combinations, catalog, screen, run_sweep, batch_size=1):
+
+    # wraps a sweep runner (ex. sap_sweep or cached_sweep) with the screen. run_sweep takes an iterable of
+    # combinations and yields (combination, row) in the same order. combinations are screened batch_size
+    # at a time with the surrogate fitted so far, skipped combinations are not sent to the runner and are
+    # yielded with a screened_row, everything in the order of combinations. a batch is read before the rows
+    # ahead of it come back, so with a wrapper around the screen (pruned_sweep in main.py) larger batches
+    # check the combinations against older results. the predictions cost little next to an analysis
+    def screened():
+        iterator = iter(combinations)
+        while True:
+            batch = list(itertools.islice(iterator, batch_size))
+            if not batch:
+                return
+            for combination, reason in zip(batch, screen_batch(screen, catalog, batch)):
+                yield combination, None if reason is None else screened_row(combination)
+
+    for combination, row, analysed in merged_sweep(screened(), run_sweep):
+        if analysed:
+            screen["audit"]["analysed"] += 1
+            train_screen(screen, catalog, combination, row)
+        yield combination, row
+
+
+def seed_screen(screen, catalog, rows):
+    # training data from earlier results (ex. load_results from the results store when resuming)
+    for row in rows:
+        if is_screened(row):
+            continue
+        combination = [row["Top chord"], row["Bottom chord"], row["Web members"]]
+        add_sample(screen, catalog, combination, row)
+    if len(screen["passed"]) >= screen["min_samples"]:
+        fit_screen(screen)
+
+
+def screen_summary(screen):
+    audit = screen["audit"]
+    skipped = sum(count for key, count in audit.items() if key.startswith("skipped"))
+    reasons = ", ".join(
+        f"{key.split(' ', 1)[1]} {count}"
+        for key, count in sorted(audit.items())
+        if key.startswith("skipped")
+    )
+    text = (
+        f"Surrogate screen: {audit['seen']} combinations, {audit['analysed']} analysed, "
+        f"{skipped} skipped"
+    )
+    if reasons:
+        text += f" ({reasons})"
+    if audit["explored"]:
+        text += (
+            f", {audit['explored']} explored of which {audit['explored_relevant']} "
+            "were on the front"
+        )
+    return text + "."
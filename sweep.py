@@ -0,0 +1,703 @@
+import multiprocessing
+import os
+import queue
+from collections import deque
+
+from sap_interface import *
+from native_solver import *
+from native_design import *
+from profiling import *
+
+# runners for the section combination sweep in main.py. each runner takes the combinations to analyse
+# and yields (combination, result row) in the same order, so main.py doesn't care which backend is used
+#   native_sweep        batched numpy solve, see native_solver.py
+#   sap_sweep           SAP2000, in this process or sharded over worker processes (one SAP instance each)
+# wrappers around a runner (cached_sweep, screened_sweep, pruned_sweep) take the same iterable and yield in
+# the same order, merged_sweep puts the rows they don't send to the runner back in order
+#
+# settings is a dict of the model parameters from main.py (geometry points, loads, factors, ...). it is
+# sent to the worker processes, so it should only hold plain python data
+
+# seconds the parallel sweep waits for a result before checking for dead workers
+POLL_INTERVAL = 0.5
+# "Status" of a row: analysed, or skipped by the surrogate screen (surrogate.py) without results
+ANALYSED_STATUS = "analysed"
+SCREENED_STATUS = "screened"
+
+
+def result_row(
+    combination,
+    deflection,
+    deflection_percentage,
+    module_mass,
+    vibration,
+    passed,
+    failed_section_names,
+    status=ANALYSED_STATUS,
+):
+    # one row of the output file. vibration is the tuple returned by sap_vibration_analysis
+    (
+        natural_frequency,
+        in_crit_range,
+        natural_frequency_occupied,
+        resonating_harmonic,
+        resonating_harmonic_occupied,
+    ) = vibration
+    return {
+        "Top chord": combination[0],
+        "Bottom chord": combination[1],
+        "Web members": combination[2],
+        "Max vertical deflection for SLS (m)": deflection,
+        "Percentage of deflection limit for SLS (%)": deflection_percentage,
+        "Module mass (kg)": module_mass,
+        "Natural frequency (Hz)": natural_frequency,
+        "Natural frequency in critical range": in_crit_range,
+        "Natural frequency occupied (Hz)": natural_frequency_occupied,
+        "Resonating harmonic": resonating_harmonic,
+        "Resonating harmonic occupied": resonating_harmonic_occupied,
+        "Passed member design check for ULS": passed,
+        "Failed section": failed_section_names,
+        "Status": status,
+    }
+
+
+def screened_row(combination):
+    # row of a combination skipped by the surrogate screen, the same columns with no results
+    return result_row(
+        combination, None, None, None, (None,) * 5, None, None, SCREENED_STATUS
+    )
+
+
+def is_screened(row):
+    # rows from before the Status column are analysed
+    return row is not None and row.get("Status") == SCREENED_STATUS
+
+
+def native_sweep(prepared_model, bottom_chord_frames, chunks, catalog, settings):
+
+    # chunks are (chunk size, 3) arrays of catalog indices from combination_chunks. each chunk is solved in
+    # one batched call, only the section properties change between combinations so the prepared model
+    # is reused
+    for chunk in chunks:
+        chunk_labels = catalog["label"][chunk].tolist()
+        section_tables = [
+            native_combination_table(
+                *combination,
+                settings["is_alu"],
+                {settings["barrier_section"]: settings["barrier_properties"]},
+                catalog,
+            )
+            for combination in chunk_labels
+        ]
+        batch = native_run_batch(
+            prepared_model,
+            section_tables,
+            settings["native_chunk_size"],
+            settings["native_solver"],
+        )
+        deflection, percentage = native_batch_deflection(
+            prepared_model,
+            batch,
+            bottom_chord_frames,
+            settings["span_length"],
+            settings["sls_combinations"],
+        )
+        module_mass = native_batch_module_mass(
+            prepared_model, batch, settings["num_modules"]
+        )
+        periods, Uz = native_run_modal(
+            prepared_model, section_tables, settings["native_num_modes"]
+        )
+        passed, failed_section_names = native_member_design(
+            prepared_model,
+            batch,
+            section_tables,
+            combinations=settings["uls_combinations"],
+        )
+
+        for i, combination in enumerate(chunk_labels):
+            vibration = native_vibration_analysis(
+                periods[i],
+                Uz[i],
+                settings["pedestrian_density"],
+                settings["concrete_deck_UDL"],
+                settings["live_UDL"],
+            )
+            yield combination, result_row(
+                combination,
+                deflection[i],
+                percentage[i],
+                module_mass[i],
+                vibration,
+                passed[i],
+                failed_section_names[i],
+            )
+
+
+@profiled
+def sap_build_model(sap_object, settings, combination):
+
+    # builds the whole model from BASE.sdb with the sections of one combination, returns the model and the
+    # frame lists and the model index (sap_model_index)
+    top_chord_section, bottom_chord_section, web_section = combination
+
+    # initialize fresh model from BASE in root folder
+    sap_model = sap_initialize_model(settings["base_file_path"], sap_object)
+
+    """ ------------------------ CREATE SAP MODEL ------------------------ """
+
+    # generate frames
+    (
+        bottom_chord_frames,
+        top_chord_frames,
+        diagonal_web_frames,
+        vertical_web_frames,
+        model_index,
+    ) = sap_create_frame(
+        sap_model,
+        settings["bottom_chord_points"],
+        settings["top_chord_points"],
+        settings["diagonal_web_points"],
+        settings["vertical_web_points"],
+        bottom_chord_section,
+        top_chord_section,
+        web_section,
+    )
+
+    # put the members and restrained points in groups, so the restraints, releases, loads (and sections in
+    # the template model mode) are assigned with one call per group
+    groups = sap_member_groups(
+        bottom_chord_frames,
+        top_chord_frames,
+        diagonal_web_frames + vertical_web_frames,
+    )
+    groups.update(
+        sap_restraint_groups(model_index, vertical_web_frames, settings["num_spans"])
+    )
+    groups.update(
+        sap_release_groups(
+            vertical_web_frames,
+            bottom_chord_frames,
+            top_chord_frames,
+            diagonal_web_frames,
+            settings["num_modules"],
+            settings["module_divisions"],
+        )
+    )
+    if settings["pattern_live_load"] is not None:
+        groups.update(
+            sap_span_groups(
+                bottom_chord_frames,
+                settings["num_spans"],
+                settings["module_divisions"],
+            )
+        )
+    # brace points at the midpoint of each bottom chord frame to the left and right of the supports
+    groups.update(
+        sap_brace_groups(
+            sap_model,
+            model_index,
+            bottom_chord_frames,
+            settings["num_spans"],
+            settings["module_divisions"],
+        )
+    )
+    sap_create_groups(sap_model, groups)
+
+    # set the restraints
+    sap_set_restraints(sap_model)
+
+    # set the releases for moment splice between modules
+    sap_set_releases(sap_model)
+
+    # brace bottom chord at the brace points
+    # this is to prevent those members from failing the kl/r_y check
+    sap_brace_bottom_chord(sap_model)
+
+    # create barrier and apply vertical and horizontal barrier load patterns (cases created in sap_set_loads)
+    barrier_frames = sap_barrier_load(
+        sap_model,
+        settings["total_length"],
+        settings["barrier_height"],
+        settings["barrier_section"],
+        settings["barrier_UDL"],
+    )
+
+    # set the load case, apply deck load to bottom chord
+    sap_set_loads(
+        sap_model,
+        settings["dead_factor"],
+        settings["live_factor"],
+        settings["wearing_surface_factor"],
+        settings["concrete_deck_factor"],
+        settings["snow_factor"],
+        settings["live_UDL"],
+        settings["wearing_surface_UDL"],
+        settings["concrete_deck_UDL"],
+        settings["snow_UDL"],
+        settings["roof_UDL"],
+    )
+    # the live load of each span, for the pattern live load combinations
+    if settings["pattern_live_load"] is not None:
+        sap_span_live_loads(sap_model, settings["num_spans"], settings["live_UDL"])
+    # the other ULS combinations, for the design check (load_combinations.py)
+    sap_set_combinations(sap_model, settings["uls_combinations"], settings["is_alu"])
+
+    if settings["is_gerber"]:
+        vertical_web_frames, top_chord_frames, barrier_frames = sap_gerber_modification(
+            sap_model,
+            model_index,
+            vertical_web_frames,
+            top_chord_frames,
+            barrier_frames,
+            settings["num_spans"],
+            settings["module_divisions"],
+        )
+
+    return (
+        sap_model,
+        bottom_chord_frames,
+        top_chord_frames,
+        diagonal_web_frames,
+        vertical_web_frames,
+        barrier_frames,
+        model_index,
+    )
+
+
+@profiled
+def sap_collect_results(
+    sap_model,
+    settings,
+    combination,
+    model_index,
+    bottom_chord_frames,
+    frame_sections=None,
+):
+
+    # results of an analysed model, as a result row. frame_sections ({frame: section}) saves looking up
+    # the sections of the failed frames in SAP
+    # every result is read from SAP in one pass, the metrics are computed from the snapshot
+    results = sap_extract_results(
+        sap_model, sap_output_cases(settings["sls_combinations"])
+    )
+    deflection, deflection_percentage = sap_deflection(
+        results,
+        model_index,
+        bottom_chord_frames,
+        settings["span_length"],
+        settings["sls_combinations"],
+    )
+    # get the reaction output from dead case and divide by num_modules
+    module_mass = sap_module_mass(results, settings["num_modules"])
+
+    vibration = sap_vibration_analysis(
+        results,
+        settings["pedestrian_density"],
+        settings["concrete_deck_UDL"],
+        settings["live_UDL"],
+    )
+    # verify frames pass steel design check, and get list of sections that fail if ULS does not pass
+    passed, failed_section_names = sap_member_design(
+        sap_model, settings["is_alu"], frame_sections
+    )
+
+    return result_row(
+        combination,
+        deflection,
+        deflection_percentage,
+        module_mass,
+        vibration,
+        passed,
+        failed_section_names,
+    )
+
+
+@profiled
+def sap_analyse_combination(sap_object, settings, combination, model_path):
+
+    sap_model, bottom_chord_frames, _, _, _, _, model_index = sap_build_model(
+        sap_object, settings, combination
+    )
+
+    """ ------------------------ RUN MODEL AND COLLECT RESULTS ------------------------ """
+
+    # save the file to a new file in the models folder (so don't override the BASE file)
+    sap_run_analysis(sap_model, model_path)
+
+    return sap_collect_results(
+        sap_model, settings, combination, model_index, bottom_chord_frames
+    )
+
+
+@profiled
+def sap_analyse_template(sap_object, settings, combination, model_path, template):
+
+    # template model mode. the model is built once (template is None) with the sections of the first
+    # combination, with its frames in the TOP_CHORD, BOTTOM_CHORD and WEB groups. the next combinations
+    # only unlock the model, reassign the sections of the three groups and rerun the analysis
+    # returns the row and the template to pass in with the next combination on the same sap_object
+    if template is None:
+        (
+            sap_model,
+            bottom_chord_frames,
+            top_chord_frames,
+            diagonal_web_frames,
+            vertical_web_frames,
+            barrier_frames,
+            model_index,
+        ) = sap_build_model(sap_object, settings, combination)
+        web_frames = diagonal_web_frames + vertical_web_frames
+        sap_run_analysis(sap_model, model_path)
+        # frames of [top, bottom, web] and the barrier, to know the section of every frame
+        frames = [top_chord_frames, bottom_chord_frames, web_frames, barrier_frames]
+        template = (sap_model, model_index, bottom_chord_frames, frames)
+    else:
+        sap_model, model_index, bottom_chord_frames, frames = template
+        sap_set_sections(sap_model, *combination)
+        sap_rerun_analysis(sap_model)
+
+    frame_sections = {}
+    for group_frames, section in zip(
+        frames, [*combination, settings["barrier_section"]]
+    ):
+        frame_sections.update({frame: section for frame in group_frames})
+
+    row = sap_collect_results(
+        sap_model,
+        settings,
+        combination,
+        model_index,
+        bottom_chord_frames,
+        frame_sections,
+    )
+    return row, template
+
+
+def sap_analyse(
+    sap_object, settings, combination, model_path, template, template_model
+):
+    # sap_analyse_combination or sap_analyse_template, returns the row and the template
+    if template_model:
+        return sap_analyse_template(
+            sap_object, settings, combination, model_path, template
+        )
+    return sap_analyse_combination(sap_object, settings, combination, model_path), None
+
+
+def sap_sweep(
+    combinations,
+    settings,
+    num_workers=1,
+    open_function=sap_open,
+    open_kwargs=None,
+    max_attempts=3,
+    template_model=False,
+):
+
+    # combinations is an iterable of [top, bottom, web] labels. with num_workers > 1 the combinations are
+    # sharded over worker processes, see parallel_sweep. a combination that fails max_attempts times gets a
+    # None row. template_model reuses one model per SAP instance, see sap_analyse_template
+    if num_workers > 1:
+        yield from parallel_sweep(
+            combinations,
+            settings,
+            num_workers,
+            open_function,
+            open_kwargs,
+            max_attempts,
+            template_model,
+        )
+        return
+
+    open_kwargs = open_kwargs or {}
+    model_path = os.path.join(settings["model_dir"], "MODEL.sdb")
+    # SAP is only started once there is something to analyse
+    sap_object = None
+    template = None
+    # SAP is also closed when the caller stops early (ex. stop_early in pareto.py closes the generator)
+    try:
+        for combination in combinations:
+            if sap_object is None:
+                sap_object = profile_com_calls(open_function(**open_kwargs))
+            row = None
+            # the stages of every attempt go in the trace of the combination (profiling.py)
+            with profile_combination(combination) as trace:
+                for attempt in range(max_attempts):
+                    try:
+                        row, template = sap_analyse(
+                            sap_object,
+                            settings,
+                            combination,
+                            model_path,
+                            template,
+                            template_model,
+                        )
+                        break
+                    except Exception as error:
+                        print(
+                            f"Analysis of {combination} failed ({error!r}), restarting SAP"
+                        )
+                        sap_object = restart_sap(sap_object, open_function, open_kwargs)
+                        template = None
+            record_trace(trace)
+            yield combination, row
+    finally:
+        if sap_object is not None:
+            sap_close(sap_object)
+
+
+def restart_sap(sap_object, open_function, open_kwargs):
+    # after a failed analysis the SAP instance can be in any state, so close it (if it still responds)
+    # and start a new one
+    try:
+        sap_close(sap_object)
+    except Exception:
+        pass
+    return profile_com_calls(open_function(**open_kwargs))
+
+
+def sweep_worker(
+    worker_id,
+    settings,
+    open_function,
+    open_kwargs,
+    task_queue,
+    result_queue,
+    template_model=False,
+    profile=None,
+):
+
+    # runs in its own process with its own SAP instance and model file, so the workers never touch the
+    # same .sdb. tasks are (index, combination), None to stop. results are (worker_id, index, row, error,
+    # trace). profile is profiling_options() of the parent, the trace is None when it isn't profiling
+    if profile is not None:
+        start_profiling(**profile)
+    model_path = os.path.join(settings["model_dir"], f"MODEL_{worker_id}.sdb")
+    sap_object = profile_com_calls(open_function(**open_kwargs))
+    template = None
+    while True:
+        task = task_queue.get()
+        if task is None:
+            break
+        index, combination = task
+        with profile_combination(combination) as trace:
+            try:
+                row, template = sap_analyse(
+                    sap_object,
+                    settings,
+                    combination,
+                    model_path,
+                    template,
+                    template_model,
+                )
+                error = None
+            except Exception as exception:
+                row, error = None, repr(exception)
+        result_queue.put((worker_id, index, row, error, trace))
+        if error is not None:
+            sap_object = restart_sap(sap_object, open_function, open_kwargs)
+            template = None
+    sap_close(sap_object)
+
+
+def parallel_sweep(
+    combinations,
+    settings,
+    num_workers,
+    open_function=sap_open,
+    open_kwargs=None,
+    max_attempts=3,
+    template_model=False,
+):
+
+    # every worker process owns a SAP instance (open_kwargs should make open_function start a new one, ex.
+    # {"attach": False} for sap_open) and gets one combination at a time, so the parent always knows
+    # which combination each worker is on. if a worker raises, or its process dies (SAP crash), that
+    # combination goes back to the front of the queue and a new worker takes the dead worker's place.
+    # results are yielded in the order of combinations, combinations are read lazily
+    open_kwargs = open_kwargs or {}
+    context = multiprocessing.get_context("spawn")
+    result_queue = context.Queue()
+
+    workers = {}
+    task_queues = {}
+    busy = {}  # worker_id -> index of the combination it is analysing
+
+    def start_worker(worker_id):
+        task_queues[worker_id] = context.Queue()
+        workers[worker_id] = context.Process(
+            target=sweep_worker,
+            args=(
+                worker_id,
+                settings,
+                open_function,
+                open_kwargs,
+                task_queues[worker_id],
+                result_queue,
+                template_model,
+                profiling_options(),
+            ),
+            daemon=True,
+        )
+        workers[worker_id].start()
+
+    for worker_id in range(num_workers):
+        start_worker(worker_id)
+
+    combinations = enumerate(combinations)
+    exhausted = False
+    pending = {}  # index -> combination, not finished yet
+    retry = deque()
+    attempts = {}
+    finished = {}  # index -> row, waiting to be yielded in order
+    next_index = 0
+    idle_deaths = 0
+
+    def failed_attempt(index, error):
+        attempts[index] += 1
+        print(
+            f"Analysis of {pending[index]} failed ({error}), attempt {attempts[index]}"
+        )
+        if attempts[index] >= max_attempts:
+            finished[index] = None
+        else:
+            retry.appendleft(index)
+
+    try:
+        while True:
+            # hand out work to the idle workers, retries first
+            for worker_id in workers:
+                if worker_id in busy:
+                    continue
+                if retry:
+                    index = retry.popleft()
+                elif not exhausted:
+                    try:
+                        index, combination = next(combinations)
+                    except StopIteration:
+                        exhausted = True
+                        continue
+                    pending[index] = combination
+                    attempts[index] = 0
+                else:
+                    continue
+                busy[worker_id] = index
+                task_queues[worker_id].put((index, pending[index]))
+
+            # yield everything that is finished, in order
+            while next_index in finished:
+                row = finished.pop(next_index)
+                yield pending.pop(next_index), row
+                next_index += 1
+
+            if exhausted and not busy and not retry:
+                break
+
+            try:
+                worker_id, index, row, error, trace = result_queue.get(
+                    timeout=POLL_INTERVAL
+                )
+            except queue.Empty:
+                # check for workers that died without reporting back
+                for worker_id, process in list(workers.items()):
+                    if process.is_alive():
+                        continue
+                    if worker_id in busy:
+                        index = busy.pop(worker_id)
+                        failed_attempt(
+                            index,
+                            f"worker {worker_id} exited with code {process.exitcode}",
+                        )
+                    else:
+                        # died before taking a combination, ex. SAP failed to start
+                        idle_deaths += 1
+                        if idle_deaths > max_attempts * num_workers:
+                            raise RuntimeError("SAP workers keep failing to start")
+                    start_worker(worker_id)
+                continue
+
+            busy.pop(worker_id, None)
+            record_trace(trace)
+            if error is None:
+                finished[index] = row
+            else:
+                failed_attempt(index, error)
+
+    finally:
+        for worker_id, process in workers.items():
+            if process.is_alive():
+                task_queues[worker_id].put(None)
+        for process in workers.values():
+            process.join(timeout=10)
+            if process.is_alive():
+                process.terminate()
+
+
+def merged_sweep(entries, run_sweep):
+
+    # entries yields (combination, row) in the order of the sweep, row None for the combinations to send to
+    # run_sweep (ex. the cache misses of cached_sweep) and the row for the others (ex. the cache hits).
+    # yields (combination, row, analysed) in the order of entries, analysed is True for the rows of the
+    # runner. the runner may leave combinations out (ex. pruned_sweep), they aren't yielded either
+    #
+    # a row that is already there is yielded as soon as there is no analysis ahead of it, so the rows stream
+    # (to the CSV, the progress output and stop_early) instead of waiting for the next analysis. the runner
+    # is only resumed while an analysis is waiting for its row. when it asks for more combinations than are
+    # queued (ex. parallel_sweep filling its workers) the entries are read ahead inside pending, and the
+    # rows found there wait behind the analyses
+    entries = iter(entries)
+    # [combination, row, analysed, done, left out], in order, from the first analysis without a row
+    ahead = deque()
+    analyses = deque()  # the entries of ahead sent to the runner, in order
+    queued = deque()  # combinations read by the loop below, for the runner
+
+    def pending():
+        while True:
+            if queued:
+                yield queued.popleft()
+                continue
+            entry = next(entries, None)
+            if entry is None:
+                return
+            combination, row = entry
+            ahead.append([combination, row, row is None, row is not None, False])
+            if row is None:
+                analyses.append(ahead[-1])
+                yield combination
+
+    def received(result):
+        # the row of an analysis (None when the runner has finished), the analyses sent before it are left
+        # out. then the entries that are done
+        while analyses:
+            entry = analyses.popleft()
+            entry[3] = True
+            if result is not None and entry[0] == result[0]:
+                entry[1] = result[1]
+                break
+            entry[4] = True
+        while ahead and ahead[0][3]:
+            combination, row, analysed, done, left_out = ahead.popleft()
+            if not left_out:
+                yield combination, row, analysed
+
+    results = run_sweep(pending())
+    try:
+        # nothing is ahead at the start of each iteration, the analyses are waited for below
+        for combination, row in entries:
+            if row is not None:
+                yield combination, row, False
+                continue
+            entry = [combination, row, True, False, False]
+            ahead.append(entry)
+            analyses.append(entry)
+            queued.append(combination)
+            while analyses:
+                yield from received(next(results, None))
+
+        # the runner sees the end of the combinations (and closes SAP)
+        for result in results:
+            yield from received(result)
+        yield from received(None)
+    finally:
+        results.close()
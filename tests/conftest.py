@@ -0,0 +1,29 @@
+import os
+import sys
+
+import pytest
+
+# the modules live at the root of the repository, next to main.py
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fake_sweep import build_sweep_settings, native_ground_truth, recording_sap_open
+
+# fixtures shared by the tests, on the fake sweep of fake_sweep.py
+
+
+@pytest.fixture(scope="session")
+def ground_truth():
+    # (catalog, {(top, bottom, web): row}) of the 2600 combinations the sweep schedulers are checked on
+    return native_ground_truth(36)
+
+
+@pytest.fixture
+def sweep_settings(tmp_path):
+    # settings of the fake sweep for a number of spans (3 divisions per module), models saved in tmp_path
+    return lambda num_spans: build_sweep_settings(num_spans, 3, str(tmp_path))
+
+
+@pytest.fixture
+def fake_sap():
+    # (open function for sap_sweep, list of the fake SAP objects it opened, the last one at the end)
+    return recording_sap_open()
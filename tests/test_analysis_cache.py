@@ -0,0 +1,103 @@
+import os
+
+from fake_sweep import *
+from analysis_cache import *
+
+
+def test_cached_sweep_matches_uncached(tmp_path, sweep_settings):
+    # two overlapping sweeps, the second only analyses the combinations the first didn't and gives the rows
+    # of an uncached sweep, with and without a size cap small enough to evict entries
+    combinations = sweep_combinations(64)
+    settings = sweep_settings(3)
+    run_sweep = lambda combinations: sap_sweep(combinations, settings, 1, fake_sap_open)
+    expected = list(run_sweep(combinations[20:]))
+    for max_bytes in (CACHE_MAX_BYTES, 20000):
+        cache = open_analysis_cache(
+            os.path.join(str(tmp_path), f"cache_{max_bytes}.db"), max_bytes
+        )
+        list(cached_sweep(combinations[:40], settings, cache, run_sweep))
+        cache["hits"] = 0
+        cache["misses"] = 0
+        assert (
+            list(cached_sweep(combinations[20:], settings, cache, run_sweep))
+            == expected
+        )
+        if max_bytes == CACHE_MAX_BYTES:
+            assert (cache["hits"], cache["misses"]) == (20, 24)
+        cache["connection"].close()
+
+
+def test_cached_rerun_streams(tmp_path, sweep_settings, fake_sap):
+    # a fully cached rerun yields each row after looking up its combination, without waiting for the end
+    # of the sweep or starting SAP
+    combinations = sweep_combinations(16)
+    settings = sweep_settings(1)
+    open_function, sap_objects = fake_sap
+    run_sweep = lambda combinations: sap_sweep(combinations, settings, 1, open_function)
+    cache = open_analysis_cache(os.path.join(str(tmp_path), "cache.db"))
+    expected = list(cached_sweep(combinations, settings, cache, run_sweep))
+    sap_objects.clear()
+
+    pulled = []
+
+    def source():
+        for combination in combinations:
+            pulled.append(combination)
+            yield combination
+
+    for i, result in enumerate(cached_sweep(source(), settings, cache, run_sweep)):
+        assert result == expected[i]
+        assert len(pulled) == i + 1
+    assert sap_objects == []
+
+
+def test_failed_analyses_are_not_cached(tmp_path, sweep_settings):
+    combinations = sweep_combinations(4)
+    settings = sweep_settings(1)
+    cache = open_analysis_cache(os.path.join(str(tmp_path), "cache.db"))
+    failing = lambda combinations: sap_sweep(
+        combinations, settings, 1, fake_sap_open, {"failure_rate": 1.0}, max_attempts=1
+    )
+    assert all(
+        row is None
+        for combination, row in cached_sweep(combinations, settings, cache, failing)
+    )
+    run_sweep = lambda combinations: sap_sweep(combinations, settings, 1, fake_sap_open)
+    cache["misses"] = 0
+    rows = list(cached_sweep(combinations, settings, cache, run_sweep))
+    assert cache["misses"] == len(combinations)
+    assert rows == list(run_sweep(combinations))
+
+
+def test_model_files_are_in_the_key(tmp_path, sweep_settings):
+    # editing BASE.sdb or the section library misses the cache, the same contents at another path don't
+    combinations = sweep_combinations(4)
+    base_path = str(tmp_path / "BASE.sdb")
+    library_path = str(tmp_path / "AA2020.xml")
+    for path in (base_path, library_path):
+        with open(path, "w") as file:
+            file.write("original")
+
+    def model_settings():
+        settings = sweep_settings(1)
+        settings["base_model_hash"] = file_hash(base_path)
+        settings["section_library_hash"] = file_hash(library_path)
+        return settings
+
+    settings = model_settings()
+    run_sweep = lambda combinations: sap_sweep(combinations, settings, 1, fake_sap_open)
+    cache = open_analysis_cache(str(tmp_path / "cache.db"))
+    list(cached_sweep(combinations, settings, cache, run_sweep))
+
+    keys = [cache_key(settings, combination) for combination in combinations]
+    moved = dict(settings, base_file_path=str(tmp_path / "moved" / "BASE.sdb"))
+    assert [cache_key(moved, combination) for combination in combinations] == keys
+    for path in (base_path, library_path):
+        with open(path, "w") as file:
+            file.write("edited")
+        edited = model_settings()
+        cache["misses"] = 0
+        list(cached_sweep(combinations, edited, cache, run_sweep))
+        assert cache["misses"] == len(combinations)
+    assert file_hash(str(tmp_path / "missing.sdb")) is None
+    cache["connection"].close()
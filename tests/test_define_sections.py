@@ -0,0 +1,287 @@
+import os
+from fractions import Fraction
+
+import numpy as np
+import pandas as pd
+
+from fake_sweep import *
+from results_store import *
+
+STEEL_LABELS = [
+    "HS356X356X9.5",
+    "HS305X305X9.5",
+    "HS305X203X8.0",
+    "HS254X254X8.0",
+    "HS254X152X9.5",
+    "HS203X203X9.5",
+    "HS178X178X8.0",
+    "HS152X152X9.5",
+    "HS127X127X8.0",
+    "HS102X102X8.0",
+    "HS168X8.0",
+    "HS141X9.5",
+    "HS114X8.0",
+    "HS89X7.9",
+]
+# the loops stripped the spaces out of the labels, so a mixed number depth like 5 1/2 was read as 51/2.
+# they are only compared on whole number depths
+ALU_LABELS = [
+    "PIPE 12 X 1/2",
+    "PIPE 10 X 3/4",
+    "PIPE 9 X 1/2",
+    "PIPE 8 X 1",
+    "PIPE 6 X 1/2",
+    "PIPE 5 X 1/2",
+    "PIPE 4 X 1/4",
+    "PIPE 3 X 1/4",
+]
+
+
+def label_catalog(labels, is_alu):
+    # catalog columns of the sections in labels, from the dimensions in the labels
+    columns = {name: [] for name in ["depth", "width", "thickness", "is_round", "A"]}
+    for label in labels:
+        depth, width, thick, is_round = section_dimensions(label, is_alu)
+        scale = 0.0254 if is_alu else 0.001
+        geometry = section_geometry(
+            depth * scale, width * scale, thick * scale, is_round
+        )
+        for name, value in zip(columns, [depth, width, thick, is_round, geometry["A"]]):
+            columns[name].append(value)
+    catalog = {name: np.array(values) for name, values in columns.items()}
+    catalog["label"] = np.array(labels)
+    catalog["mass"] = catalog["A"] * (
+        DENSITIES["aluminum"] if is_alu else DENSITIES["steel"]
+    )
+    return catalog
+
+
+def loop_combinations_steel(top_sections, bottom_sections, web_sections):
+    # valid_combinations_steel before the combinations were built by broadcasting
+    combinations = []
+    min_d_diff = 50
+    for top in top_sections:
+        temp = top.split("X")
+        top_d = int(temp[0][2:])
+        for bottom in bottom_sections:
+            temp = bottom.split("X")
+            bottom_d = int(temp[0][2:])
+            if (top_d - bottom_d) >= min_d_diff:
+                for web in web_sections:
+                    temp = web.split("X")
+                    web_d = int(temp[0][2:])
+                    if (bottom_d - web_d) >= min_d_diff:
+                        combinations.append([top, bottom, web])
+    return combinations
+
+
+def loop_combinations_alu(top_sections, bottom_sections, web_sections):
+    # valid_combinations_alu before the combinations were built by broadcasting
+    temp_top = [s.replace(" ", "").replace("PIPE", "PI") for s in top_sections]
+    temp_bottom = [s.replace(" ", "").replace("PIPE", "PI") for s in bottom_sections]
+    temp_web = [s.replace(" ", "").replace("PIPE", "PI") for s in web_sections]
+    combinations = []
+    min_d_diff = 2
+    for index_top, top in enumerate(temp_top):
+        top_d = float(Fraction(top.split("X")[0][2:]))
+        for index_bottom, bottom in enumerate(temp_bottom):
+            bottom_d = float(Fraction(bottom.split("X")[0][2:]))
+            if (top_d - bottom_d) >= min_d_diff:
+                for index_web, web in enumerate(temp_web):
+                    web_d = float(Fraction(web.split("X")[0][2:]))
+                    if (bottom_d - web_d) >= min_d_diff:
+                        combinations.append(
+                            [
+                                top_sections[index_top],
+                                bottom_sections[index_bottom],
+                                web_sections[index_web],
+                            ]
+                        )
+    return combinations
+
+
+def test_valid_combinations_matches_the_loops():
+    # same combinations in the same order as the nested loops, for sections in catalog order, sorted by
+    # size and shuffled
+    rng = np.random.default_rng(0)
+    for labels, is_alu, min_d_diff, loops in (
+        (STEEL_LABELS, False, 50, loop_combinations_steel),
+        (ALU_LABELS, True, 2, loop_combinations_alu),
+    ):
+        catalog = label_catalog(labels, is_alu)
+        everything = np.arange(len(labels))
+        for top, bottom, web in (
+            (everything, everything, everything),
+            (
+                sort_by_size(catalog, everything),
+                sort_by_size(catalog, everything),
+                everything,
+            ),
+            (
+                rng.permutation(everything),
+                rng.permutation(everything),
+                rng.permutation(everything),
+            ),
+        ):
+            combinations = valid_combinations(catalog, top, bottom, web, min_d_diff)
+            expected = loops(
+                list(catalog["label"][top]),
+                list(catalog["label"][bottom]),
+                list(catalog["label"][web]),
+            )
+            assert len(expected) > 0
+            assert catalog["label"][combinations].tolist() == expected
+
+
+def test_mixed_number_depths():
+    # 8 5/8 - 6 1/2 = 2.125 passes a 2 inch gap, 6 1/2 - 5 = 1.5 doesn't
+    catalog = label_catalog(
+        ["PIPE 8 5/8 X 1/2", "PIPE 6 1/2 X 1/2", "PIPE 5 X 1/2", "PIPE 4 X 1/2"], True
+    )
+    assert np.allclose(catalog["depth"], [8.625, 6.5, 5.0, 4.0])
+    everything = np.arange(4)
+    combinations = valid_combinations(catalog, everything, everything, everything, 2)
+    assert combinations.tolist() == [[0, 1, 3]]
+
+
+def test_chunks_join_to_valid_combinations():
+    # any chunk size, every chunk full but the last
+    catalog = label_catalog(STEEL_LABELS, False)
+    everything = np.arange(len(STEEL_LABELS))
+    expected = valid_combinations(catalog, everything, everything, everything, 50)
+    for chunk_size in (1, 2, 7, 64, len(expected), 1024):
+        chunks = list(
+            combination_chunks(
+                catalog, everything, everything, everything, [depth_gap(50)], chunk_size
+            )
+        )
+        assert np.array_equal(np.concatenate(chunks), expected)
+        assert all(len(chunk) == chunk_size for chunk in chunks[:-1])
+        assert 0 < len(chunks[-1]) <= chunk_size
+    # nothing passes
+    assert (
+        list(
+            combination_chunks(
+                catalog, everything, everything, everything, [depth_gap(1000)], 7
+            )
+        )
+        == []
+    )
+
+
+def test_predicates_mask_their_rows():
+    # every predicate and all of them together, against checking each combination on its own
+    catalog = label_catalog(STEEL_LABELS, False)
+    everything = np.arange(len(STEEL_LABELS))
+    top, bottom, web = np.meshgrid(everything, everything, everything, indexing="ij")
+    depth, width, thick, mass = (
+        catalog["depth"],
+        catalog["width"],
+        catalog["thickness"],
+        catalog["mass"],
+    )
+    checks = [
+        (
+            depth_gap(50),
+            lambda t, b, w: depth[t] - depth[b] >= 50 and depth[b] - depth[w] >= 50,
+        ),
+        (
+            width_match(0.8),
+            lambda t, b, w: width[w] <= 0.8 * width[t] and width[w] <= 0.8 * width[b],
+        ),
+        (
+            thickness_ratio(1.0),
+            lambda t, b, w: thick[w] <= thick[t] and thick[w] <= thick[b],
+        ),
+        (max_mass(150), lambda t, b, w: mass[t] + mass[b] + mass[w] <= 150),
+    ]
+    for predicate, check in checks:
+        mask = predicate(catalog, top, bottom, web)
+        expected = np.vectorize(check)(top, bottom, web)
+        assert 0 < np.sum(expected) < expected.size
+        assert np.array_equal(mask, expected)
+
+    # combination_chunks keeps the combinations that pass every predicate, in loop order
+    expected = [
+        [t, b, w]
+        for t in everything
+        for b in everything
+        for w in everything
+        if all(check(t, b, w) for _, check in checks)
+    ]
+    assert len(expected) > 0
+    chunks = combination_chunks(
+        catalog,
+        everything,
+        everything,
+        everything,
+        [predicate for predicate, _ in checks],
+        5,
+    )
+    assert np.concatenate(list(chunks)).tolist() == expected
+
+
+def test_csv_header_only_for_a_new_file(tmp_path):
+    path = str(tmp_path / "output_0.csv")
+    append_to_csv([], path)
+    assert not os.path.exists(path)
+    append_to_csv([{"a": 1, "b": "None"}], path)
+    append_to_csv([{"a": 2, "b": "x"}, {"a": 3, "b": "y"}], path)
+    with open(path) as file:
+        assert file.read().splitlines() == ["a,b", "1,None", "2,x", "3,y"]
+    # an empty file left by a crash gets the header too
+    open(path, "w").close()
+    append_to_csv([{"a": 4, "b": "z"}], path)
+    with open(path) as file:
+        assert file.read().splitlines() == ["a,b", "4,z"]
+
+
+def test_resume_rewrites_the_csv(tmp_path, sweep_settings):
+    # a sweep stops after storing 5 rows, with only 4 of them in the csv. resuming like main.py writes
+    # every combination once, same as a sweep that wasn't stopped
+    settings = sweep_settings(1)
+    combinations = sweep_combinations(8)
+    store = open_results_store(str(tmp_path / "results.db"))
+    key = settings_hash(settings)
+    rows = list(sap_sweep(combinations, settings, 1, fake_sap_open))
+    full_path = str(tmp_path / "full.csv")
+    append_to_csv([row for combination, row in rows], full_path)
+
+    path = str(tmp_path / "output_0.csv")
+    resume_results(store, key, False)
+    for i, (combination, row) in enumerate(rows[:5]):
+        store_result(store, key, "Sheet", combination, row)
+        if i < 4:
+            append_to_csv([row], path)
+
+    completed = resume_results(store, key, True)
+    rewrite_csv(load_results(store, key, "Sheet"), path)
+    remaining = [
+        combination
+        for combination in combinations
+        if tuple(combination) not in completed
+    ]
+    for combination, row in sap_sweep(remaining, settings, 1, fake_sap_open):
+        store_result(store, key, "Sheet", combination, row)
+        append_to_csv([row], path)
+    store.close()
+    with open(path) as file, open(full_path) as full_file:
+        assert file.read() == full_file.read()
+
+
+def test_excel_matches_the_csvs(tmp_path, sweep_settings):
+    # one sheet per csv, with the same columns and values ("None" failed sections stay text)
+    settings = sweep_settings(1)
+    csv_paths = {}
+    for index, sheet in enumerate(["Box Box Box", "Box Box Round"]):
+        csv_paths[sheet] = str(tmp_path / f"output_{index}.csv")
+        rows = sap_sweep(sweep_combinations(4 + index), settings, 1, fake_sap_open)
+        append_to_csv([row for combination, row in rows], csv_paths[sheet])
+    path = str(tmp_path / "output.xlsx")
+    export_to_excel(csv_paths, path)
+    sheets = pd.read_excel(path, sheet_name=None, keep_default_na=False)
+    assert list(sheets) == list(csv_paths)
+    for sheet, csv_path in csv_paths.items():
+        pd.testing.assert_frame_equal(
+            sheets[sheet], pd.read_csv(csv_path, keep_default_na=False)
+        )
@@ -0,0 +1,74 @@
+from fake_sweep import *
+
+# the fake SAP object (fake_sap.py) the sweep tests and benchmark.py run the SAP pipeline on
+
+
+def test_build_model_on_fake_sap(sweep_settings):
+    # the model builds without a call the fake SAP object rejects, the point lookups go through the model
+    # index, and the group based calls don't grow with the number of spans
+    counts = []
+    for num_spans in (1, 3, 9):
+        settings = sweep_settings(num_spans)
+        sap_object = fake_sap_open()
+        sap_model = sap_object.SapModel
+        sap_build_model(sap_object, settings, sweep_combinations(1)[0])
+        assert not sap_model.errors, sap_model.errors
+        assert sap_model.calls["FrameObj.GetPoints"] == 0
+        counts.append(
+            [
+                sap_model.calls[method]
+                for method in (
+                    "FrameObj.SetLoadDistributed",
+                    "PointObj.SetRestraint",
+                    "FrameObj.SetReleases",
+                )
+            ]
+        )
+    assert counts[0] == counts[1] == counts[2]
+
+
+def test_fake_results_are_deterministic(sweep_settings):
+    settings = sweep_settings(3)
+    combinations = sweep_combinations(8)
+    first = list(sap_sweep(combinations, settings, 1, fake_sap_open))
+    second = list(sap_sweep(combinations, settings, 1, fake_sap_open))
+    assert first == second
+    assert [combination for combination, row in first] == combinations
+    assert all(row is not None for combination, row in first)
+
+
+def test_groups_keep_their_objects(sweep_settings):
+    # every group still has its objects after the bottom chord is braced, the group assignments table is
+    # replaced on each edit so they all have to go in one edit
+    settings = dict(sweep_settings(3), pattern_live_load=0.5)
+    sap_object = fake_sap_open()
+    (
+        sap_model,
+        bottom_chord_frames,
+        top_chord_frames,
+        diagonal_web_frames,
+        vertical_web_frames,
+        _,
+        _,
+    ) = sap_build_model(sap_object, settings, sweep_combinations(1)[0])
+    assert not sap_model.errors, sap_model.errors
+    assert sap_model.calls["DatabaseTables.ApplyEditedTables"] == 1
+    groups = sap_model.groups
+    assert groups["BOTTOM_CHORD"]["Frame"] == set(bottom_chord_frames)
+    assert groups["TOP_CHORD"]["Frame"] == set(top_chord_frames)
+    assert groups["WEB"]["Frame"] == set(diagonal_web_frames + vertical_web_frames)
+    # a span is 2 modules of 3 bottom chord frames
+    for span in range(3):
+        assert groups[f"SPAN_{span + 1}"]["Frame"] == set(
+            bottom_chord_frames[span * 6 : (span + 1) * 6]
+        )
+    for group in ("SPLICE", "SPLICE_VERTICAL"):
+        assert groups[group]["Frame"]
+    for group in ("WEB_POINTS", "SUPPORT_POINTS"):
+        assert groups[group]["Joint"]
+    # a brace point at the midpoint of the frames at both ends of each span, y restrained only
+    assert len(groups["BRACE_POINTS"]["Joint"]) == 2 * 3
+    for point in groups["BRACE_POINTS"]["Joint"]:
+        assert sap_model.restraints[point] == [False, True, False, False, False, False]
+    for point in groups["SUPPORT_POINTS"]["Joint"]:
+        assert sap_model.restraints[point] == [True, True, True, False, False, False]
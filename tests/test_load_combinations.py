@@ -0,0 +1,111 @@
+import numpy as np
+
+from fake_sweep import *
+
+
+def relative_difference(values, expected):
+    finite = np.isfinite(expected)
+    return np.max(
+        np.abs(values[finite] - expected[finite])
+        / np.maximum(np.abs(expected[finite]), 1e-9)
+    )
+
+
+def test_superposition_matches_factored_solve():
+    # the ULS and SLS results superposed from the pattern results against a solve of the factored loads
+    tables = sweep_section_tables(8)
+    model, bottom_chord_frames = build_native_model(3, 3)
+    prepared = native_prepare(model)
+    batch = native_run_batch(prepared, tables)
+    uls_combinations, sls_combinations = design_combinations(1.1, 1.7, 1.5, 1.2, 1.5)
+    for name, combination in {**uls_combinations, **sls_combinations}.items():
+        factored = native_prepare(factored_model(model, name, combination))
+        direct = native_run_batch(factored, tables)
+        assert (
+            relative_difference(
+                native_member_utilization(
+                    prepared, batch, tables, combinations={name: combination}
+                ),
+                native_member_utilization(factored, direct, tables, name),
+            )
+            < 1e-9
+        )
+        assert (
+            relative_difference(
+                native_batch_deflection(
+                    prepared, batch, bottom_chord_frames, 30.0, {name: combination}
+                )[0],
+                native_batch_deflection(
+                    factored, direct, bottom_chord_frames, 30.0, {name: {name: 1.0}}
+                )[0],
+            )
+            < 1e-9
+        )
+
+
+def test_envelope_matches_one_combination_at_a_time():
+    # more combinations than LOAD_COMBINATION_BLOCK, so the blocks are checked too
+    tables = sweep_section_tables(8)
+    model, bottom_chord_frames = build_native_model(3, 3)
+    prepared = native_prepare(model)
+    batch = native_run_batch(prepared, tables)
+    uls_combinations, sls_combinations = design_combinations(1.1, 1.7, 1.5, 1.2, 1.5)
+    rng = np.random.default_rng(0)
+    combinations = dict(uls_combinations)
+    for i in range(11):
+        combinations[f"ULS {i}"] = {
+            pattern: factor * rng.uniform(0.5, 1.2)
+            for pattern, factor in uls_combinations["ULS"].items()
+        }
+    one_at_a_time = np.max(
+        [
+            native_member_utilization(
+                prepared, batch, tables, combinations={name: combination}
+            )
+            for name, combination in combinations.items()
+        ],
+        axis=0,
+    )
+    assert np.allclose(
+        native_member_utilization(prepared, batch, tables, combinations=combinations),
+        one_at_a_time,
+        rtol=1e-12,
+    )
+
+
+def test_combinations_dont_add_sap_analyses(sweep_settings, fake_sap):
+    # extra combinations on the fake SAP object are response combinations, no more analyses or result
+    # calls
+    uls_combinations, sls_combinations = design_combinations(1.1, 1.7, 1.5, 1.2, 1.5)
+    methods = ["Analyze.RunAnalysis", "Results.JointDispl", "Results.FrameForce"]
+    calls = []
+    for count in (1, 4):
+        settings = sweep_settings(1)
+        for i in range(count - 1):
+            settings["uls_combinations"][f"ULS {i}"] = dict(
+                uls_combinations["ULS"], SNOW=0.5 * i
+            )
+            settings["sls_combinations"][f"SLS {i}"] = dict(
+                sls_combinations["SLS"], SNOW=0.1 * i
+            )
+        open_function, sap_objects = fake_sap
+        rows = list(sap_sweep(sweep_combinations(4), settings, 1, open_function))
+        sap_model = sap_objects[-1].SapModel
+        assert not sap_model.errors, sap_model.errors
+        assert all(row is not None for combination, row in rows)
+        calls.append([sap_model.calls[method] for method in methods])
+        assert sap_model.calls["RespCombo.Add"] == 4 * (count - 1)
+    assert calls[0] == calls[1]
+
+
+def test_principal_companion_combinations():
+    combinations = principal_companion_combinations(
+        "ULS",
+        {"DEAD": 1.25},
+        {("LIVE", "BARRIER_VERTICAL"): 1.5, "SNOW": 1.5},
+        {("LIVE", "BARRIER_VERTICAL"): 0.5, "SNOW": 0.5},
+    )
+    assert combinations == {
+        "ULS LIVE": {"DEAD": 1.25, "SNOW": 0.5, "LIVE": 1.5, "BARRIER_VERTICAL": 1.5},
+        "ULS SNOW": {"DEAD": 1.25, "LIVE": 0.5, "BARRIER_VERTICAL": 0.5, "SNOW": 1.5},
+    }
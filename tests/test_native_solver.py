@@ -0,0 +1,232 @@
+import numpy as np
+import pytest
+
+from fake_sweep import *
+
+# a beam that weighs nothing, for the closed form checks
+BEAM = {"E": 2.0e8, "A": 0.01, "I": 1.0e-4, "weight": 0.0, "mass": 0.0}
+
+
+def beam_model(length, num_elements, restraint_1, restraint_2, w):
+
+    # straight beam along x split in num_elements frames of the BEAM section, with a gravity UDL w on
+    # the "LOAD" pattern, and its frames
+    model = native_initialize_model()
+    frames = []
+    for i in range(num_elements):
+        frames.append(
+            native_add_frame(
+                model,
+                (i * length / num_elements, 0.0, 0.0),
+                ((i + 1) * length / num_elements, 0.0, 0.0),
+                "BEAM",
+            )
+        )
+        model["frames"][frames[-1]]["loads"].append(("LOAD", w))
+    native_set_restraint(model, model["frames"][frames[0]]["points"][0], restraint_1)
+    native_set_restraint(model, model["frames"][frames[-1]]["points"][1], restraint_2)
+    model["load_patterns"]["LOAD"] = 0
+    model["load_cases"]["LOAD"] = {"LOAD": 1.0}
+    return model, frames
+
+
+def frame_moment(model, frame, end):
+    # in-plane moment at end 0 (i) or 1 (j) of the last element of a frame, for the LOAD case
+    element_frames, forces = native_frame_forces(model, "LOAD")
+    element = len(element_frames) - 1 - element_frames[::-1].index(frame)
+    return forces[element, 3 * end + 2]
+
+
+def total_loads(model, section_table, case):
+
+    # (vertical load, moment of the vertical load about the origin) of a load case, from the frame UDLs and the
+    # self weight of the patterns with a self weight multiplier
+    load = 0.0
+    moment = 0.0
+    for frame in model["frames"].values():
+        x_1, _, z_1 = model["point_coords"][frame["points"][0]]
+        x_2, _, z_2 = model["point_coords"][frame["points"][1]]
+        length = np.hypot(x_2 - x_1, z_2 - z_1)
+        props = section_table[frame["section"]]
+        for pattern, factor in model["load_cases"][case].items():
+            w = sum(udl for name, udl in frame["loads"] if name == pattern)
+            w += model["load_patterns"][pattern] * props["weight"] * props["A"]
+            load += factor * w * length
+            moment += factor * w * length * (x_1 + x_2) / 2.0
+    return load, moment
+
+
+def test_simply_supported_beam():
+    # midspan deflection 5wL^4/384EI, end reactions wL/2 and midspan moment wL^2/8
+    length, w = 6.0, 10.0
+    model, frames = beam_model(
+        length,
+        10,
+        [True, True, True, False, False, False],
+        [False, True, True, False, False, False],
+        w,
+    )
+    native_run_analysis(model, {"BEAM": BEAM})
+    EI = BEAM["E"] * BEAM["I"]
+
+    _, midspan = model["frames"][frames[4]]["points"]
+    _, deflection, _ = native_joint_displacement(model, midspan, "LOAD")
+    assert np.isclose(deflection, -5 * w * length**4 / (384 * EI), rtol=1e-9)
+
+    reactions = model["results"]["reactions"][:, 0]
+    for end in (
+        model["frames"][frames[0]]["points"][0],
+        model["frames"][frames[-1]]["points"][1],
+    ):
+        assert np.isclose(
+            reactions[3 * model["results"]["node_index"][end] + 1], w * length / 2
+        )
+    assert np.allclose(native_base_reaction(model, "LOAD"), (0.0, w * length))
+
+    assert np.isclose(abs(frame_moment(model, frames[4], 1)), w * length**2 / 8)
+
+
+def test_moment_release():
+    # fixed-fixed beam with an M3 release at midspan: by symmetry each half is a cantilever of length
+    # L/2, so the midspan deflects w(L/2)^4/8EI, the hinge carries no moment and the supports w(L/2)^2/2
+    length, w = 6.0, 10.0
+    fixed = [True, True, True, True, True, True]
+    model, frames = beam_model(length, 2, fixed, fixed, w)
+    native_set_release(
+        model, frames[0], [False] * 6, [False, False, False, False, False, True]
+    )
+    native_run_analysis(model, {"BEAM": BEAM})
+    EI = BEAM["E"] * BEAM["I"]
+    half = length / 2
+
+    _, midspan = model["frames"][frames[0]]["points"]
+    _, deflection, _ = native_joint_displacement(model, midspan, "LOAD")
+    assert np.isclose(deflection, -w * half**4 / (8 * EI), rtol=1e-9)
+    assert abs(frame_moment(model, frames[0], 1)) < 1e-9 * w * half**2
+    assert np.isclose(abs(frame_moment(model, frames[0], 0)), w * half**2 / 2)
+
+
+def test_truss_equilibrium():
+    # the reactions balance the applied loads and self weight of every linear case, vertically, horizontally
+    # and in moment about the origin, for the through truss and the gerber truss
+    section_table = sweep_section_tables(1)[0]
+    for is_gerber in (False, True):
+        model, _ = build_native_model(3, 3, is_gerber=is_gerber)
+        results = native_run_analysis(model, section_table)
+        x = np.zeros(len(results["node_index"]))
+        z = np.zeros(len(results["node_index"]))
+        for point, node in results["node_index"].items():
+            x[node], _, z[node] = model["point_coords"][point]
+        for case in model["load_cases"]:
+            R = results["reactions"] @ native_case_factors(model, case)
+            load, moment = total_loads(model, section_table, case)
+            assert np.isclose(np.sum(R[1::3]), load, rtol=1e-9, atol=1e-9)
+            assert abs(np.sum(R[0::3])) < 1e-9 * max(load, 1.0)
+            assert np.isclose(
+                np.sum(R[1::3] * x - R[0::3] * z + R[2::3]),
+                moment,
+                rtol=1e-9,
+                atol=1e-9,
+            )
+
+
+def test_gerber_modification():
+    # the gerber truss drops the verticals at the span ends, the top chord frames next to them and the end
+    # barriers, and hangs each span between the cantilevers, so it deflects more than the through truss
+    section_table = sweep_section_tables(1)[0]
+    through, bottom_chord_frames = build_native_model(3, 3)
+    gerber, _ = build_native_model(3, 3, is_gerber=True)
+    assert len(through["frames"]) - len(gerber["frames"]) == 4 + 2 * 3 + 2
+    deflections = []
+    for model in (through, gerber):
+        native_run_analysis(model, section_table)
+        assert np.all(np.isfinite(model["results"]["displacements"]))
+        deflections.append(native_deflection(model, bottom_chord_frames, 30.0)[0])
+    assert deflections[1] > deflections[0]
+
+
+def test_batch_matches_one_at_a_time():
+    # a batch of section tables, over more than one chunk, gives the results of solving each table alone
+    tables = sweep_section_tables(20)
+    model, _ = build_native_model(3, 3)
+    prepared = native_prepare(model)
+    batch = native_run_batch(prepared, tables, chunk_size=8)
+    for n, table in enumerate(tables):
+        results = native_run_prepared(prepared, table)
+        for name in ("displacements", "reactions", "element_forces", "element_loads"):
+            scale = np.max(np.abs(results[name]))
+            assert np.allclose(
+                batch[name][n], results[name], rtol=0, atol=1e-12 * scale
+            )
+
+
+def creation_order_bandwidth(prepared):
+
+    # bandwidth of the free stiffness with the points numbered in the order the frames created them, like
+    # before native_prepare renumbered them along the span
+    points = [
+        point
+        for point in prepared["model"]["point_coords"]
+        if point in prepared["node_index"]
+    ]
+    dofs = np.concatenate(
+        [3 * prepared["node_index"][point] + np.arange(3) for point in points]
+    )
+    free_dofs = dofs[prepared["free"][dofs]]
+    free_index = np.full(len(dofs), -1)
+    free_index[free_dofs] = np.arange(len(free_dofs))
+    bandwidth = 0
+    for element_dofs in free_index[prepared["element_dofs"]]:
+        element_dofs = element_dofs[element_dofs >= 0]
+        bandwidth = max(bandwidth, np.max(element_dofs) - np.min(element_dofs))
+    return int(bandwidth)
+
+
+def test_banded_matches_dense():
+    # the banded cholesky gives the dense solve on trusses of 1 to 9 spans. numbering the points along the
+    # span keeps the bandwidth the same as the truss gets longer, where the creation order of the points
+    # grows it with the number of spans
+    tables = sweep_section_tables(4)
+    bandwidths = []
+    for num_spans in (1, 3, 9):
+        model, _ = build_native_model(num_spans, 3)
+        prepared = native_prepare(model)
+        dense = native_run_batch(prepared, tables, solver="dense")
+        banded = native_run_batch(prepared, tables, solver="banded")
+        for name in ("displacements", "reactions", "element_forces"):
+            scale = np.max(np.abs(dense[name]))
+            assert np.allclose(banded[name], dense[name], rtol=0, atol=1e-9 * scale)
+        bandwidths.append((prepared["bandwidth"], creation_order_bandwidth(prepared)))
+    assert bandwidths[0][0] == bandwidths[1][0] == bandwidths[2][0]
+    assert bandwidths[0][1] < bandwidths[1][1] < bandwidths[2][1]
+    assert bandwidths[2][0] < bandwidths[2][1] / 10
+
+
+def test_modal_simply_supported_beam():
+    # first frequency of a simply supported beam, pi^2/L^2 sqrt(EI/m) rad/s, with the lumped mass (no
+    # rotational mass, condensed out) and the consistent mass, and every mode of the lumped mass finite
+    length = 6.0
+    beam = dict(BEAM, mass=MATERIALS["aluminum"]["mass"])
+    model, _ = beam_model(
+        length,
+        10,
+        [True, True, True, False, False, False],
+        [False, True, True, False, False, False],
+        0.0,
+    )
+    prepared = native_prepare(model)
+    omega = (
+        np.pi**2
+        / length**2
+        * np.sqrt(beam["E"] * beam["I"] / (beam["mass"] * beam["A"]))
+    )
+    for lumped in (True, False):
+        periods, Uz = native_run_modal(prepared, [{"BEAM": beam}], 3, lumped)
+        assert np.isclose(2 * np.pi / periods[0, 0], omega, rtol=1e-3)
+        assert np.argmax(Uz[0]) == 0
+
+    # 11 points, 3 restrained translations
+    periods, _ = native_run_modal(prepared, [{"BEAM": beam}], 18)
+    assert np.all(np.isfinite(periods)) and np.all(np.diff(periods[0]) < 0)
+    with pytest.raises(ValueError):
+        native_run_modal(prepared, [{"BEAM": beam}], 19)
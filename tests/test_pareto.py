@@ -0,0 +1,89 @@
+import numpy as np
+
+from fake_sweep import *
+from interpret_results import determine_optimal_section
+from pareto import *
+
+
+def pairwise_nondominated(objectives):
+    # every row against every other row
+    no_worse = np.all(objectives[:, None, :] >= objectives[None, :, :], axis=2)
+    better = np.any(objectives[:, None, :] > objectives[None, :, :], axis=2)
+    return ~np.any(no_worse & better, axis=1)
+
+
+def synthetic_objectives(rng, num_rows, num_objectives=3):
+    # rounded, so there are equal rows and ties in single objectives
+    return np.round(rng.lognormal(0.0, 0.5, (num_rows, num_objectives)), 1)
+
+
+def test_nondominated_matches_pairwise():
+    rng = np.random.default_rng(0)
+    for num_objectives in (2, 3, 4):
+        objectives = synthetic_objectives(rng, 1000, num_objectives)
+        # small blocks, so the front is built over many of them
+        assert np.array_equal(
+            nondominated(objectives, block_size=16),
+            pairwise_nondominated(objectives),
+        )
+
+
+def test_pareto_ranks_peel_the_fronts():
+    rng = np.random.default_rng(1)
+    objectives = synthetic_objectives(rng, 500)
+    ranks = pareto_ranks(objectives)
+    remaining = np.arange(len(objectives))
+    rank = 1
+    while len(remaining) > 0:
+        front = pairwise_nondominated(objectives[remaining])
+        assert np.all(ranks[remaining[front]] == rank)
+        remaining = remaining[~front]
+        rank += 1
+
+    limited = pareto_ranks(objectives, max_rank=2)
+    assert np.array_equal(limited, np.minimum(ranks, 3))
+
+
+def test_online_front_matches_the_sweep(ground_truth):
+    # the online front of the whole sweep is the front of the passing rows, and its optimum is the one
+    # determine_optimal_section picks
+    catalog, truth = ground_truth
+    passed = [
+        row for row in truth.values() if row["Passed member design check for ULS"]
+    ]
+    objectives = np.array(
+        [[row[column] for column in OBJECTIVE_COLUMNS] for row in passed]
+    ) * [1.0, -1.0, 1.0]
+    front = [row for row, is_front in zip(passed, nondominated(objectives)) if is_front]
+    optimum = passed[
+        determine_optimal_section(
+            *[np.array([row[column] for row in passed]) for column in OBJECTIVE_COLUMNS]
+        )
+    ]
+
+    online_front = open_online_front()
+    combinations = [list(combination) for combination in truth]
+    for _ in stop_early(truth_sweep(truth)(combinations), online_front):
+        pass
+    assert online_front["analyses"] == len(combinations)
+
+    def combination_of(row):
+        return (row["Top chord"], row["Bottom chord"], row["Web members"])
+
+    assert {combination_of(row) for row in online_front["rows"]} == {
+        combination_of(row) for row in front
+    }
+    assert combination_of(online_optimum(online_front)) == combination_of(optimum)
+
+
+def test_stop_early_closes_sap(sweep_settings, fake_sap):
+    settings = sweep_settings(1)
+    open_function, sap_objects = fake_sap
+    online_front = open_online_front(max_analyses=3)
+    rows = list(
+        stop_early(
+            sap_sweep(sweep_combinations(8), settings, 1, open_function), online_front
+        )
+    )
+    assert len(rows) == 3
+    assert sap_objects and all(sap_object.closed for sap_object in sap_objects)
@@ -0,0 +1,73 @@
+import numpy as np
+import pytest
+
+from fake_sweep import *
+
+
+def test_span_arrangements():
+    assert span_arrangements(3) == [(), (0,), (1,), (0, 1), (2,), (0, 2), (1, 2)]
+    # checkerboard both ways, then the spans next to each interior support
+    assert span_arrangements(3, "alternate") == [(0, 2), (1,), (0, 1), (1, 2)]
+    assert len(span_arrangements(MAX_ALL_ARRANGEMENT_SPANS)) == (
+        2**MAX_ALL_ARRANGEMENT_SPANS - 1
+    )
+    with pytest.raises(ValueError):
+        span_arrangements(MAX_ALL_ARRANGEMENT_SPANS + 1)
+    # with a single span the checkerboard the other way leaves the span unloaded
+    assert span_arrangements(1, "alternate") == [()]
+
+
+def test_span_patterns_superpose():
+    # the span patterns add up to the LIVE pattern, and the checkerboard arrangement superposed from them
+    # matches a solve of its factored loads
+    num_spans = 3
+    tables = sweep_section_tables(4)
+    model, bottom_chord_frames = build_native_model(num_spans, 3)
+    native_span_live_loads(model, bottom_chord_frames, num_spans, 3, 5.79)
+    prepared = native_prepare(model)
+    batch = native_run_batch(prepared, tables)
+
+    spans = [batch["patterns"].index(p) for p in span_live_patterns(num_spans)]
+    live = batch["displacements"][..., batch["patterns"].index("LIVE")]
+    assert np.allclose(
+        batch["displacements"][..., spans].sum(axis=-1),
+        live,
+        rtol=0.0,
+        atol=1e-9 * np.max(np.abs(live)),
+    )
+
+    uls_combinations, sls_combinations = design_combinations(1.1, 1.7, 1.5, 1.2, 1.5)
+    checkerboard = pattern_live_combinations(sls_combinations, num_spans, "alternate")
+    name, combination = next(iter(checkerboard.items()))
+    factored = native_prepare(factored_model(model, name, combination))
+    direct = native_batch_deflection(
+        factored,
+        native_run_batch(factored, tables),
+        bottom_chord_frames,
+        30.0,
+        {name: {name: 1.0}},
+    )[0]
+    superposed = native_batch_deflection(
+        prepared, batch, bottom_chord_frames, 30.0, {name: combination}
+    )[0]
+    assert np.allclose(superposed, direct, rtol=1e-9)
+
+
+def test_arrangements_dont_add_sap_analyses(sweep_settings, fake_sap):
+    methods = ["Analyze.RunAnalysis", "Results.JointDispl"]
+    calls = []
+    for arrangements in (None, "alternate", "all"):
+        settings = sweep_settings(3)
+        settings["pattern_live_load"] = arrangements
+        if arrangements is not None:
+            for combinations in ("uls_combinations", "sls_combinations"):
+                settings[combinations].update(
+                    pattern_live_combinations(settings[combinations], 3, arrangements)
+                )
+        open_function, sap_objects = fake_sap
+        rows = list(sap_sweep(sweep_combinations(4), settings, 1, open_function))
+        sap_model = sap_objects[-1].SapModel
+        assert not sap_model.errors, sap_model.errors
+        assert all(row is not None for combination, row in rows)
+        calls.append([sap_model.calls[method] for method in methods])
+    assert calls[0] == calls[1] == calls[2]
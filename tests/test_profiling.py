@@ -0,0 +1,32 @@
+import os
+
+from fake_sweep import *
+from profiling import *
+
+
+def test_profiling_keeps_rows_and_traces_every_combination(tmp_path, sweep_settings):
+    # serial and with worker processes: one trace record per combination, and the same rows as without
+    # profiling
+    combinations = sweep_combinations(8)
+    settings = sweep_settings(3)
+    trace_path = os.path.join(str(tmp_path), "profile_trace.jsonl")
+    expected = list(sap_sweep(combinations, settings, 1, fake_sap_open))
+    for num_workers in (1, 2):
+        start_profiling(trace_path)
+        try:
+            rows = list(
+                sap_sweep(
+                    combinations,
+                    settings,
+                    num_workers,
+                    fake_sap_open,
+                    template_model=True,
+                )
+            )
+        finally:
+            finish_profiling()
+        assert rows == expected
+        combination_traces = [
+            trace for trace in load_trace(trace_path) if trace["combination"]
+        ]
+        assert len(combination_traces) == len(combinations)
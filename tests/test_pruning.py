@@ -0,0 +1,89 @@
+import numpy as np
+
+from fake_sweep import *
+from interpret_results import determine_optimal_section
+from pruning import *
+from surrogate import *
+
+
+def optimum(truth, combinations):
+    # the combination determine_optimal_section picks from the passing ones
+    passed = [
+        combination
+        for combination in combinations
+        if truth[combination]["Passed member design check for ULS"]
+    ]
+    columns = [
+        np.array([truth[combination][column] for combination in passed])
+        for column in [
+            "Module mass (kg)",
+            "Resonating harmonic occupied",
+            "Max vertical deflection for SLS (m)",
+        ]
+    ]
+    return passed[determine_optimal_section(*columns)]
+
+
+def test_pruning_only_skips_failures(ground_truth):
+    # on the sorted sweep, every pruned combination fails ULS, so the optimum is the same
+    catalog, truth = ground_truth
+    combinations = [list(combination) for combination in truth]
+    pruning = open_pruning()
+    analysed = [
+        tuple(combination)
+        for combination, row in pruned_sweep(
+            combinations, catalog, pruning, truth_sweep(truth)
+        )
+    ]
+    assert pruning["audit"]["pruned"] > 0
+    assert len(analysed) + pruning["audit"]["pruned"] == len(combinations)
+    assert all(
+        not row["Passed member design check for ULS"]
+        for combination, row in truth.items()
+        if combination not in analysed
+    )
+    assert optimum(truth, analysed) == optimum(truth, truth)
+
+
+def test_pruning_around_the_screen(ground_truth):
+    # the stack of main.py: the combinations that aren't pruned come out in the order of the sweep, the
+    # screened ones don't record failures, and the whole front is analysed with fewer analyses than the
+    # screen alone
+    catalog, truth = ground_truth
+    combinations = [list(combination) for combination in truth]
+    screen = open_screen()
+    pruning = open_pruning()
+    rows = list(
+        pruned_sweep(
+            combinations,
+            catalog,
+            pruning,
+            lambda combinations: screened_sweep(
+                combinations, catalog, screen, truth_sweep(truth)
+            ),
+        )
+    )
+    yielded = [combination for combination, row in rows]
+    assert yielded == [
+        combination for combination in combinations if combination in yielded
+    ]
+    assert len(rows) + pruning["audit"]["pruned"] == len(combinations)
+    analysed = {tuple(combination) for combination, row in rows if not is_screened(row)}
+    assert pruning["audit"]["analysed"] == len(analysed)
+    assert pruning["audit"]["screened"] == len(rows) - len(analysed)
+    assert truth_front(truth) <= analysed
+
+    alone = list(
+        screened_sweep(combinations, catalog, open_screen(), truth_sweep(truth))
+    )
+    assert len(analysed) < sum(not is_screened(row) for combination, row in alone)
+
+
+def test_seed_pruning_skips_screened_rows(ground_truth):
+    catalog, truth = ground_truth
+    combinations = [list(combination) for combination in truth][:50]
+    pruning = open_pruning()
+    seed_pruning(
+        pruning, catalog, [screened_row(combination) for combination in combinations]
+    )
+    assert pruning["failed"] == {}
@@ -0,0 +1,88 @@
+import os
+
+from fake_sweep import *
+from results_store import *
+
+
+def open_store(tmp_path):
+    return open_results_store(os.path.join(str(tmp_path), "results.db"))
+
+
+def test_settings_hash(sweep_settings):
+    # a model parameter changes the key, the file locations and the native solve method don't, and the
+    # native only settings only count with the native backend
+    settings = sweep_settings(3)
+    key = settings_hash(settings)
+    assert settings_hash(dict(settings, live_UDL=6.0)) != key
+    assert settings_hash(dict(settings, num_spans=1)) != key
+    assert (
+        settings_hash(dict(settings, model_dir="elsewhere", native_solver="dense"))
+        == key
+    )
+    assert settings_hash(dict(settings, native_num_modes=20)) == key
+    native = dict(settings, backend="native", native_num_modes=8)
+    assert settings_hash(dict(native, native_num_modes=20)) != settings_hash(native)
+
+
+def test_results_are_kept_per_settings(tmp_path, sweep_settings):
+    # rows stored with one set of settings aren't seen with another
+    store = open_store(tmp_path)
+    settings = sweep_settings(3)
+    key = settings_hash(settings)
+    other = settings_hash(dict(settings, live_UDL=6.0))
+    rows = list(sap_sweep(sweep_combinations(4), settings, 1, fake_sap_open))
+    for combination, row in rows[:3]:
+        store_result(store, key, "Sheet", combination, row)
+    store_result(store, other, "Sheet", *rows[3])
+    assert completed_combinations(store, key) == {
+        tuple(combination) for combination, row in rows[:3]
+    }
+    assert completed_combinations(store, other) == {tuple(rows[3][0])}
+    assert load_results(store, key, "Sheet") == [row for combination, row in rows[:3]]
+    assert load_results(store, key, "Other sheet") == []
+    store.close()
+
+
+def test_fresh_sweep_clears_and_resume_keeps(tmp_path):
+    store = open_store(tmp_path)
+    for key in ("a", "b"):
+        for i in range(3):
+            store_result(store, key, "Sheet", [f"top {i}", "bottom", "web"], {"i": i})
+    store.close()
+
+    # --resume after a restart, the finished combinations of the same settings
+    store = open_store(tmp_path)
+    assert resume_results(store, "a", True) == {
+        (f"top {i}", "bottom", "web") for i in range(3)
+    }
+    # without --resume, only the results of the same settings are cleared
+    assert resume_results(store, "a", False) == set()
+    assert completed_combinations(store, "a") == set()
+    assert len(completed_combinations(store, "b")) == 3
+    store.close()
+
+
+def test_failed_rows_are_not_stored(tmp_path):
+    store = open_store(tmp_path)
+    store_result(store, "a", "Sheet", ["top", "bottom", "web"], None)
+    store_result(store, "a", "Sheet", ["top", "bottom", "other web"], {"i": 0})
+    assert resume_results(store, "a", True) == {("top", "bottom", "other web")}
+    store.close()
+
+
+def test_skip_completed():
+    # the combinations left after a resume, in sweep order, without the chunks that are all done
+    catalog = sweep_catalog(12)
+    sections = np.arange(12)[::-1]
+    chunks = list(
+        combination_chunks(catalog, sections, sections, sections, [depth_gap(2)], 8)
+    )
+    combinations = [
+        tuple(labels) for labels in catalog["label"][np.concatenate(chunks)]
+    ]
+    completed = set(combinations[:8]) | set(combinations[10:20:3])
+    remaining = list(skip_completed(chunks, catalog, completed))
+    assert len(remaining) == len(chunks) - 1
+    assert [
+        tuple(labels) for labels in catalog["label"][np.concatenate(remaining)]
+    ] == [combination for combination in combinations if combination not in completed]
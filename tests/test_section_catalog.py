@@ -0,0 +1,109 @@
+import os
+
+import numpy as np
+
+import section_catalog
+from section_catalog import *
+
+# a few aluminum sections in the format of the CSI libraries (AA2020.xml), values in inches. PIPE 6 X 1/2
+# has XML values close to its label, RT 4 X 2 X 1/4 has I33 and I22 next to a plain I and no S33POS,
+# PIPE 1 1/2 X 1/4 has no values at all, and PIPE 8 X 1/2 has an I in mm4 instead of in4
+ALU_XML = """<?xml version="1.0" encoding="utf-8"?>
+<PROPERTY_FILE xmlns="http://www.csiberkeley.com">
+  <CONTROL><LENGTH_UNITS>in</LENGTH_UNITS></CONTROL>
+  <STEEL_PIPE>
+    <LABEL>PIPE 6 X 1/2</LABEL><A>8.5</A><I>32.0</I><S>10.7</S><R>1.94</R>
+  </STEEL_PIPE>
+  <STEEL_PIPE><LABEL>PIPE 1 1/2 X 1/4</LABEL><EDI_STD>AA</EDI_STD></STEEL_PIPE>
+  <STEEL_PIPE>
+    <LABEL>PIPE 8 X 1/2</LABEL><A>11.8</A><I>{pipe_8_I}</I><S>23.0</S><R>2.68</R>
+  </STEEL_PIPE>
+  <STEEL_PIPE><LABEL>SCH 40 PIPE 2</LABEL><A>1.07</A></STEEL_PIPE>
+  <STEEL_BOX>
+    <LABEL>RT 4 X 2 X 1/4</LABEL><A>2.6</A><I>1.0</I><I33>4.9</I33><I22>1.6</I22>
+    <S33>2.45</S33><R33>1.37</R33><R22>0.78</R22>
+  </STEEL_BOX>
+</PROPERTY_FILE>
+"""
+PREFIXES = {"STEEL_PIPE": "PIPE", "STEEL_BOX": "RT"}
+
+
+def write_xml(directory, pipe_8_I=83.0):
+    xml_path = os.path.join(directory, "AA2020.xml")
+    with open(xml_path, "w") as file:
+        file.write(ALU_XML.format(pipe_8_I=pipe_8_I))
+    return xml_path
+
+
+def test_parsed_columns(tmp_path):
+    catalog = parse_section_xml(write_xml(str(tmp_path)), True, PREFIXES)
+    assert list(catalog["label"]) == [
+        "PIPE 6 X 1/2",
+        "PIPE 1 1/2 X 1/4",
+        "PIPE 8 X 1/2",
+        "RT 4 X 2 X 1/4",
+    ]
+    assert list(catalog["is_round"]) == [True, True, True, False]
+    assert np.allclose(catalog["depth"], [6.0, 1.5, 8.0, 4.0])
+    assert np.allclose(catalog["width"], [6.0, 1.5, 8.0, 2.0])
+    assert np.allclose(catalog["thickness"], [0.5, 0.25, 0.5, 0.25])
+
+    # the XML values, in m
+    inch = 0.0254
+    assert np.isclose(catalog["A"][0], 8.5 * inch**2)
+    assert np.isclose(catalog["I"][0], 32.0 * inch**4)
+    assert np.isclose(catalog["r22"][0], 1.94 * inch)
+    assert np.isclose(catalog["mass"][0], 8.5 * inch**2 * DENSITIES["aluminum"])
+    # I33 and I22 over I, and S33 without S33POS
+    assert np.isclose(catalog["I"][3], 4.9 * inch**4)
+    assert np.isclose(catalog["I22"][3], 1.6 * inch**4)
+    assert np.isclose(catalog["S"][3], 2.45 * inch**3)
+    assert np.isclose(catalog["r"][3], 1.37 * inch)
+
+    # no values, the nominal geometry: pi/4 (1.5^2 - 1^2) in2 and pi/64 (1.5^4 - 1^4) in4
+    assert np.isclose(catalog["A"][1], np.pi / 4 * (1.5**2 - 1.0) * inch**2)
+    assert np.isclose(catalog["I"][1], np.pi / 64 * (1.5**4 - 1.0) * inch**4)
+    assert list(catalog["overridden"][:2]) == ["", ""]
+
+
+def test_bad_values_are_reported(tmp_path, capsys):
+    # an I in mm4 is about 400000 times the nominal pi/64 (8^4 - 7^4) = 83.2 in4, so the nominal geometry
+    # is used for I and I22 (read from the same tag), and load_section_catalog says so
+    xml_path = write_xml(str(tmp_path), pipe_8_I=34.6e6)
+    catalog = parse_section_xml(xml_path, True, PREFIXES)
+    nominal = section_geometry(8.0 * 0.0254, 8.0 * 0.0254, 0.5 * 0.0254, True)
+    assert np.isclose(catalog["I"][2], nominal["I"])
+    assert np.isclose(catalog["I22"][2], nominal["I22"])
+    assert list(catalog["overridden"]) == ["", "", "I I22", ""]
+
+    load_section_catalog(xml_path, True, PREFIXES, str(tmp_path / "cache"))
+    assert "PIPE 8 X 1/2 (I I22)" in capsys.readouterr().out
+
+
+def test_catalog_cache(tmp_path, monkeypatch):
+    # the second load reads the .npz without parsing, and editing the XML parses it again
+    parses = []
+    parse = section_catalog.parse_section_xml
+    monkeypatch.setattr(
+        section_catalog,
+        "parse_section_xml",
+        lambda *args: parses.append(args) or parse(*args),
+    )
+    xml_path = write_xml(str(tmp_path))
+    cache_dir = str(tmp_path / "cache")
+    catalog = load_section_catalog(xml_path, True, PREFIXES, cache_dir)
+    cached = load_section_catalog(xml_path, True, PREFIXES, cache_dir)
+    assert len(parses) == 1
+    assert cached["index"] == catalog["index"]
+    for name in catalog:
+        if name != "index":
+            assert np.array_equal(cached[name], catalog[name])
+
+    with open(xml_path) as file:
+        contents = file.read()
+    with open(xml_path, "w") as file:
+        file.write(contents.replace("<A>8.5</A>", "<A>8.6</A>"))
+    edited = load_section_catalog(xml_path, True, PREFIXES, cache_dir)
+    assert len(parses) == 2
+    assert np.isclose(edited["A"][0], 8.6 * 0.0254**2)
+    assert len(os.listdir(cache_dir)) == 2
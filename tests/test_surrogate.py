@@ -0,0 +1,46 @@
+from fake_sweep import *
+from pareto import *
+from surrogate import *
+
+
+def test_screen_keeps_the_front_and_the_order(ground_truth):
+    # every combination comes out in the order of the sweep, the skipped ones with a screened row and no
+    # results, the analysed ones with their row. the screen saves analyses and analyses the whole front
+    catalog, truth = ground_truth
+    combinations = [list(combination) for combination in truth]
+    rows = list(
+        screened_sweep(combinations, catalog, open_screen(), truth_sweep(truth))
+    )
+    assert [combination for combination, row in rows] == combinations
+
+    analysed = set()
+    for combination, row in rows:
+        if is_screened(row):
+            assert row == screened_row(combination)
+        else:
+            assert row == truth[tuple(combination)]
+            analysed.add(tuple(combination))
+    assert len(analysed) < len(combinations) / 2
+    assert truth_front(truth) <= analysed
+
+
+def test_screened_rows_are_not_training_data(ground_truth):
+    # rows from the results store of a screened sweep train the screen and the online front like the
+    # analysed rows alone
+    catalog, truth = ground_truth
+    rows = list(truth.values())[:100]
+    combinations = [list(combination) for combination in truth][100:150]
+    stored = rows + [screened_row(combination) for combination in combinations]
+
+    screen = open_screen()
+    seed_screen(screen, catalog, stored)
+    assert len(screen["passed"]) == len(rows)
+
+    front = open_online_front()
+    seed_online_front(front, stored)
+    expected = open_online_front()
+    seed_online_front(expected, rows)
+    assert front["rows"] == expected["rows"]
+    for combination in combinations:
+        assert not update_online_front(front, screened_row(combination))
+    assert front["analyses"] == 0
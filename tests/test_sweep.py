@@ -0,0 +1,105 @@
+from fake_sweep import *
+
+
+def test_parallel_sweep_matches_serial(sweep_settings):
+    # same rows in the same order as the serial sweep, with analyses that raise and worker processes that
+    # die along the way
+    combinations = sweep_combinations(24)
+    settings = sweep_settings(3)
+    serial = list(sap_sweep(combinations, settings, 1, fake_sap_open))
+    for num_workers, failure_rate, crash_rate in ((2, 0.0, 0.0), (3, 0.1, 0.05)):
+        parallel = list(
+            sap_sweep(
+                combinations,
+                settings,
+                num_workers,
+                fake_sap_open,
+                {"failure_rate": failure_rate, "crash_rate": crash_rate},
+                max_attempts=10,
+            )
+        )
+        assert parallel == serial
+
+
+def test_failed_combination_gets_none_row(sweep_settings, fake_sap):
+    # every analysis fails, each combination is tried max_attempts times and the sweep carries on
+    open_function, sap_objects = fake_sap
+    settings = sweep_settings(1)
+    rows = list(
+        sap_sweep(
+            sweep_combinations(2),
+            settings,
+            1,
+            lambda: open_function(failure_rate=1.0),
+            max_attempts=2,
+        )
+    )
+    assert [row for combination, row in rows] == [None, None]
+    assert all(sap_object.closed for sap_object in sap_objects)
+
+
+def test_template_model_matches_rebuild(sweep_settings):
+    # the template model gives the rows of rebuilding from BASE.sdb for every combination, without a call
+    # on a locked model, and makes fewer COM calls once it is built
+    combinations = sweep_combinations(8)
+    for num_spans in (1, 3):
+        settings = sweep_settings(num_spans)
+        rows = []
+        calls = []
+        for template_model in (False, True):
+            sap_object = fake_sap_open()
+            sweep = sap_sweep(
+                combinations,
+                settings,
+                1,
+                lambda: sap_object,
+                template_model=template_model,
+            )
+            rows.append([next(sweep)])
+            first_calls = sum(sap_object.SapModel.calls.values())
+            rows[-1].extend(sweep)
+            assert not sap_object.SapModel.errors, sap_object.SapModel.errors
+            calls.append(sum(sap_object.SapModel.calls.values()) - first_calls)
+        assert rows[0] == rows[1]
+        assert calls[1] < calls[0]
+
+
+def test_merged_sweep_order():
+    # rows that are already there come out as soon as no analysis is ahead of them, in order with the rows
+    # of the runner
+    entries = [
+        (["a"], {"row": "a"}),
+        (["b"], None),
+        (["c"], {"row": "c"}),
+        (["d"], None),
+    ]
+    sent = []
+
+    def run_sweep(combinations):
+        for combination in combinations:
+            sent.append(combination)
+            yield combination, {"row": combination[0] + " analysed"}
+
+    assert list(merged_sweep(entries, run_sweep)) == [
+        (["a"], {"row": "a"}, False),
+        (["b"], {"row": "b analysed"}, True),
+        (["c"], {"row": "c"}, False),
+        (["d"], {"row": "d analysed"}, True),
+    ]
+    assert sent == [["b"], ["d"]]
+
+
+def test_merged_sweep_runner_leaves_combinations_out():
+    # a runner that doesn't analyse every combination it is sent (ex. pruned_sweep inside the screen),
+    # the left out ones aren't yielded
+    entries = [(["a"], None), (["b"], {"row": "b"}), (["c"], None), (["d"], None)]
+
+    def run_sweep(combinations):
+        for combination in combinations:
+            if combination != ["a"] and combination != ["d"]:
+                yield combination, {"row": combination[0] + " analysed"}
+
+    assert list(merged_sweep(entries, run_sweep)) == [
+        (["b"], {"row": "b"}, False),
+        (["c"], {"row": "c analysed"}, True),
+    ]